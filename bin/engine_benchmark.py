@@ -0,0 +1,53 @@
+"""
+Compares the ctypes and cffi engines at decoding a long list of
+strings, which is the per-entry work behind every listing.
+Build the cffi engine first with ``python -m drmaa2.cffi_build``::
+
+    python bin/engine_benchmark.py --entries 200000 --repeat 5
+"""
+import argparse
+import time
+from drmaa2.engine import load_engine
+from drmaa2.wrapping import DRMAA2List, from_address
+
+
+def decode(engine, wrapped):
+    size = engine.list_size(wrapped.list_ptr)
+    return [from_address(address)
+            for address in engine.list_addresses(wrapped.list_ptr, size)]
+
+
+def decode_each(engine, wrapped):
+    """The way decoding worked before list_addresses, one call per entry."""
+    size = engine.list_size(wrapped.list_ptr)
+    return [from_address(engine.list_get(wrapped.list_ptr, idx))
+            for idx in range(size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    wrapped = DRMAA2List(["session{}".format(idx % 1000)
+                          for idx in range(args.entries)])
+    engines = [load_engine("ctypes")]
+    cffi_engine = load_engine("cffi")
+    if cffi_engine.name == "cffi":
+        engines.append(cffi_engine)
+    else:
+        print("The cffi engine isn't built, so only ctypes runs.")
+    for engine in engines:
+        for method in (decode_each, decode):
+            best = None
+            for trial in range(args.repeat):
+                start = time.perf_counter()
+                method(engine, wrapped)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print("{:<8}{:<14}{:10.1f} ns/entry".format(
+                engine.name, method.__name__, 1e9 * best / args.entries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Runs many jobs through JobSession.map against the simulator, to see
+what the wrapper costs in CPU and memory at a scale no test cluster
+would accept::
+
+    python bin/simulate.py --jobs 1000000 --slots 5000 --window 10000
+"""
+import argparse
+import time
+from drmaa2 import JobSession, JobTemplate, simulate
+
+
+def templates(job_cnt, category):
+    """The same template again and again, as map allows."""
+    job_template = JobTemplate()
+    job_template.remoteCommand = "/bin/true"
+    job_template.jobCategory = category
+    for idx in range(job_cnt):
+        yield job_template
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--jobs", type=int, default=100000)
+    parser.add_argument("--slots", type=int, default=1000)
+    parser.add_argument("--window", type=int, default=1000)
+    parser.add_argument("--mean", type=float, default=600,
+                        help="Mean seconds a job runs")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--trace", help="Accounting CSV of durations")
+    args = parser.parse_args()
+    if args.trace:
+        from drmaa2.simulator import trace_durations
+        durations = trace_durations(args.trace)
+    else:
+        durations = ("exponential", args.mean)
+    config = dict(queues={"all.q": args.slots},
+                  durations={"load": durations},
+                  failure_rate=args.failure_rate)
+    start = time.perf_counter()
+    with simulate(**config) as simulator:
+        with JobSession() as session:
+            finished = 0
+            for position, job in session.map(
+                    templates(args.jobs, "load"), window=args.window):
+                finished += 1
+        report = simulator.report()
+    elapsed = time.perf_counter() - start
+    print("{} jobs in {:.0f} virtual seconds and {:.1f} wall seconds".format(
+        finished, report["virtual_seconds"], elapsed))
+    print("CPU seconds: {:.1f} process, {:.1f} simulator, {:.1f} wrapper"
+          .format(report["process_cpu"], report["simulator_cpu"],
+                  report["wrapper_cpu"]))
+    print("{:.1f} microseconds of wrapper CPU per job".format(
+        1e6 * report["wrapper_cpu"] / max(finished, 1)))
+    print("Peak resident memory {:.0f} MB".format(report["peak_rss"] / 2**20))
+
+
+if __name__ == "__main__":
+    main()
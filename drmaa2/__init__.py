@@ -1,13 +1,35 @@
 from . import interface
-from .interface import (CPU, Event, ListType, OS, JState,
-                        Times, ResourceLimits, DRMAA2_CALLBACK)
+from .interface import (Capability, CPU, Event, ListType, OS, JState,
+                        Times, ResourceLimits, DRMAA2_CALLBACK,
+                        open_drmaa_library, using_library)
 from .session import (Job, job_template_implementation_specific,
                       JobTemplate, ext_get, ext_set,
                       implementation_specific, describe,
-                      Notification, JobSession)
+                      Notification, JobSession, job_state, job_hold,
+                      job_release, job_suspend, job_resume,
+                      job_terminate, JobInfo, job_info,
+                      MachineInfo, MonitoringSession)
 from .wrapping import (DRMAA2List, register_event_notification,
-                       unset_event_notification)
+                       unset_event_notification, Environment,
+                       register_environment, get_environment)
 from . import wrapping
+from .governor import SubmissionGovernor
+from .workflow import Workflow
+from .output import JobHandle, harvest
+from .registry import TemplateRegistry
+from .sessiongc import stale_sessions, collect_sessions
+from .pool import SessionPool
+from .capabilities import capabilities, supports, watch_jobs, stage_files
+from .accounting import export_accounting
+from .lifecycle import Lifecycle, QuantileSketch
+from .simulator import Simulator, simulate
+from .federation import Cluster, FederatedSession
+from .jobtable import JobTable
+from .reaper import Reaper
+from .loadcontrol import LoadController
+from .reservation import (ReservationSession, ReservationTemplate,
+                          Reservation)
+from .packer import ReservationPacker
 from .errors import *
 
 
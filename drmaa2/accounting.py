@@ -0,0 +1,291 @@
+"""
+Exporting what the scheduler knows about finished jobs, for capacity
+planning. The exporter lists jobs from a JobSession or a
+MonitoringSession in chunks, decodes each DRMAA2_JINFO straight into
+columns, and writes each chunk before asking for the next, so memory
+stays bounded however many jobs there are::
+
+    with MonitoringSession() as monitor:
+        export_accounting(monitor, "campaign.parquet", incremental=True)
+
+With pyarrow installed, chunks become Arrow record batches in a Parquet
+file. Without it, they are appended to a CSV file. An incremental export
+only writes jobs that finished no earlier than the latest finishTime
+already exported, skipping those it has written before. Parquet files
+can't be appended, so an incremental export to Parquet writes the next
+file in a numbered series beside the first.
+Times are seconds since the epoch.
+"""
+import csv
+import logging
+from ctypes import byref
+from pathlib import Path
+from .interface import *
+from .engine import ENGINE, CtypesEngine
+from .wrapping import STRING_INTERN
+from .session import JobStrategy
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+LOGGER = logging.getLogger("drmaa2.accounting")
+DRMAA_LIB = load_drmaa_library()
+
+COLUMNS = [
+    ("jobId", "string"),
+    ("jobOwner", "string"),
+    ("queueName", "string"),
+    ("submissionMachine", "string"),
+    ("allocatedMachines", "string"),
+    ("jobState", "string"),
+    ("exitStatus", "int64"),
+    ("slots", "int64"),
+    ("cpuTime", "int64"),
+    ("wallclockTime", "int64"),
+    ("submissionTime", "int64"),
+    ("dispatchTime", "int64"),
+    ("finishTime", "int64"),
+]
+"""Exported columns and their Arrow types. Machines are comma-separated."""
+
+
+def _string_list(list_ptr, library=None):
+    if not list_ptr:
+        return None
+    # The cffi engine was built against the package's library.
+    engine = CtypesEngine(library) if library is not None else ENGINE
+    return ",".join(STRING_INTERN.from_address(address)
+                    for address in engine.list_addresses(list_ptr))
+
+
+def _number(value):
+    """Unset numbers and times are negative in DRMAA2."""
+    return value if value >= 0 else None
+
+
+def info_columns(columns, info, library=None):
+    """Append one DRMAA2_JINFO to lists of column values.
+
+    :param columns dict: From column name to a list.
+    :param info DRMAA2_JINFO: The structure, not a pointer to it.
+    :param library: The library that made info, if not the package's.
+    """
+    columns["jobId"].append(
+        info.jobId.value.decode() if info.jobId else None)
+    columns["jobOwner"].append(STRING_INTERN.from_bytes(info.jobOwner.value))
+    columns["queueName"].append(STRING_INTERN.from_bytes(info.queueName.value))
+    columns["submissionMachine"].append(
+        STRING_INTERN.from_bytes(info.submissionMachine.value))
+    columns["allocatedMachines"].append(
+        _string_list(info.allocatedMachines, library))
+    try:
+        columns["jobState"].append(JState(info.jobState).name)
+    except ValueError:
+        columns["jobState"].append(None)
+    columns["exitStatus"].append(_number(info.exitStatus))
+    columns["slots"].append(_number(info.slots))
+    columns["cpuTime"].append(_number(info.cpuTime))
+    columns["wallclockTime"].append(_number(info.wallclockTime))
+    columns["submissionTime"].append(_number(info.submissionTime))
+    columns["dispatchTime"].append(_number(info.dispatchTime))
+    columns["finishTime"].append(_number(info.finishTime))
+
+
+def info_chunks(source, chunk_size=10000, job_filter=None, since=None,
+                exported=()):
+    """Job information as chunks of columns.
+
+    :param source: A JobSession or MonitoringSession.
+    :param chunk_size int: Jobs in each chunk.
+    :param job_filter JobInfo: Only list jobs that match this.
+    :param since int: If given, only jobs that finished then or later.
+    :param exported: IDs of jobs to leave out, such as those that
+                     finished at ``since`` and were already exported.
+    :return: Generator of dicts from column name to a list of values.
+    """
+    for jobs in source.jobs(job_filter, chunk_size=chunk_size):
+        columns = {name: list() for (name, kind) in COLUMNS}
+        for job in jobs:
+            info_ptr = DRMAA_LIB.drmaa2_j_get_info(JobStrategy.to_void(job))
+            if not info_ptr:
+                LOGGER.debug("No information for {}: {}".format(
+                    job, last_error()))
+                continue
+            try:
+                info = info_ptr.contents
+                if since is not None and not info.finishTime >= since:
+                    continue
+                if exported and info.jobId and \
+                        info.jobId.value.decode() in exported:
+                    continue
+                info_columns(columns, info)
+            finally:
+                DRMAA_LIB.drmaa2_jinfo_free(byref(info_ptr))
+        if columns["jobId"]:
+            yield columns
+
+
+def _target(path, file_format):
+    """Choose the format. Without pyarrow, a .parquet path
+    becomes a .csv path beside it.
+
+    :return (str, Path): The format and the file to write.
+    """
+    path = Path(path)
+    if file_format is None:
+        if path.suffix == ".csv":
+            file_format = "csv"
+        elif pyarrow is None:
+            LOGGER.warning("No pyarrow, so exporting as CSV.")
+            file_format = "csv"
+            path = path.with_suffix(".csv")
+        else:
+            file_format = "parquet"
+    if file_format == "parquet" and pyarrow is None:
+        raise ImportError("Parquet needs pyarrow")
+    if file_format not in ("parquet", "csv"):
+        raise ValueError("Unknown format {}".format(file_format))
+    return file_format, path
+
+
+def _series(path):
+    """Parquet files of an incremental export: name.parquet,
+    name.1.parquet, name.2.parquet, and so on."""
+    path = Path(path)
+    found = [path] if path.exists() else list()
+    idx = 1
+    while True:
+        part = path.with_suffix(".{}{}".format(idx, path.suffix))
+        if not part.exists():
+            return found, part
+        found.append(part)
+        idx += 1
+
+
+def write_chunks(chunks, path, file_format=None):
+    """Write chunks of columns to a file as they arrive.
+
+    :param chunks: Iterable of dicts from column name to a list.
+    :param path str: Where to write. For CSV, rows are appended.
+    :param file_format str: "parquet" or "csv". The default is
+                            parquet when pyarrow is installed,
+                            unless the path ends in .csv.
+    :return int: Number of rows written.
+    """
+    file_format, path = _target(path, file_format)
+    if file_format == "parquet":
+        return _write_parquet(chunks, path)
+    else:
+        return _write_csv(chunks, path)
+
+
+def _write_parquet(chunks, path):
+    if pyarrow is None:
+        raise ImportError("Writing Parquet needs pyarrow")
+    found, next_part = _series(path)
+    target = next_part if found else path
+    schema = pyarrow.schema(
+        [(name, getattr(pyarrow, kind)()) for (name, kind) in COLUMNS])
+    row_cnt = 0
+    writer = None
+    try:
+        for columns in chunks:
+            batch = pyarrow.RecordBatch.from_arrays(
+                [pyarrow.array(columns[name], type=schema.field(name).type)
+                 for (name, kind) in COLUMNS], schema=schema)
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(str(target), schema)
+            writer.write_table(pyarrow.Table.from_batches([batch]))
+            row_cnt += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    LOGGER.debug("Wrote {} rows to {}".format(row_cnt, target))
+    return row_cnt
+
+
+def _write_csv(chunks, path):
+    names = [name for (name, kind) in COLUMNS]
+    new_file = not path.exists() or path.stat().st_size == 0
+    row_cnt = 0
+    with open(str(path), "a", newline="", buffering=1 << 20) as out:
+        writer = csv.writer(out)
+        if new_file:
+            writer.writerow(names)
+        for columns in chunks:
+            rows = zip(*[columns[name] for name in names])
+            for row in rows:
+                writer.writerow(["" if v is None else v for v in row])
+                row_cnt += 1
+    LOGGER.debug("Wrote {} rows to {}".format(row_cnt, path))
+    return row_cnt
+
+
+def last_finish_time(path, file_format=None):
+    """The latest finishTime in an earlier export.
+
+    :param path str: The file given to an earlier export.
+    :return int: Seconds since the epoch, or None if nothing is there.
+    """
+    return last_exported(path, file_format)[0]
+
+
+def last_exported(path, file_format=None):
+    """The latest finishTime in an earlier export, and which jobs
+    finished then. Times are whole seconds, so jobs that finish in the
+    same second as the last one exported may come after it.
+
+    :param path str: The file given to an earlier export.
+    :return (int, set(str)): Seconds since the epoch, or None if
+                             nothing is there, and the job IDs.
+    """
+    file_format, path = _target(path, file_format)
+    latest, job_ids = None, set()
+
+    def see(value, job_id):
+        nonlocal latest, job_ids
+        if value is None:
+            return
+        if latest is None or value > latest:
+            latest, job_ids = value, set()
+        if value == latest:
+            job_ids.add(job_id)
+
+    if file_format == "parquet":
+        for part in _series(path)[0]:
+            table = pyarrow.parquet.read_table(
+                str(part), columns=["jobId", "finishTime"])
+            for job_id, value in zip(table.column("jobId").to_pylist(),
+                                     table.column("finishTime").to_pylist()):
+                see(value, job_id)
+    elif path.exists():
+        with open(str(path), newline="") as src:
+            for row in csv.DictReader(src):
+                if row["finishTime"]:
+                    see(int(row["finishTime"]), row["jobId"])
+    return latest, job_ids
+
+
+def export_accounting(source, path, file_format=None, chunk_size=10000,
+                      job_filter=None, incremental=False):
+    """Export job information for every job a session lists.
+
+    :param source: A JobSession or MonitoringSession.
+    :param path str: The file to write.
+    :param file_format str: "parquet" or "csv", as for write_chunks.
+    :param chunk_size int: Jobs to decode before writing.
+    :param job_filter JobInfo: Only export jobs that match this.
+    :param incremental bool: Only export jobs that the earlier export
+                             to path doesn't have and that finished
+                             no earlier than its last job.
+    :return int: Number of rows written.
+    """
+    since, exported = (last_exported(path, file_format) if incremental
+                       else (None, ()))
+    LOGGER.debug("Exporting jobs that finished at or after {}".format(since))
+    chunks = info_chunks(source, chunk_size, job_filter, since, exported)
+    return write_chunks(chunks, path, file_format)
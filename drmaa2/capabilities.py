@@ -0,0 +1,188 @@
+"""
+What this DRMAA2 library can do, asked once and remembered, and
+helpers that pick the fastest way to do something from the answer,
+so that callers don't catch UnsupportedOperation to find out::
+
+    if Capability.callback in capabilities():
+        ...
+    watcher = watch_jobs(jobs, on_change)   # Callbacks, else polling.
+    staging = stage_files(job_template, {"in.dat": "/scratch/in.dat"})
+    job = js.run(job_template)
+    ...
+    staging.finish()                        # Copies outputs if needed.
+
+JobSession.run_bulk also checks here before asking for a
+limit on how many tasks of an array run at once.
+"""
+import logging
+import shutil
+import threading
+from .interface import *
+from .errors import *
+from .wrapping import (register_event_notification,
+                       unset_event_notification)
+
+
+LOGGER = logging.getLogger("drmaa2.capabilities")
+DRMAA_LIB = load_drmaa_library()
+_PROBED = dict()
+
+
+def capabilities(library=None):
+    """The capabilities the library says it supports. The first call
+    for a library asks drmaa2_supports about each one, and later
+    calls return the same answer.
+
+    :param library: A loaded library, by default the one in use.
+    :return frozenset(Capability): Supported capabilities. This is
+                                   empty if there is no library.
+    """
+    library = library or DRMAA_LIB
+    if not library:
+        return frozenset()
+    if library not in _PROBED:
+        supported = set()
+        for capability in Capability:
+            if capability == Capability.unset_capability:
+                continue
+            if library.drmaa2_supports(capability.value):
+                supported.add(capability)
+        LOGGER.debug("Library supports {}".format(
+            ", ".join(sorted(c.name for c in supported))))
+        _PROBED[library] = frozenset(supported)
+    return _PROBED[library]
+
+
+def supports(capability):
+    """Whether the library in use has a capability.
+
+    :param capability: A Capability or its name.
+    :return bool:
+    """
+    if isinstance(capability, str):
+        capability = Capability[capability]
+    return capability in capabilities()
+
+
+class _PollingWatcher:
+    """Asks for the state of each job in turn and reports changes."""
+    def __init__(self, jobs, callback, poll_interval, state_of):
+        self.jobs = list(jobs)
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.state_of = state_of
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+
+    def _poll(self):
+        known = dict()
+        while self.jobs and not self._stop.is_set():
+            for job in list(self.jobs):
+                try:
+                    state = self.state_of(job)
+                except DRMAA2Exception as err:
+                    LOGGER.debug("Could not poll {}: {}".format(job, err))
+                    continue
+                if known.get(job.id) != state:
+                    known[job.id] = state
+                    self.callback(Event.new_state, job.id, job.sessionName,
+                                  state)
+                if state in (JState.done, JState.failed):
+                    self.jobs.remove(job)
+            self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+class _CallbackWatcher:
+    """Passes along the library's notifications about some jobs,
+    with the event and state as enums, the same as when polling."""
+    def __init__(self, jobs, callback):
+        ids = {job.id for job in jobs}
+
+        def relay(event, job_id, session_name, state):
+            if job_id in ids:
+                # Notification gives the names of the enums.
+                if isinstance(event, str):
+                    event = Event[event]
+                if isinstance(state, str):
+                    state = JState[state]
+                callback(event, job_id, session_name, state)
+
+        register_event_notification(relay)
+
+    def stop(self):
+        unset_event_notification()
+
+
+def watch_jobs(jobs, callback, poll_interval=5.0, state_of=None):
+    """Call back when jobs change state. This uses the library's event
+    notification when it has the callback capability and otherwise
+    polls from a thread. The library keeps one notification callback,
+    so watch one set of jobs at a time.
+
+    :param jobs: The Jobs to watch.
+    :param callback: Called as callback(event, job_id, session_name, state),
+                     where event is an Event and state is a JState,
+                     or None if the library didn't say.
+    :param poll_interval float: Seconds between polls, when polling.
+    :param state_of: Function from Job to JState, when polling.
+                     The default is job_state.
+    :return: An object whose stop() method ends the watch.
+    """
+    if supports(Capability.callback):
+        return _CallbackWatcher(jobs, callback)
+    if state_of is None:
+        # The session module uses this one, so import it late.
+        from .session import job_state as state_of
+    return _PollingWatcher(jobs, callback, poll_interval, state_of)
+
+
+class Staging:
+    """Files to move for a job. Call finish() after the job is done."""
+    def __init__(self, native, stage_out):
+        self.native = native
+        self.stage_out = stage_out
+
+    def finish(self):
+        """Copy outputs back, unless the scheduler did it.
+
+        :return list(str): Paths that were copied.
+        """
+        if self.native:
+            return list()
+        copied = list()
+        for remote, local in self.stage_out.items():
+            shutil.copyfile(remote, local)
+            copied.append(local)
+        return copied
+
+
+def stage_files(job_template, stage_in=None, stage_out=None):
+    """Arrange to move files before and after a job. With the jt_staging
+    capability, this sets stageInFiles and stageOutFiles on the template.
+    Otherwise, it copies stage-in files now, which works where the target
+    paths are on a shared filesystem, and Staging.finish copies
+    stage-out files.
+
+    :param job_template JobTemplate: The template to run.
+    :param stage_in dict: From local path to the path the job reads.
+    :param stage_out dict: From the path the job writes to a local path.
+    :return Staging: Call its finish method when the job is done.
+    """
+    stage_in = dict(stage_in or dict())
+    stage_out = dict(stage_out or dict())
+    native = supports(Capability.jt_staging)
+    if native:
+        if stage_in:
+            job_template.stageInFiles = stage_in
+        if stage_out:
+            job_template.stageOutFiles = stage_out
+    else:
+        for local, remote in stage_in.items():
+            shutil.copyfile(local, remote)
+    return Staging(native, stage_out)
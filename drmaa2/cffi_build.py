@@ -0,0 +1,68 @@
+"""
+Builds the optional cffi engine, drmaa2._drmaa2_cffi, in API mode
+against the header in docs/drmaa2.h. Run it from a checkout, with
+SGE_ROOT set so the linker finds libdrmaa2.so::
+
+    pip install cffi
+    python -m drmaa2.cffi_build
+
+Besides the library's own list functions, the extension has one
+helper written in C that copies a block of a list's entry pointers
+into an array, so decoding a listing crosses from Python into C once
+a block instead of once per entry.
+"""
+import os
+from pathlib import Path
+from cffi import FFI
+
+
+HEADER_DIR = Path(__file__).resolve().parent.parent / "docs"
+
+CDEF = """
+typedef struct drmaa2_list_s * drmaa2_list;
+const void * drmaa2_list_get(const drmaa2_list l, const long pos);
+long drmaa2_list_size(const drmaa2_list l);
+long drmaa2py_list_addresses(const drmaa2_list l, long start,
+                             uintptr_t * out, long count);
+"""
+
+SOURCE = """
+#include "drmaa2.h"
+
+/* Fill out with the address of each entry from start on, up to count
+ * of them. Returns how many were written. */
+long drmaa2py_list_addresses(const drmaa2_list l, long start,
+                             uintptr_t * out, long count)
+{
+    long size = drmaa2_list_size(l) - start;
+    long idx;
+    if (size > count) {
+        size = count;
+    }
+    for (idx = 0; idx < size; idx++) {
+        out[idx] = (uintptr_t) drmaa2_list_get(l, start + idx);
+    }
+    return size > 0 ? size : 0;
+}
+"""
+
+
+def builder():
+    library_dirs = list()
+    if "SGE_ROOT" in os.environ:
+        library_dirs.append(str(Path(os.environ["SGE_ROOT"]) / "lib/lx-amd64"))
+    ffibuilder = FFI()
+    ffibuilder.cdef(CDEF)
+    ffibuilder.set_source(
+        "drmaa2._drmaa2_cffi", SOURCE, include_dirs=[str(HEADER_DIR)],
+        libraries=["drmaa2"], library_dirs=library_dirs,
+        runtime_library_dirs=library_dirs)
+    return ffibuilder
+
+
+ffibuilder = builder()
+
+
+if __name__ == "__main__":
+    ffibuilder.compile(tmpdir=str(Path(__file__).resolve().parent.parent),
+                       verbose=True)
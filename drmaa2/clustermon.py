@@ -0,0 +1,273 @@
+"""
+This is a quick little program to monitor job sessions.
+With no arguments, it is an interactive shell. With a command,
+it prints the answer and exits, so that scripts can use it::
+
+    clustermon sessions --json
+    clustermon jobs --session nightly --ndjson | jq .id
+
+Rows are written as they are decoded from the library's lists,
+so large answers take constant memory.
+"""
+import argparse
+import cmd
+import curses
+import json
+import logging
+import os
+import sys
+import threading
+import drmaa2
+from .top import ClusterTracker, render, changed_rows
+
+
+LOGGER = logging.getLogger("clustermon")
+
+
+class ClusterMonitor(cmd.Cmd):
+    def __init__(self):
+        super().__init__()
+
+    def do_help(self, *args):
+        """Show help."""
+        if any(args):
+            for arg in args:
+                try:
+                    msg = getattr(self, "do_{}".format(arg)).__doc__
+                    print(msg)
+                except AttributeError:
+                    print("Can't find help for {}".format(arg))
+        else:
+            print(
+"""sessions=print all sessions
+destroy=get rid of sessions in the scheduler
+gc=destroy sessions that have no unfinished jobs
+top=live view of jobs by session, queues, and host load
+help=this message
+quit=exit this program""")
+
+    def do_quit(self, *args):
+        """Exit the program. Or use Control-d"""
+        sys.exit()
+
+    def do_EOF(self, *args):
+        print()
+        sys.exit()
+
+    def do_sessions(self, *args):
+        """Show all sessions."""
+        names = drmaa2.JobSession.names()
+        print("There are {} open sessions".format(len(names)))
+        print(("  "+os.linesep).join(names))
+
+    def do_destroy(self, *args):
+        """
+        Remove sessions from the scheduler's memory.
+        :param session_names: Either a list of session names or "all"
+                              to destroy all of them.
+        """
+        if ("all",) == args:
+            names = drmaa2.JobSession.names()
+        else:
+            names = list(args)
+        success = list()
+        fail = list()
+        for n in names:
+            try:
+                full_name = n.split("@")
+                drmaa2.JobSession.destroy_named(full_name[-1])
+                success.append(n)
+            except Exception as exc:
+                fail.append((n, exc))
+        if success:
+            print("Destroyed:")
+            for s in success:
+                print("  "+s)
+        if fail:
+            for name, why in fail:
+                print("{}: {}".format(name, str(why)))
+
+    def do_gc(self, *args):
+        """
+        Destroy every session whose jobs have all finished.
+        :param dry: Say "dry" to list what would be destroyed.
+        :param empty: Say "empty" to destroy sessions with no jobs, too.
+        :param workers: How many sessions to destroy at once, default 8.
+        """
+        words = " ".join(args).split()
+        dry_run = "dry" in words
+        workers = [int(w) for w in words if w.isdigit()]
+        with drmaa2.MonitoringSession() as monitor:
+            names = drmaa2.stale_sessions(
+                monitor, include_empty="empty" in words)
+        if not names:
+            print("There are no stale sessions.")
+            return
+
+        def progress(done, total, name, error):
+            if dry_run:
+                print("  " + name)
+            elif error is not None:
+                print("{}: {}".format(name, error))
+            elif done % 100 == 0 or done == total:
+                print("Destroyed {} of {}".format(done, total))
+
+        if dry_run:
+            print("Would destroy {} sessions:".format(len(names)))
+        collected = drmaa2.collect_sessions(
+            names, max_workers=workers[0] if workers else 8,
+            dry_run=dry_run, progress=progress)
+        if not dry_run:
+            print("Destroyed {}, failed {}".format(
+                len(collected.destroyed), len(collected.failed)))
+
+    def do_top(self, *args):
+        """
+        Show a live view of jobs by state in each session, running jobs
+        by queue, and the most loaded hosts. Press q to leave.
+        :param interval: Seconds between refreshes, default 5.
+        """
+        words = " ".join(args).split()
+        interval = float(words[0]) if words else 5.0
+        with drmaa2.MonitoringSession() as monitor:
+            curses.wrapper(self._top, ClusterTracker(monitor), interval)
+
+    def _top(self, screen, tracker, interval):
+        latest = [None]
+        stop = threading.Event()
+
+        def collect():
+            # Asking the scheduler is slow, so it happens off the
+            # screen's thread, which stays responsive to keys.
+            while not stop.is_set():
+                try:
+                    latest[0] = tracker.tick()
+                except Exception as err:
+                    LOGGER.debug("top could not refresh: {}".format(err))
+                stop.wait(interval)
+
+        collector = threading.Thread(target=collect, daemon=True)
+        collector.start()
+        curses.curs_set(0)
+        screen.timeout(200)
+        drawn = list()
+        shown = None
+        try:
+            while screen.getch() not in (ord("q"), ord("Q")):
+                if latest[0] is shown:
+                    continue
+                shown = latest[0]
+                height, width = screen.getmaxyx()
+                lines = render(shown, width - 1, height)
+                for row, text in changed_rows(drawn, lines):
+                    screen.move(row, 0)
+                    screen.clrtoeol()
+                    screen.addstr(row, 0, text)
+                drawn = lines
+                screen.refresh()
+        finally:
+            stop.set()
+
+
+def session_rows(args):
+    for name in drmaa2.JobSession.iter_names():
+        yield dict(name=name)
+
+
+def job_rows(args):
+    if args.session:
+        session = drmaa2.JobSession.from_existing(args.session)
+        jobs = session.jobs()
+    else:
+        session = drmaa2.MonitoringSession()
+        jobs = session.jobs()
+    try:
+        for job in jobs:
+            row = dict(id=job.id, session=job.sessionName)
+            if args.state:
+                row["state"] = drmaa2.job_state(job).name
+            yield row
+    finally:
+        jobs.close()
+        session.close()
+
+
+def machine_rows(args):
+    with drmaa2.MonitoringSession() as monitor:
+        for machine in monitor.iter_machines():
+            row = machine._asdict()
+            for key in ("machineArch", "machineOS"):
+                row[key] = getattr(row[key], "name", row[key])
+            yield row
+
+
+def write_rows(rows, style, out):
+    """Write each row as soon as it arrives.
+
+    :param rows: Iterable of dicts.
+    :param style str: "json" for one array, "ndjson" for one object
+                      per line, or "text" for tab-separated values.
+    :param out: A text file.
+    """
+    if style == "json":
+        out.write("[")
+        separator = "\n"
+        for row in rows:
+            out.write(separator + json.dumps(row))
+            separator = ",\n"
+        out.write("\n]\n")
+    elif style == "ndjson":
+        for row in rows:
+            out.write(json.dumps(row) + "\n")
+    else:
+        for row in rows:
+            out.write("\t".join(str(v) for v in row.values()) + "\n")
+
+
+def batch_parser():
+    parser = argparse.ArgumentParser(
+        prog="clustermon",
+        description="Look at DRMAA2 sessions. Run with no command "
+                    "for an interactive shell.")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="Log debugging messages to stderr.")
+    commands = parser.add_subparsers(dest="command")
+    sessions = commands.add_parser("sessions", help="List job sessions.")
+    sessions.set_defaults(rows=session_rows)
+    jobs = commands.add_parser("jobs", help="List jobs.")
+    jobs.add_argument("--session",
+                      help="Only this job session. The default is all jobs.")
+    jobs.add_argument("--state", action="store_true",
+                      help="Ask for the state of each job, which is slower.")
+    jobs.set_defaults(rows=job_rows)
+    machines = commands.add_parser("machines", help="List machines.")
+    machines.set_defaults(rows=machine_rows)
+    for command in (sessions, jobs, machines):
+        style = command.add_mutually_exclusive_group()
+        style.add_argument("--json", dest="style", action="store_const",
+                           const="json", help="One JSON array.")
+        style.add_argument("--ndjson", dest="style", action="store_const",
+                           const="ndjson", help="One JSON object per line.")
+        command.set_defaults(style="text")
+    return parser
+
+
+def main(argv=None):
+    args = batch_parser().parse_args(argv)
+    if args.command is None:
+        logging.basicConfig(level=logging.DEBUG)
+        ClusterMonitor().cmdloop()
+        return
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARN)
+    try:
+        write_rows(args.rows(args), args.style, sys.stdout)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # Whoever reads our output, such as head, stopped reading.
+        # Point stdout at nothing so flushing at exit doesn't fail.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
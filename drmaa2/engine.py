@@ -0,0 +1,116 @@
+"""
+The engine makes the calls that decoding a list repeats for every
+entry, drmaa2_list_size and drmaa2_list_get. The default engine uses
+ctypes, like the rest of the package. If the cffi extension from
+drmaa2.cffi_build is compiled, then that engine is used instead,
+because it reads the entry pointers of a list a block at a time.
+Set DRMAA2_ENGINE=ctypes in the environment to choose ctypes anyway.
+Both engines return plain integer addresses, which the conversion
+strategies accept as they accept a c_void_p, and neither holds more
+than a block of them at once, however long the list.
+"""
+import logging
+import os
+from .interface import *
+
+
+LOGGER = logging.getLogger("drmaa2.engine")
+DRMAA_LIB = load_drmaa_library()
+
+
+class CtypesEngine:
+    name = "ctypes"
+
+    def __init__(self, library=None):
+        """
+        :param library: The library to call. By default, the package's.
+        """
+        self.library = library
+
+    @property
+    def _lib(self):
+        return self.library if self.library is not None else DRMAA_LIB
+
+    def list_size(self, list_ptr):
+        return self._lib.drmaa2_list_size(list_ptr)
+
+    def list_get(self, list_ptr, idx):
+        return self._lib.drmaa2_list_get(list_ptr, idx)
+
+    def list_addresses(self, list_ptr, size=None):
+        """Addresses of the entries of a list, read as you iterate.
+
+        :param list_ptr: The native list.
+        :param size int: The size, if you know it.
+        :return: A generator of int, or None for null entries.
+        """
+        if size is None:
+            size = self._lib.drmaa2_list_size(list_ptr)
+        list_get = self._lib.drmaa2_list_get
+        for idx in range(size):
+            yield list_get(list_ptr, idx)
+
+
+class CffiEngine:
+    name = "cffi"
+    block_size = 4096
+    """Most entry pointers to copy out of the list in one call."""
+
+    def __init__(self, module):
+        self.ffi = module.ffi
+        self.lib = module.lib
+
+    def _list(self, list_ptr):
+        return self.ffi.cast("drmaa2_list", list_ptr or 0)
+
+    def list_size(self, list_ptr):
+        return self.lib.drmaa2_list_size(self._list(list_ptr))
+
+    def list_get(self, list_ptr, idx):
+        address = int(self.ffi.cast(
+            "uintptr_t", self.lib.drmaa2_list_get(self._list(list_ptr), idx)))
+        return address or None
+
+    def list_addresses(self, list_ptr, size=None):
+        native = self._list(list_ptr)
+        if size is None:
+            size = self.lib.drmaa2_list_size(native)
+        if size <= 0:
+            return
+        out = self.ffi.new("uintptr_t[]", min(size, self.block_size))
+        for start in range(0, size, self.block_size):
+            written = self.lib.drmaa2py_list_addresses(
+                native, start, out, min(size - start, self.block_size))
+            for address in self.ffi.unpack(out, written):
+                yield address or None
+            if written < self.block_size:
+                return
+
+
+def load_engine(preferred=None):
+    """Choose how to call the hot list functions.
+
+    :param preferred str: "cffi" or "ctypes". The default comes from
+                          the DRMAA2_ENGINE environment variable,
+                          and otherwise is cffi if it is built.
+    :return: An engine, which is ctypes if cffi isn't available
+             or the package uses a Simulator.
+    """
+    from .simulator import Simulator
+    preferred = preferred or os.environ.get("DRMAA2_ENGINE", "cffi")
+    if preferred == "cffi" and isinstance(DRMAA_LIB, Simulator):
+        # The cffi engine calls libdrmaa2.so, which can't read
+        # the simulator's lists.
+        LOGGER.debug("Using ctypes to call the simulator.")
+    elif preferred == "cffi":
+        try:
+            from . import _drmaa2_cffi
+            return CffiEngine(_drmaa2_cffi)
+        except ImportError as err:
+            LOGGER.debug("No cffi engine, so using ctypes: {}".format(err))
+    elif preferred != "ctypes":
+        raise ValueError("Unknown DRMAA2_ENGINE {}".format(preferred))
+    return CtypesEngine()
+
+
+ENGINE = load_engine()
@@ -8,31 +8,35 @@ LOGGER = logging.getLogger("drmaa2.errors")
 DRMAA_LIB = interface.load_drmaa_library()
 
 
-def last_error():
+def last_error(library=None):
     """Gets the last error from DRMAA library.
 
+    :param library: The library to ask, if not the package's.
     :return str: The text of an error message.
     """
-    string_ptr = DRMAA_LIB.drmaa2_lasterror_text()
+    library = library if library is not None else DRMAA_LIB
+    string_ptr = library.drmaa2_lasterror_text()
     if string_ptr:
         message = string_ptr.value.decode()
-        DRMAA_LIB.drmaa2_string_free(string_ptr)
+        library.drmaa2_string_free(string_ptr)
     else:
         message = None
     return message
 
 
-def last_errno():
+def last_errno(library=None):
     """Gets the last error from DRMAA library.
 
+    :param library: The library to ask, if not the package's.
     :return int: The error number which will match the Error enum.
     """
-    return DRMAA_LIB.drmaa2_lasterror()
+    library = library if library is not None else DRMAA_LIB
+    return library.drmaa2_lasterror()
 
 
-def check_errno():
-    if last_errno() > 0:
-        raise DRMAA2Exception(last_error())
+def check_errno(library=None):
+    if last_errno(library) > 0:
+        raise DRMAA2Exception(last_error(library))
 
 
 class DRMAA2Exception(Exception):
@@ -97,8 +101,9 @@ class ImplementationSpecific(DRMAA2Exception):
     cannot be mapped to one of the other exceptions."""
 
 
-def CheckError(errval):
-    """Quick check of return values that throws a DRMAA2Exception."""
+def CheckError(errval, library=None):
+    """Quick check of return values that throws a DRMAA2Exception.
+    Pass the library that returned errval, if not the package's."""
     errs = {
         1: DeniedByDrms,
         2: DrmCommunication,
@@ -115,7 +120,7 @@ def CheckError(errval):
         13: ImplementationSpecific
     }
     if errval > 0:
-        err_text = last_error()
+        err_text = last_error(library)
         LOGGER.debug(err_text)
         if err_text:
             raise errs[errval](err_text)
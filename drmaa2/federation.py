@@ -0,0 +1,326 @@
+"""
+A FederatedSession submits to several Grid Engine cells from one
+process. Each Cluster loads its own copy of the library from its
+own SGE_ROOT, and the session sends each job to the cell where it
+should wait least, judged from a count of queued jobs in each cell
+that it takes again every so often::
+
+    clusters = [Cluster("east", "/opt/uge/east"),
+                Cluster("west", "/opt/uge/west", cell="west")]
+    with FederatedSession(clusters) as federation:
+        for idx in range(1000):
+            federation.run(job_template)
+        for idx in range(1000):
+            done = federation.wait_any_terminated(how_long="infinite")
+
+Each session, and each list of jobs to wait on, belongs to its
+cluster's library, so threads can talk to different cells at once.
+The session keeps one wait list per cluster of the jobs that it ran,
+and takes each job off as it returns it. A JobTemplate is a plain
+struct that every cell's library reads, so one template can go to any
+cell. Outside the session, Cluster.active points the whole package at
+a cluster's library, as for making a template when the package has no
+library of its own.
+"""
+import collections
+import itertools
+import logging
+import time
+from uuid import uuid4
+from .interface import (JState, ListType, Times, open_drmaa_library,
+                        using_environment, using_library)
+from .session import JobInfo, JobSession, MonitoringSession, job_info
+from .wrapping import DRMAA2List
+
+
+LOGGER = logging.getLogger("drmaa2.federation")
+
+
+ClusterJob = collections.namedtuple("ClusterJob", "cluster job")
+ClusterJob.__doc__ = """A Job and the name of the cluster that runs it."""
+
+ClusterLoad = collections.namedtuple("ClusterLoad",
+                                     "when pending running slots")
+ClusterLoad.__doc__ = """How busy a cluster was at a moment: how many jobs
+were queued and running, and how many cores its available machines have."""
+
+
+class Cluster:
+    """One Grid Engine cell and the library that talks to it."""
+    def __init__(self, name, sge_root=None, cell=None, library=None):
+        """
+        :param name str: What to call this cluster.
+        :param sge_root str: Where its Grid Engine is installed.
+        :param cell str: Its SGE_CELL, if it isn't the default.
+        :param library: An already loaded library, or a Simulator.
+                        By default, it loads from sge_root when first used.
+        """
+        self.name = name
+        self.sge_root = sge_root
+        self.cell = cell
+        self.library = library
+        self.environment = dict()
+        if sge_root:
+            self.environment["SGE_ROOT"] = str(sge_root)
+        if cell:
+            self.environment["SGE_CELL"] = cell
+
+    def __repr__(self):
+        return "Cluster({!r}, {!r})".format(self.name, self.sge_root)
+
+    def load(self):
+        """The cluster's library, which is loaded the first time.
+
+        :return: The library.
+        """
+        if self.library is None:
+            self.library = open_drmaa_library(self.sge_root)
+        return self.library
+
+    def job_session(self, name, **kwargs):
+        """Make a JobSession in this cluster. The arguments are those
+        of JobSession, except for the library."""
+        library = self.load()
+        with using_environment(self.environment):
+            return JobSession(name, library=library, **kwargs)
+
+    def monitoring_session(self):
+        """Open a MonitoringSession in this cluster."""
+        library = self.load()
+        with using_environment(self.environment):
+            return MonitoringSession(library=library)
+
+    def active(self):
+        """A context manager, within which the whole package uses this
+        cluster's library. Other threads that do the same wait."""
+        return using_library(self.load(), self.environment)
+
+
+def _count(monitoring_session, state):
+    job_filter = JobInfo(library=monitoring_session.library)
+    job_filter.jobState = state.name
+    return sum(len(chunk) for chunk in
+               monitoring_session.jobs(job_filter, chunk_size=4096))
+
+
+def measure(cluster, clock=time.monotonic):
+    """Ask a cluster how busy it is.
+
+    :param cluster Cluster: The cluster.
+    :return ClusterLoad: Its queued and running jobs and its cores.
+    """
+    with cluster.monitoring_session() as monitor:
+        pending = _count(monitor, JState.queued)
+        running = _count(monitor, JState.running)
+        slots = sum(m.sockets * m.coresPerSocket
+                    for m in monitor.iter_machines() if m.available)
+    return ClusterLoad(clock(), pending, running, slots)
+
+
+class FederatedSession:
+    """A job session in each of several clusters, which acts as one."""
+    def __init__(self, clusters, name=None, route="wait", refresh=30,
+                 poll_interval=1, keep=False, measure=measure,
+                 clock=time.monotonic):
+        """
+        :param clusters: A list of Cluster.
+        :param name str: The name of the job session in every cluster.
+        :param route str: "depth" sends each job to the cluster with
+            the fewest queued jobs. "wait" sends it to the cluster
+            where queued jobs per core, times how long jobs from this
+            session have run there, is least.
+        :param refresh float: Seconds before measuring clusters again.
+        :param poll_interval int: Seconds to wait in one cluster at a
+                                  time when waiting across clusters.
+        :param keep bool: Whether to keep the job sessions on close.
+        :param measure: Function from a Cluster to a ClusterLoad.
+        """
+        if route not in ("depth", "wait"):
+            raise ValueError("route must be depth or wait, not {}".format(
+                route))
+        self.clusters = collections.OrderedDict(
+            (cluster.name, cluster) for cluster in clusters)
+        self.name = name or uuid4().hex
+        self.route = route
+        self.refresh = refresh
+        self.poll_interval = max(int(poll_interval), 1)
+        self.keep = keep
+        self.measure = measure
+        self.clock = clock
+        self.sessions = dict()
+        self.loads = dict()
+        """From cluster name to its latest ClusterLoad."""
+        self.routed = collections.Counter()
+        """Jobs sent to each cluster since it was last measured."""
+        self.runtime = dict()
+        """From cluster name to a moving average of seconds that
+        jobs from this session ran there."""
+        self._rotation = itertools.cycle(list(self.clusters))
+        self._waiting = dict()
+        """From cluster name to a DRMAA2List of jobs that were run there
+        and not yet returned by a wait."""
+        for cluster in self.clusters.values():
+            self.sessions[cluster.name] = cluster.job_session(
+                self.name, keep=True)
+            self._waiting[cluster.name] = DRMAA2List(
+                [], ListType.joblist, indexed=True, library=cluster.library)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Close the job session in each cluster, and destroy them
+        unless this keeps them."""
+        for cluster_name, session in list(self.sessions.items()):
+            try:
+                session.close()
+                session.__del__()
+                if not self.keep:
+                    session.destroy()
+            except Exception as err:
+                LOGGER.warning("Could not close {} in {}: {}".format(
+                    self.name, cluster_name, err))
+            del self.sessions[cluster_name]
+            self._waiting.pop(cluster_name, None)
+
+    def _refresh(self):
+        now = self.clock()
+        for cluster_name, cluster in self.clusters.items():
+            load = self.loads.get(cluster_name)
+            if load is not None and now - load.when < self.refresh:
+                continue
+            try:
+                self.loads[cluster_name] = self.measure(cluster)
+                self.routed[cluster_name] = 0
+            except Exception as err:
+                LOGGER.warning("Could not measure {}: {}".format(
+                    cluster_name, err))
+
+    def predicted_wait(self, cluster_name):
+        """Seconds a new job might wait in a cluster's queue.
+
+        :return float: Zero if there are idle cores, infinity if the
+                       cluster couldn't be measured.
+        """
+        load = self.loads.get(cluster_name)
+        if load is None:
+            return float("inf")
+        ahead = load.pending + self.routed[cluster_name]
+        idle = load.slots - load.running - ahead
+        if idle > 0:
+            return 0.0
+        return ahead * self.runtime.get(cluster_name, 1.0) / max(load.slots, 1)
+
+    def choose(self):
+        """The name of the cluster that should get the next job."""
+        self._refresh()
+        if self.route == "depth":
+            def score(cluster_name):
+                load = self.loads.get(cluster_name)
+                if load is None:
+                    return float("inf")
+                return load.pending + self.routed[cluster_name]
+        else:
+            score = self.predicted_wait
+        # Ties go to the cluster listed first.
+        return min(self.clusters, key=score)
+
+    def run(self, job_template, cluster_name=None):
+        """Submit a job to the cluster where it should wait least.
+
+        :param job_template JobTemplate: The job.
+        :param cluster_name str: Send it here instead of choosing.
+        :return ClusterJob: The job and where it went.
+        """
+        cluster_name = cluster_name or self.choose()
+        job = self.sessions[cluster_name].run(job_template)
+        self._waiting[cluster_name].append(job)
+        self.routed[cluster_name] += 1
+        LOGGER.debug("Sent {} to {}".format(job, cluster_name))
+        return ClusterJob(cluster_name, job)
+
+    def _learn(self, cluster_name, job):
+        """Fold how long a finished job ran into the moving average."""
+        try:
+            seconds = job_info(
+                job, self.clusters[cluster_name].library).wallclockTime
+        except Exception as err:
+            LOGGER.debug("No run time for {}: {}".format(job, err))
+            return
+        if seconds is None or seconds < 0:
+            return
+        previous = self.runtime.get(cluster_name)
+        self.runtime[cluster_name] = (
+            seconds if previous is None else 0.9 * previous + 0.1 * seconds)
+
+    def wait_any_terminated(self, jobs=None, how_long=Times.infinite):
+        """The next job to finish, from any cluster. This checks every
+        cluster without waiting, then waits up to poll_interval in one
+        cluster at a time, in turn, until the time is up.
+        A job that this returns is no longer waited on by default.
+
+        :param jobs: ClusterJobs from run. By default, every job that
+                     was run and not yet returned.
+        :param how_long: Seconds, or Times.infinite, Times.now, or the
+                         string "infinite", "now", or "zero".
+        :return ClusterJob: The job, or None if none finished in time.
+        """
+        if isinstance(how_long, Times):
+            how_long = how_long.value
+        elif isinstance(how_long, str):
+            how_long = Times[how_long].value
+        if jobs is None:
+            by_cluster = self._waiting
+        else:
+            given = collections.defaultdict(list)
+            for cluster_job in jobs:
+                given[cluster_job.cluster].append(cluster_job.job)
+            # One native list per cluster for the whole wait.
+            by_cluster = {
+                cluster_name: DRMAA2List(
+                    cluster_jobs, ListType.joblist, indexed=True,
+                    library=self.clusters[cluster_name].library)
+                for (cluster_name, cluster_jobs) in given.items()}
+        by_cluster = {cluster_name: job_list for
+                      (cluster_name, job_list) in by_cluster.items()
+                      if len(job_list)}
+        if not by_cluster:
+            return None
+        if how_long == Times.infinite.value:
+            deadline = None
+        elif how_long in (Times.zero.value, Times.now.value):
+            deadline = self.clock()
+        else:
+            deadline = self.clock() + how_long
+        while True:
+            for cluster_name, job_list in by_cluster.items():
+                found = self._wait_in(cluster_name, job_list, Times.zero)
+                if found:
+                    return found
+            if deadline is None:
+                block = self.poll_interval
+            else:
+                block = min(self.poll_interval, int(deadline - self.clock()))
+                if block <= 0:
+                    return None
+            cluster_name = next(self._rotation)
+            while cluster_name not in by_cluster:
+                cluster_name = next(self._rotation)
+            found = self._wait_in(cluster_name, by_cluster[cluster_name],
+                                  block)
+            if found:
+                return found
+
+    def _wait_in(self, cluster_name, job_list, how_long):
+        job = self.sessions[cluster_name].wait_any_terminated(
+            job_list, how_long)
+        if job is None:
+            return None
+        waiting = self._waiting[cluster_name]
+        if job in waiting:
+            waiting.remove(job)
+        self._learn(cluster_name, job)
+        return ClusterJob(cluster_name, job)
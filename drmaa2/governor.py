@@ -0,0 +1,148 @@
+"""
+A submit-side governor that limits how many calls to
+drmaa2_jsession_run_job are in flight at once. The limit adapts to the
+latency and errors we observe from the qmaster, using additive increase,
+multiplicative decrease (AIMD), the same way TCP finds the width of a pipe.
+
+Use it in place of the session when many threads submit::
+
+    with JobSession() as js:
+        governor = SubmissionGovernor(js)
+        job = governor.run(job_template)
+
+Callers that can't get a slot wait in a first-come, first-served local queue.
+"""
+import collections
+import logging
+import threading
+import time
+
+
+LOGGER = logging.getLogger("drmaa2.governor")
+
+
+class SubmissionGovernor:
+    """Wraps a JobSession so that its run method is called by at most
+    ``limit`` threads at a time, where that limit moves up while
+    submissions are fast and successful and moves down when they
+    are slow or fail."""
+    def __init__(self, session, initial_limit=4, min_limit=1, max_limit=64,
+                 latency_target=1.0, backoff=0.5, window=1000):
+        """
+        :param session JobSession: Any object with a run(job_template)
+                                   method.
+        :param initial_limit int: How many concurrent submissions to start.
+        :param min_limit int: The limit never drops below this.
+        :param max_limit int: The limit never grows above this.
+        :param latency_target float: Seconds. A submission slower than this
+                                     counts as a sign of an overloaded
+                                     qmaster.
+        :param backoff float: Multiply the limit by this on a sign of load.
+        :param window int: How many recent latencies to keep for
+                           percentiles.
+        """
+        if not 0 < backoff < 1:
+            raise ValueError("backoff must be between 0 and 1")
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("Need 1 <= min_limit <= max_limit")
+        self.session = session
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._waiting = collections.deque()
+        self._latencies = collections.deque(maxlen=window)
+        self._submitted = 0
+        self._errors = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        """Current number of submissions allowed at once."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        """Number of submissions now waiting on the DRMAA library."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self):
+        """Number of templates waiting locally for a free slot."""
+        return len(self._waiting)
+
+    @property
+    def error_rate(self):
+        """Fraction of all submissions that raised an exception."""
+        if self._submitted:
+            return self._errors / self._submitted
+        else:
+            return 0.0
+
+    def latency_percentiles(self, percentiles=(50, 90, 99)):
+        """Latencies of recent submissions.
+
+        :param percentiles: An iterable of percentiles, from 0 to 100.
+        :return dict: From percentile to seconds, or empty if there
+                      have been no submissions.
+        """
+        with self._condition:
+            observed = sorted(self._latencies)
+        if not observed:
+            return dict()
+        result = dict()
+        last = len(observed) - 1
+        for percentile in percentiles:
+            rank = int(round(percentile / 100 * last))
+            result[percentile] = observed[min(max(rank, 0), last)]
+        return result
+
+    def run(self, job_template):
+        """Submit a job, waiting for a slot if too many are in flight.
+        Exceptions from the session pass through to the caller after
+        they have lowered the limit.
+
+        :param job_template JobTemplate: The template to submit.
+        :return Job: Whatever the session's run method returns.
+        """
+        self._acquire()
+        start = time.monotonic()
+        failed = True
+        try:
+            job = self.session.run(job_template)
+            failed = False
+        finally:
+            self._release(time.monotonic() - start, failed)
+        return job
+
+    def _acquire(self):
+        ticket = object()
+        with self._condition:
+            self._waiting.append(ticket)
+            while (self._waiting[0] is not ticket or
+                   self._in_flight >= int(self._limit)):
+                self._condition.wait()
+            self._waiting.popleft()
+            self._in_flight += 1
+            # The next waiter may also fit under the limit.
+            self._condition.notify_all()
+
+    def _release(self, latency, failed):
+        with self._condition:
+            self._in_flight -= 1
+            self._submitted += 1
+            self._latencies.append(latency)
+            if failed:
+                self._errors += 1
+            if failed or latency > self.latency_target:
+                self._limit = max(self._limit * self.backoff, self.min_limit)
+                LOGGER.debug("Governor backs off to {} after {}s".format(
+                    self.limit, latency))
+            else:
+                # Additive increase of one slot per limit's worth of
+                # successful submissions.
+                self._limit = min(self._limit + 1 / self._limit,
+                                  self.max_limit)
+            self._condition.notify_all()
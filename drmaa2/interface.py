@@ -13,9 +13,11 @@ import ctypes.util
 from ctypes import c_char_p, c_void_p, c_long, c_int, c_longlong, c_float
 from ctypes import POINTER, CFUNCTYPE, Structure, pointer, cast
 from enum import Enum
+import contextlib
 import os
 from pathlib import Path
 import logging
+import threading
 import warnings
 
 
@@ -307,25 +309,99 @@ class ResourceLimits(Enum):
 libc_name = ctypes.util.find_library("c")
 libc = ctypes.CDLL(libc_name)
 libc.memcmp.argtypes = (ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t)
+libc.memcmp.restype = c_int
+libc.strcmp.argtypes = (ctypes.c_void_p, ctypes.c_void_p)
+libc.strcmp.restype = c_int
+
+
+def same_string(a, b):
+    """Compares two char* given as integer addresses, either of which
+    may be NULL, without making Python strings from them."""
+    if a == b:
+        return True
+    elif not a or not b:
+        return False
+    else:
+        return libc.strcmp(a, b) == 0
 
 
 class CompareStructure(Structure):
+    """Structures that compare by value. Two structures of the same class
+    compare plain fields with memcmp, string fields with strcmp, and
+    nested structures recursively, stopping at the first difference.
+    Anything else, such as a Job namedtuple, is compared
+    field by field with getattr."""
+    @classmethod
+    def _comparison_plan(cls):
+        """Groups the fields into (kind, offset, size, name) once per class.
+        Neighboring plain fields with no padding between them become one
+        block so that a single memcmp covers them."""
+        if "_plan_" in cls.__dict__:
+            return cls._plan_
+        plan = list()
+        for (attr_name, field_type) in cls._fields_:
+            field = getattr(cls, attr_name)
+            if issubclass(field_type, c_char_p):
+                plan.append(("string", field.offset, field.size, attr_name))
+            elif issubclass(field_type, Structure):
+                plan.append(("struct", field.offset, field.size, attr_name))
+            elif (plan and plan[-1][0] == "plain" and
+                    plan[-1][1] + plan[-1][2] == field.offset):
+                kind, offset, size, name = plan[-1]
+                plan[-1] = (kind, offset, size + field.size, name)
+            else:
+                plan.append(("plain", field.offset, field.size, attr_name))
+        cls._plan_ = plan
+        return plan
+
     def __eq__(self, other):
-        same = True
+        if type(self) is not type(other):
+            return self._compare_attributes(other)
+        self_address = ctypes.addressof(self)
+        other_address = ctypes.addressof(other)
+        for (kind, offset, size, attr_name) in self._comparison_plan():
+            if kind == "plain":
+                if libc.memcmp(self_address + offset,
+                               other_address + offset, size) != 0:
+                    return False
+            elif kind == "string":
+                if not same_string(
+                        c_void_p.from_address(self_address + offset).value,
+                        c_void_p.from_address(other_address + offset).value):
+                    return False
+            elif getattr(self, attr_name) != getattr(other, attr_name):
+                return False
+        return True
+
+    def _compare_attributes(self, other):
         for (attr_name, _) in self._fields_:
             a, b = getattr(self, attr_name), getattr(other, attr_name)
             if isinstance(a, ctypes.Array):
                 if a[:] != b[:]:
-                    same = False
-                # or still True
+                    return False
             elif a != b:
-                same = False
-            # else still True
-        return same
+                return False
+        return True
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    def __hash__(self):
+        """Hashes the values of the fields. Strings hash as Python str,
+        so a DRMAA2_J hashes the same as the Job with the same values.
+        Pointers hash by address, as __eq__ compares them."""
+        key = list()
+        for (attr_name, _) in self._fields_:
+            value = getattr(self, attr_name)
+            if isinstance(value, c_char_p):
+                value = value.value.decode() if value.value else None
+            elif isinstance(value, ctypes.Array):
+                value = tuple(value[:])
+            elif isinstance(value, ctypes._Pointer):
+                value = ctypes.cast(value, c_void_p).value
+            key.append(value)
+        return hash(tuple(key))
+
 
 class DRMAA2_JINFO(CompareStructure):
     _fields_ = [("jobId", drmaa2_string),
@@ -445,7 +521,7 @@ class DRMAA2_MACHINEINFO(CompareStructure):
                 ("physMemory", c_longlong),
                 ("virtMemory", c_longlong),
                 ("machineArch", drmaa2_cpu),
-                ("machineOSVersion", DRMAA2_VERSION),
+                ("machineOSVersion", POINTER(DRMAA2_VERSION)),
                 ("machineOS", drmaa2_os),
                 ("implementationSpecific", c_void_p)]
 
@@ -487,293 +563,383 @@ def load_drmaa_library():
     if DRMAA_LIB:
         LOGGER.debug("Already have a DRMAA_LIB. Return it.")
         return DRMAA_LIB
+    if os.environ.get("DRMAA2_SIMULATE"):
+        LOGGER.debug("DRMAA2_SIMULATE is set, so use the simulator.")
+        from .simulator import Simulator
+        DRMAA_LIB = Simulator.from_environment()
+        return DRMAA_LIB
     try:
-        SGE_ROOT = Path(os.environ["SGE_ROOT"])
-        drmaa2_name = SGE_ROOT / "lib/lx-amd64" / "libdrmaa2.so"
-    except KeyError:
-        drmaa2_name = "libdrmaa2.so"
-        LOGGER.debug("There is no SGE_ROOT. Try the bare filename.")
-    try:
-        DRMAA_LIB = ctypes.cdll.LoadLibrary(str(drmaa2_name))
+        DRMAA_LIB = open_drmaa_library()
     except OSError:
         LOGGER.debug("Failed to load the library.")
         warnings.warn("Cannot open the DRMAA_LIB for DRMAA")
         return None
-    LOGGER.debug("Initializing DRMAA2")
+    return DRMAA_LIB
+
 
+def open_drmaa_library(sge_root=None):
+    """Load a copy of libdrmaa2.so and declare its functions.
+    Unlike load_drmaa_library, this doesn't make it the library
+    that the package uses. See using_library for that.
+
+    :param sge_root str: Where Grid Engine is installed. The default
+                         is $SGE_ROOT, and without either, the bare
+                         library name.
+    :return: The library.
+    :raises OSError: If it can't be loaded.
+    """
+    sge_root = sge_root or os.environ.get("SGE_ROOT")
+    if sge_root:
+        drmaa2_name = Path(sge_root) / "lib/lx-amd64" / "libdrmaa2.so"
+    else:
+        drmaa2_name = "libdrmaa2.so"
+        LOGGER.debug("There is no SGE_ROOT. Try the bare filename.")
+    lib = ctypes.cdll.LoadLibrary(str(drmaa2_name))
+    LOGGER.debug("Initializing DRMAA2 from {}".format(drmaa2_name))
+    _declare_functions(lib)
+    return lib
+
+
+def _declare_functions(lib):
     # The argument type is a c_void_p which takes any pointer.
     # Note well! Most free functions accept a pointer as argument.
     # This one accepts a pointer to a pointer. Fail to dereference,
     # and segmentation faults will result.
-    DRMAA_LIB.drmaa2_string_free.restype = None
-    DRMAA_LIB.drmaa2_string_free.argtypes = [POINTER(drmaa2_string)]
+    lib.drmaa2_string_free.restype = None
+    lib.drmaa2_string_free.argtypes = [POINTER(drmaa2_string)]
 
-    DRMAA_LIB.drmaa2_list_create.restype = drmaa2_list
-    DRMAA_LIB.drmaa2_list_create.argtypes =\
+    lib.drmaa2_list_create.restype = drmaa2_list
+    lib.drmaa2_list_create.argtypes =\
             [drmaa2_listtype, DRMAA2_LIST_ENTRYFREE]
-    DRMAA_LIB.drmaa2_list_free.restype = None
-    DRMAA_LIB.drmaa2_list_free.argtypes = [POINTER(drmaa2_list)]
-    DRMAA_LIB.drmaa2_list_get.restype = c_void_p
-    DRMAA_LIB.drmaa2_list_get.argtypes = [drmaa2_list, c_long]
-    DRMAA_LIB.drmaa2_list_add.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_list_add.argtypes = [drmaa2_list, c_void_p]
-    DRMAA_LIB.drmaa2_list_del.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_list_del.argtypes = [drmaa2_list, c_long]
-    DRMAA_LIB.drmaa2_list_size.restype = c_long
-    DRMAA_LIB.drmaa2_list_size.argtypes = [drmaa2_list]
-
-    DRMAA_LIB.drmaa2_lasterror.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_lasterror.argtypes = []
-    DRMAA_LIB.drmaa2_lasterror_text.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_lasterror_text.argtypes = []
+    lib.drmaa2_list_free.restype = None
+    lib.drmaa2_list_free.argtypes = [POINTER(drmaa2_list)]
+    lib.drmaa2_list_get.restype = c_void_p
+    lib.drmaa2_list_get.argtypes = [drmaa2_list, c_long]
+    lib.drmaa2_list_add.restype = drmaa2_error
+    lib.drmaa2_list_add.argtypes = [drmaa2_list, c_void_p]
+    lib.drmaa2_list_del.restype = drmaa2_error
+    lib.drmaa2_list_del.argtypes = [drmaa2_list, c_long]
+    lib.drmaa2_list_size.restype = c_long
+    lib.drmaa2_list_size.argtypes = [drmaa2_list]
+
+    lib.drmaa2_lasterror.restype = drmaa2_error
+    lib.drmaa2_lasterror.argtypes = []
+    lib.drmaa2_lasterror_text.restype = drmaa2_string
+    lib.drmaa2_lasterror_text.argtypes = []
 
     # Nonstandard
-    DRMAA_LIB.uge_drmaa2_list_free_root.restype = None
-    DRMAA_LIB.uge_drmaa2_list_free_root.argtypes = [POINTER(drmaa2_list)]
+    lib.uge_drmaa2_list_free_root.restype = None
+    lib.uge_drmaa2_list_free_root.argtypes = [POINTER(drmaa2_list)]
     # Nonstandard
-    DRMAA_LIB.uge_drmaa2_list_set.restype = drmaa2_error
-    DRMAA_LIB.uge_drmaa2_list_set.argtypes = [drmaa2_list, c_long, c_void_p]
-
-    DRMAA_LIB.drmaa2_dict_create.restype = drmaa2_dict
-    DRMAA_LIB.drmaa2_dict_create.argtypes = [DRMAA2_DICT_ENTRYFREE]
-    DRMAA_LIB.drmaa2_dict_free.restype = None
-    DRMAA_LIB.drmaa2_dict_free.argtypes = [POINTER(drmaa2_dict)]
-    DRMAA_LIB.drmaa2_dict_list.restype = drmaa2_string_list
-    DRMAA_LIB.drmaa2_dict_list.argtypes = [drmaa2_dict]
-    DRMAA_LIB.drmaa2_dict_has.restype = drmaa2_bool
-    DRMAA_LIB.drmaa2_dict_has.argtypes = [drmaa2_dict, c_char_p]
-    DRMAA_LIB.drmaa2_dict_get.restype = c_char_p
-    DRMAA_LIB.drmaa2_dict_get.argtypes = [drmaa2_dict, c_char_p]
-    DRMAA_LIB.drmaa2_dict_del.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_dict_del.argtypes = [drmaa2_dict, c_char_p]
-    DRMAA_LIB.drmaa2_dict_set.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_dict_set.argtypes = [drmaa2_dict, c_char_p]
-
-    DRMAA_LIB.drmaa2_jinfo_create.restype = POINTER(DRMAA2_JINFO)
-    DRMAA_LIB.drmaa2_jinfo_create.argtypes = []
-    DRMAA_LIB.drmaa2_jinfo_free.restype = None
-    DRMAA_LIB.drmaa2_jinfo_free.argtypes = [POINTER(POINTER(DRMAA2_JINFO))]
-
-    DRMAA_LIB.drmaa2_slotinfo_free.restype = None
-    DRMAA_LIB.drmaa2_slotinfo_free.argtypes = [
+    lib.uge_drmaa2_list_set.restype = drmaa2_error
+    lib.uge_drmaa2_list_set.argtypes = [drmaa2_list, c_long, c_void_p]
+
+    lib.drmaa2_dict_create.restype = drmaa2_dict
+    lib.drmaa2_dict_create.argtypes = [DRMAA2_DICT_ENTRYFREE]
+    lib.drmaa2_dict_free.restype = None
+    lib.drmaa2_dict_free.argtypes = [POINTER(drmaa2_dict)]
+    lib.drmaa2_dict_list.restype = drmaa2_string_list
+    lib.drmaa2_dict_list.argtypes = [drmaa2_dict]
+    lib.drmaa2_dict_has.restype = drmaa2_bool
+    lib.drmaa2_dict_has.argtypes = [drmaa2_dict, c_char_p]
+    lib.drmaa2_dict_get.restype = c_char_p
+    lib.drmaa2_dict_get.argtypes = [drmaa2_dict, c_char_p]
+    lib.drmaa2_dict_del.restype = drmaa2_error
+    lib.drmaa2_dict_del.argtypes = [drmaa2_dict, c_char_p]
+    lib.drmaa2_dict_set.restype = drmaa2_error
+    lib.drmaa2_dict_set.argtypes = [drmaa2_dict, c_char_p]
+
+    lib.drmaa2_jinfo_create.restype = POINTER(DRMAA2_JINFO)
+    lib.drmaa2_jinfo_create.argtypes = []
+    lib.drmaa2_jinfo_free.restype = None
+    lib.drmaa2_jinfo_free.argtypes = [POINTER(POINTER(DRMAA2_JINFO))]
+
+    lib.drmaa2_slotinfo_free.restype = None
+    lib.drmaa2_slotinfo_free.argtypes = [
         POINTER(POINTER(DRMAA2_SLOTINFO))]
 
-    DRMAA_LIB.drmaa2_rinfo_free.restype = None
-    DRMAA_LIB.drmaa2_rinfo_free.argtypes = [POINTER(POINTER(DRMAA2_RINFO))]
+    lib.drmaa2_rinfo_free.restype = None
+    lib.drmaa2_rinfo_free.argtypes = [POINTER(POINTER(DRMAA2_RINFO))]
 
-    DRMAA_LIB.drmaa2_jtemplate_create.restype = POINTER(DRMAA2_JTEMPLATE)
-    DRMAA_LIB.drmaa2_jtemplate_create.argtypes = []
-    DRMAA_LIB.drmaa2_jtemplate_free.restype = None
-    DRMAA_LIB.drmaa2_jtemplate_free.argtypes = [
+    lib.drmaa2_jtemplate_create.restype = POINTER(DRMAA2_JTEMPLATE)
+    lib.drmaa2_jtemplate_create.argtypes = []
+    lib.drmaa2_jtemplate_free.restype = None
+    lib.drmaa2_jtemplate_free.argtypes = [
         POINTER(POINTER(DRMAA2_JTEMPLATE))]
 
-    DRMAA_LIB.drmaa2_rtemplate_create.restype = POINTER(DRMAA2_RTEMPLATE)
-    DRMAA_LIB.drmaa2_rtemplate_create.argtypes = []
-    DRMAA_LIB.drmaa2_rtemplate_free.restype = None
-    DRMAA_LIB.drmaa2_rtemplate_free.argtypes = [
+    lib.drmaa2_rtemplate_create.restype = POINTER(DRMAA2_RTEMPLATE)
+    lib.drmaa2_rtemplate_create.argtypes = []
+    lib.drmaa2_rtemplate_free.restype = None
+    lib.drmaa2_rtemplate_free.argtypes = [
         POINTER(POINTER(DRMAA2_RTEMPLATE))]
 
-    DRMAA_LIB.drmaa2_notification_free.restype = None
-    DRMAA_LIB.drmaa2_notification_free.argtypes = [
+    lib.drmaa2_notification_free.restype = None
+    lib.drmaa2_notification_free.argtypes = [
         POINTER(POINTER(DRMAA2_NOTIFICATION))]
 
-    DRMAA_LIB.drmaa2_queueinfo_free.restype = None
-    DRMAA_LIB.drmaa2_queueinfo_free.argtypes = [
+    lib.drmaa2_queueinfo_free.restype = None
+    lib.drmaa2_queueinfo_free.argtypes = [
         POINTER(POINTER(DRMAA2_QUEUEINFO))]
 
-    DRMAA_LIB.drmaa2_version_free.restype = None
-    DRMAA_LIB.drmaa2_version_free.argtypes = [POINTER(POINTER(DRMAA2_VERSION))]
+    lib.drmaa2_version_free.restype = None
+    lib.drmaa2_version_free.argtypes = [POINTER(POINTER(DRMAA2_VERSION))]
 
-    DRMAA_LIB.drmaa2_machineinfo_free.restype = None
-    DRMAA_LIB.drmaa2_machineinfo_free.argtypes = [
+    lib.drmaa2_machineinfo_free.restype = None
+    lib.drmaa2_machineinfo_free.argtypes = [
         POINTER(POINTER(DRMAA2_MACHINEINFO))]
 
     # These are dynamic queries to discover what other members
     # these structs have on this platform.
-    DRMAA_LIB.drmaa2_jtemplate_impl_spec.restype = drmaa2_string_list
-    DRMAA_LIB.drmaa2_jtemplate_impl_spec.argtypes = []
-    DRMAA_LIB.drmaa2_jinfo_impl_spec.restype = drmaa2_string_list
-    DRMAA_LIB.drmaa2_jinfo_impl_spec.argtypes = []
-    DRMAA_LIB.drmaa2_rtemplate_impl_spec.restype = drmaa2_string_list
-    DRMAA_LIB.drmaa2_rtemplate_impl_spec.argtypes = []
-    DRMAA_LIB.drmaa2_rinfo_impl_spec.restype = drmaa2_string_list
-    DRMAA_LIB.drmaa2_rinfo_impl_spec.argtypes = []
-    DRMAA_LIB.drmaa2_queueinfo_impl_spec.restype = drmaa2_string_list
-    DRMAA_LIB.drmaa2_queueinfo_impl_spec.argtypes = []
-    DRMAA_LIB.drmaa2_machineinfo_impl_spec.restype = drmaa2_string_list
-    DRMAA_LIB.drmaa2_machineinfo_impl_spec.argtypes = []
-    DRMAA_LIB.drmaa2_notification_impl_spec.restype = drmaa2_string_list
-    DRMAA_LIB.drmaa2_notification_impl_spec.argtypes = []
-
-    DRMAA_LIB.drmaa2_get_instance_value.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_get_instance_value.argtypes = [c_void_p, c_char_p]
-    DRMAA_LIB.drmaa2_describe_attribute.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_describe_attribute.argtypes = [c_void_p, c_char_p]
-    DRMAA_LIB.drmaa2_set_instance_value.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_set_instance_value.argtypes = [c_void_p,
+    lib.drmaa2_jtemplate_impl_spec.restype = drmaa2_string_list
+    lib.drmaa2_jtemplate_impl_spec.argtypes = []
+    lib.drmaa2_jinfo_impl_spec.restype = drmaa2_string_list
+    lib.drmaa2_jinfo_impl_spec.argtypes = []
+    lib.drmaa2_rtemplate_impl_spec.restype = drmaa2_string_list
+    lib.drmaa2_rtemplate_impl_spec.argtypes = []
+    lib.drmaa2_rinfo_impl_spec.restype = drmaa2_string_list
+    lib.drmaa2_rinfo_impl_spec.argtypes = []
+    lib.drmaa2_queueinfo_impl_spec.restype = drmaa2_string_list
+    lib.drmaa2_queueinfo_impl_spec.argtypes = []
+    lib.drmaa2_machineinfo_impl_spec.restype = drmaa2_string_list
+    lib.drmaa2_machineinfo_impl_spec.argtypes = []
+    lib.drmaa2_notification_impl_spec.restype = drmaa2_string_list
+    lib.drmaa2_notification_impl_spec.argtypes = []
+
+    lib.drmaa2_get_instance_value.restype = drmaa2_string
+    lib.drmaa2_get_instance_value.argtypes = [c_void_p, c_char_p]
+    lib.drmaa2_describe_attribute.restype = drmaa2_string
+    lib.drmaa2_describe_attribute.argtypes = [c_void_p, c_char_p]
+    lib.drmaa2_set_instance_value.restype = drmaa2_error
+    lib.drmaa2_set_instance_value.argtypes = [c_void_p,
                                                     c_char_p, c_char_p]
 
-    DRMAA_LIB.drmaa2_jsession_free.restype = None
-    DRMAA_LIB.drmaa2_jsession_free.argtypes = [
+    lib.drmaa2_jsession_free.restype = None
+    lib.drmaa2_jsession_free.argtypes = [
         POINTER(POINTER(DRMAA2_JSESSION))]
-    DRMAA_LIB.drmaa2_rsession_free.restype = None
-    DRMAA_LIB.drmaa2_rsession_free.argtypes = [
-        POINTER(POINTER(drmaa2_rsession))]
-    DRMAA_LIB.drmaa2_msession_free.restype = None
-    DRMAA_LIB.drmaa2_msession_free.argtypes = [
+    lib.drmaa2_rsession_free.restype = None
+    lib.drmaa2_rsession_free.argtypes = [POINTER(drmaa2_rsession)]
+    lib.drmaa2_msession_free.restype = None
+    lib.drmaa2_msession_free.argtypes = [
         POINTER(POINTER(DRMAA2_MSESSION))]
-    DRMAA_LIB.drmaa2_j_free.restype = None
-    DRMAA_LIB.drmaa2_j_free.argtypes = [
+    lib.drmaa2_j_free.restype = None
+    lib.drmaa2_j_free.argtypes = [
         POINTER(POINTER(DRMAA2_J))]
-    DRMAA_LIB.drmaa2_jarray_free.restype = None
-    DRMAA_LIB.drmaa2_jarray_free.argtypes = [
+    lib.drmaa2_jarray_free.restype = None
+    lib.drmaa2_jarray_free.argtypes = [
         POINTER(POINTER(DRMAA2_JARRAY))]
     # These are in the header drmaa2.h but not libdrmaa2.so.
-    # DRMAA_LIB.drmaa2_r_free.restype = None
-    # DRMAA_LIB.drmaa2_r_free.argtypes = [POINTER(drmaa2_r)]
+    # lib.drmaa2_r_free.restype = None
+    # lib.drmaa2_r_free.argtypes = [POINTER(drmaa2_r)]
 
-    DRMAA_LIB.drmaa2_rsession_get_contact.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_rsession_get_contact.argtypes = [drmaa2_rsession]
-    DRMAA_LIB.drmaa2_rsession_get_session_name.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_rsession_get_session_name.argtypes = [
+    lib.drmaa2_rsession_get_contact.restype = drmaa2_string
+    lib.drmaa2_rsession_get_contact.argtypes = [drmaa2_rsession]
+    lib.drmaa2_rsession_get_session_name.restype = drmaa2_string
+    lib.drmaa2_rsession_get_session_name.argtypes = [
         drmaa2_rsession]
-    DRMAA_LIB.drmaa2_rsession_get_reservation.restype = drmaa2_r
-    DRMAA_LIB.drmaa2_rsession_get_reservation.argtypes = [
+    lib.drmaa2_rsession_get_reservation.restype = drmaa2_r
+    lib.drmaa2_rsession_get_reservation.argtypes = [
         drmaa2_rsession]
-    DRMAA_LIB.drmaa2_rsession_request_reservation.restype = drmaa2_r
-    DRMAA_LIB.drmaa2_rsession_request_reservation.argtypes = [
+    lib.drmaa2_rsession_request_reservation.restype = drmaa2_r
+    lib.drmaa2_rsession_request_reservation.argtypes = [
         drmaa2_rsession, POINTER(DRMAA2_RTEMPLATE)
     ]
-    DRMAA_LIB.drmaa2_rsession_get_reservations.restype = drmaa2_r_list
-    DRMAA_LIB.drmaa2_rsession_get_reservations.argtypes = [
+    lib.drmaa2_rsession_get_reservations.restype = drmaa2_r_list
+    lib.drmaa2_rsession_get_reservations.argtypes = [
         drmaa2_rsession]
 
-    DRMAA_LIB.drmaa2_r_get_id.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_r_get_id.argtypes = [drmaa2_r]
-    DRMAA_LIB.drmaa2_r_get_session_name.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_r_get_session_name.argtypes = [drmaa2_r]
-    DRMAA_LIB.drmaa2_r_get_reservation_template.restype = \
+    lib.drmaa2_r_get_id.restype = drmaa2_string
+    lib.drmaa2_r_get_id.argtypes = [drmaa2_r]
+    lib.drmaa2_r_get_session_name.restype = drmaa2_string
+    lib.drmaa2_r_get_session_name.argtypes = [drmaa2_r]
+    lib.drmaa2_r_get_reservation_template.restype = \
         POINTER(DRMAA2_RTEMPLATE)
-    DRMAA_LIB.drmaa2_r_get_reservation_template.argtypes = [drmaa2_r]
-    DRMAA_LIB.drmaa2_r_get_info.restype = POINTER(DRMAA2_RINFO)
-    DRMAA_LIB.drmaa2_r_get_info.argtypes = [drmaa2_r]
-    DRMAA_LIB.drmaa2_r_terminate.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_r_terminate.argtypes = [drmaa2_r]
-
-    DRMAA_LIB.drmaa2_jarray_get_id.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_jarray_get_id.argtypes = [POINTER(DRMAA2_JARRAY)]
-    DRMAA_LIB.drmaa2_jarray_get_jobs.restype = drmaa2_j_list
-    DRMAA_LIB.drmaa2_jarray_get_jobs.argtypes = [POINTER(DRMAA2_JARRAY)]
-    DRMAA_LIB.drmaa2_jarray_get_session_name.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_jarray_get_session_name.argtypes = [POINTER(DRMAA2_JARRAY)]
-    DRMAA_LIB.drmaa2_jarray_get_jtemplate.restype = POINTER(DRMAA2_JTEMPLATE)
-    DRMAA_LIB.drmaa2_jarray_get_jtemplate.argtypes = [POINTER(DRMAA2_JARRAY)]
-    DRMAA_LIB.drmaa2_jarray_suspend.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_jarray_suspend.argtypes = [POINTER(DRMAA2_JARRAY)]
-    DRMAA_LIB.drmaa2_jarray_resume.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_jarray_resume.argtypes = [POINTER(DRMAA2_JARRAY)]
-    DRMAA_LIB.drmaa2_jarray_hold.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_jarray_hold.argtypes = [POINTER(DRMAA2_JARRAY)]
-    DRMAA_LIB.drmaa2_jarray_release.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_jarray_release.argtypes = [POINTER(DRMAA2_JARRAY)]
-    DRMAA_LIB.drmaa2_jarray_terminate.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_jarray_terminate.argtypes = [POINTER(DRMAA2_JARRAY)]
-
-    DRMAA_LIB.drmaa2_jsession_get_contact.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_jsession_get_contact.argtypes = [
+    lib.drmaa2_r_get_reservation_template.argtypes = [drmaa2_r]
+    lib.drmaa2_r_get_info.restype = POINTER(DRMAA2_RINFO)
+    lib.drmaa2_r_get_info.argtypes = [drmaa2_r]
+    lib.drmaa2_r_terminate.restype = drmaa2_error
+    lib.drmaa2_r_terminate.argtypes = [drmaa2_r]
+
+    lib.drmaa2_jarray_get_id.restype = drmaa2_string
+    lib.drmaa2_jarray_get_id.argtypes = [POINTER(DRMAA2_JARRAY)]
+    lib.drmaa2_jarray_get_jobs.restype = drmaa2_j_list
+    lib.drmaa2_jarray_get_jobs.argtypes = [POINTER(DRMAA2_JARRAY)]
+    lib.drmaa2_jarray_get_session_name.restype = drmaa2_string
+    lib.drmaa2_jarray_get_session_name.argtypes = [POINTER(DRMAA2_JARRAY)]
+    lib.drmaa2_jarray_get_jtemplate.restype = POINTER(DRMAA2_JTEMPLATE)
+    lib.drmaa2_jarray_get_jtemplate.argtypes = [POINTER(DRMAA2_JARRAY)]
+    lib.drmaa2_jarray_suspend.restype = drmaa2_error
+    lib.drmaa2_jarray_suspend.argtypes = [POINTER(DRMAA2_JARRAY)]
+    lib.drmaa2_jarray_resume.restype = drmaa2_error
+    lib.drmaa2_jarray_resume.argtypes = [POINTER(DRMAA2_JARRAY)]
+    lib.drmaa2_jarray_hold.restype = drmaa2_error
+    lib.drmaa2_jarray_hold.argtypes = [POINTER(DRMAA2_JARRAY)]
+    lib.drmaa2_jarray_release.restype = drmaa2_error
+    lib.drmaa2_jarray_release.argtypes = [POINTER(DRMAA2_JARRAY)]
+    lib.drmaa2_jarray_terminate.restype = drmaa2_error
+    lib.drmaa2_jarray_terminate.argtypes = [POINTER(DRMAA2_JARRAY)]
+
+    lib.drmaa2_jsession_get_contact.restype = drmaa2_string
+    lib.drmaa2_jsession_get_contact.argtypes = [
         POINTER(DRMAA2_JSESSION)]
-    DRMAA_LIB.drmaa2_jsession_get_session_name.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_jsession_get_session_name.argtypes = [
+    lib.drmaa2_jsession_get_session_name.restype = drmaa2_string
+    lib.drmaa2_jsession_get_session_name.argtypes = [
         POINTER(DRMAA2_JSESSION)]
-    DRMAA_LIB.drmaa2_jsession_get_job_categories.restype = drmaa2_string_list
-    DRMAA_LIB.drmaa2_jsession_get_job_categories.argtypes = [
+    lib.drmaa2_jsession_get_job_categories.restype = drmaa2_string_list
+    lib.drmaa2_jsession_get_job_categories.argtypes = [
         POINTER(DRMAA2_JSESSION)]
-    DRMAA_LIB.drmaa2_jsession_get_jobs.restype = drmaa2_j_list
-    DRMAA_LIB.drmaa2_jsession_get_jobs.argtypes = [POINTER(DRMAA2_JSESSION),
+    lib.drmaa2_jsession_get_jobs.restype = drmaa2_j_list
+    lib.drmaa2_jsession_get_jobs.argtypes = [POINTER(DRMAA2_JSESSION),
                                                    POINTER(DRMAA2_JINFO)]
-    DRMAA_LIB.drmaa2_jsession_get_job_array.restype = POINTER(DRMAA2_JARRAY)
-    DRMAA_LIB.drmaa2_jsession_get_job_array.argtypes = [
+    lib.drmaa2_jsession_get_job_array.restype = POINTER(DRMAA2_JARRAY)
+    lib.drmaa2_jsession_get_job_array.argtypes = [
         POINTER(DRMAA2_JSESSION), drmaa2_string]
-    DRMAA_LIB.drmaa2_jsession_run_job.restype = POINTER(DRMAA2_J)
-    DRMAA_LIB.drmaa2_jsession_run_job.argtypes = [POINTER(DRMAA2_JSESSION),
+    lib.drmaa2_jsession_run_job.restype = POINTER(DRMAA2_J)
+    lib.drmaa2_jsession_run_job.argtypes = [POINTER(DRMAA2_JSESSION),
                                                   POINTER(DRMAA2_JTEMPLATE)]
-    DRMAA_LIB.drmaa2_jsession_run_bulk_jobs.restype = POINTER(DRMAA2_JARRAY)
-    DRMAA_LIB.drmaa2_jsession_run_bulk_jobs.argtypes = [
+    lib.drmaa2_jsession_run_bulk_jobs.restype = POINTER(DRMAA2_JARRAY)
+    lib.drmaa2_jsession_run_bulk_jobs.argtypes = [
         POINTER(DRMAA2_JSESSION), POINTER(DRMAA2_JTEMPLATE),
         c_longlong, c_longlong, c_longlong, c_longlong]
-    DRMAA_LIB.drmaa2_jsession_wait_any_started.restype = POINTER(DRMAA2_J)
-    DRMAA_LIB.drmaa2_jsession_wait_any_started.argtypes = [
+    lib.drmaa2_jsession_wait_any_started.restype = POINTER(DRMAA2_J)
+    lib.drmaa2_jsession_wait_any_started.argtypes = [
         POINTER(DRMAA2_JSESSION), drmaa2_j_list, drmaa2_time]
-    DRMAA_LIB.drmaa2_jsession_wait_any_terminated.restype = POINTER(DRMAA2_J)
-    DRMAA_LIB.drmaa2_jsession_wait_any_terminated.argtypes = [
+    lib.drmaa2_jsession_wait_any_terminated.restype = POINTER(DRMAA2_J)
+    lib.drmaa2_jsession_wait_any_terminated.argtypes = [
         POINTER(DRMAA2_JSESSION), drmaa2_j_list, drmaa2_time]
-    DRMAA_LIB.drmaa2_j_suspend.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_j_suspend.argtypes = [POINTER(DRMAA2_J)]
-    DRMAA_LIB.drmaa2_j_resume.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_j_resume.argtypes = [POINTER(DRMAA2_J)]
-    DRMAA_LIB.drmaa2_j_release.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_j_release.argtypes = [POINTER(DRMAA2_J)]
-    DRMAA_LIB.drmaa2_j_terminate.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_j_terminate.argtypes = [POINTER(DRMAA2_J)]
-    DRMAA_LIB.drmaa2_j_reap.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_j_reap.argtypes = [POINTER(DRMAA2_J)]
-    DRMAA_LIB.drmaa2_j_get_id.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_j_get_id.argtypes = [POINTER(DRMAA2_J)]
-    DRMAA_LIB.drmaa2_j_get_jtemplate.restype = POINTER(DRMAA2_JTEMPLATE)
-    DRMAA_LIB.drmaa2_j_get_jtemplate.argtypes = [POINTER(DRMAA2_J)]
-    DRMAA_LIB.drmaa2_j_get_state.restype = drmaa2_jstate
-    DRMAA_LIB.drmaa2_j_get_state.argtypes = [POINTER(DRMAA2_J)]
-    DRMAA_LIB.drmaa2_j_get_info.restype = POINTER(DRMAA2_JINFO)
-    DRMAA_LIB.drmaa2_j_get_info.argtypes = [POINTER(DRMAA2_J)]
-    DRMAA_LIB.drmaa2_j_wait_started.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_j_wait_started.argtypes = [POINTER(DRMAA2_J), drmaa2_time]
-    DRMAA_LIB.drmaa2_j_wait_terminated.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_j_wait_terminated.argtypes = [POINTER(DRMAA2_J)]
-
-    DRMAA_LIB.drmaa2_msession_get_all_reservations.restype = drmaa2_r_list
-    DRMAA_LIB.drmaa2_msession_get_all_reservations.argtypes = [
+    lib.drmaa2_j_suspend.restype = drmaa2_error
+    lib.drmaa2_j_suspend.argtypes = [POINTER(DRMAA2_J)]
+    lib.drmaa2_j_resume.restype = drmaa2_error
+    lib.drmaa2_j_resume.argtypes = [POINTER(DRMAA2_J)]
+    lib.drmaa2_j_hold.restype = drmaa2_error
+    lib.drmaa2_j_hold.argtypes = [POINTER(DRMAA2_J)]
+    lib.drmaa2_j_release.restype = drmaa2_error
+    lib.drmaa2_j_release.argtypes = [POINTER(DRMAA2_J)]
+    lib.drmaa2_j_terminate.restype = drmaa2_error
+    lib.drmaa2_j_terminate.argtypes = [POINTER(DRMAA2_J)]
+    lib.drmaa2_j_reap.restype = drmaa2_error
+    lib.drmaa2_j_reap.argtypes = [POINTER(DRMAA2_J)]
+    lib.drmaa2_j_get_id.restype = drmaa2_string
+    lib.drmaa2_j_get_id.argtypes = [POINTER(DRMAA2_J)]
+    lib.drmaa2_j_get_jtemplate.restype = POINTER(DRMAA2_JTEMPLATE)
+    lib.drmaa2_j_get_jtemplate.argtypes = [POINTER(DRMAA2_J)]
+    lib.drmaa2_j_get_state.restype = drmaa2_jstate
+    lib.drmaa2_j_get_state.argtypes = [POINTER(DRMAA2_J),
+                                             POINTER(drmaa2_string)]
+    lib.drmaa2_j_get_info.restype = POINTER(DRMAA2_JINFO)
+    lib.drmaa2_j_get_info.argtypes = [POINTER(DRMAA2_J)]
+    lib.drmaa2_j_wait_started.restype = drmaa2_error
+    lib.drmaa2_j_wait_started.argtypes = [POINTER(DRMAA2_J), drmaa2_time]
+    lib.drmaa2_j_wait_terminated.restype = drmaa2_error
+    lib.drmaa2_j_wait_terminated.argtypes = [POINTER(DRMAA2_J),
+                                                   drmaa2_time]
+
+    lib.drmaa2_msession_get_all_reservations.restype = drmaa2_r_list
+    lib.drmaa2_msession_get_all_reservations.argtypes = [
         POINTER(DRMAA2_MSESSION)]
-    DRMAA_LIB.drmaa2_msession_get_all_jobs.restype = drmaa2_j_list
-    DRMAA_LIB.drmaa2_msession_get_all_jobs.argtypes = [POINTER(DRMAA2_MSESSION),
+    lib.drmaa2_msession_get_all_jobs.restype = drmaa2_j_list
+    lib.drmaa2_msession_get_all_jobs.argtypes = [POINTER(DRMAA2_MSESSION),
                                                        POINTER(DRMAA2_JINFO)]
-    DRMAA_LIB.drmaa2_msession_get_all_queues.restype = drmaa2_queueinfo_list
-    DRMAA_LIB.drmaa2_msession_get_all_queues.argtypes = [
+    lib.drmaa2_msession_get_all_queues.restype = drmaa2_queueinfo_list
+    lib.drmaa2_msession_get_all_queues.argtypes = [
         POINTER(DRMAA2_MSESSION), drmaa2_string_list]
-    DRMAA_LIB.drmaa2_msession_get_all_machines.restype = drmaa2_machineinfo_list
-    DRMAA_LIB.drmaa2_msession_get_all_machines.argtypes = [
+    lib.drmaa2_msession_get_all_machines.restype = drmaa2_machineinfo_list
+    lib.drmaa2_msession_get_all_machines.argtypes = [
         POINTER(DRMAA2_MSESSION), drmaa2_string_list]
 
-    DRMAA_LIB.drmaa2_get_drms_name.restype = drmaa2_string
-    DRMAA_LIB.drmaa2_get_drms_name.argtypes = []
-    DRMAA_LIB.drmaa2_get_drms_version.restype = POINTER(DRMAA2_VERSION)
-    DRMAA_LIB.drmaa2_get_drms_version.argtypes = []
-    DRMAA_LIB.drmaa2_supports.restype = drmaa2_bool
-    DRMAA_LIB.drmaa2_supports.argtypes = [drmaa2_capability]
-    DRMAA_LIB.drmaa2_create_jsession.restype = POINTER(DRMAA2_JSESSION)
-    DRMAA_LIB.drmaa2_create_jsession.argtypes = [c_char_p, c_char_p]
-    DRMAA_LIB.drmaa2_create_rsession.restype = drmaa2_rsession
-    DRMAA_LIB.drmaa2_create_rsession.argtypes = [c_char_p, c_char_p]
-    DRMAA_LIB.drmaa2_open_jsession.restype = POINTER(DRMAA2_JSESSION)
-    DRMAA_LIB.drmaa2_open_jsession.argtypes = [c_char_p]
-    DRMAA_LIB.drmaa2_open_rsession.restype = drmaa2_rsession
-    DRMAA_LIB.drmaa2_open_rsession.argtypes = [c_char_p]
-    DRMAA_LIB.drmaa2_open_msession.restype = POINTER(DRMAA2_MSESSION)
-    DRMAA_LIB.drmaa2_open_msession.argtypes = [c_char_p]
-    DRMAA_LIB.drmaa2_close_jsession.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_close_jsession.argtypes = [POINTER(DRMAA2_JSESSION)]
-    DRMAA_LIB.drmaa2_close_rsession.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_close_rsession.argtypes = [drmaa2_rsession]
-    DRMAA_LIB.drmaa2_close_msession.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_close_msession.argtypes = [POINTER(DRMAA2_MSESSION)]
-    DRMAA_LIB.drmaa2_destroy_jsession.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_destroy_jsession.argtypes = [c_char_p]
-    DRMAA_LIB.drmaa2_destroy_rsession.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_destroy_rsession.argtypes = [c_char_p]
-    DRMAA_LIB.drmaa2_get_jsession_names.restype = drmaa2_string_list
-    DRMAA_LIB.drmaa2_get_jsession_names.argtypes = []
-    DRMAA_LIB.drmaa2_get_rsession_names.restype = drmaa2_string_list
-    DRMAA_LIB.drmaa2_get_rsession_names.argtypes = []
-    DRMAA_LIB.drmaa2_register_event_notification.restype = drmaa2_error
-    DRMAA_LIB.drmaa2_register_event_notification.argtypes = [
+    lib.drmaa2_get_drms_name.restype = drmaa2_string
+    lib.drmaa2_get_drms_name.argtypes = []
+    lib.drmaa2_get_drms_version.restype = POINTER(DRMAA2_VERSION)
+    lib.drmaa2_get_drms_version.argtypes = []
+    lib.drmaa2_supports.restype = drmaa2_bool
+    lib.drmaa2_supports.argtypes = [drmaa2_capability]
+    lib.drmaa2_create_jsession.restype = POINTER(DRMAA2_JSESSION)
+    lib.drmaa2_create_jsession.argtypes = [c_char_p, c_char_p]
+    lib.drmaa2_create_rsession.restype = drmaa2_rsession
+    lib.drmaa2_create_rsession.argtypes = [c_char_p, c_char_p]
+    lib.drmaa2_open_jsession.restype = POINTER(DRMAA2_JSESSION)
+    lib.drmaa2_open_jsession.argtypes = [c_char_p]
+    lib.drmaa2_open_rsession.restype = drmaa2_rsession
+    lib.drmaa2_open_rsession.argtypes = [c_char_p]
+    lib.drmaa2_open_msession.restype = POINTER(DRMAA2_MSESSION)
+    lib.drmaa2_open_msession.argtypes = [c_char_p]
+    lib.drmaa2_close_jsession.restype = drmaa2_error
+    lib.drmaa2_close_jsession.argtypes = [POINTER(DRMAA2_JSESSION)]
+    lib.drmaa2_close_rsession.restype = drmaa2_error
+    lib.drmaa2_close_rsession.argtypes = [drmaa2_rsession]
+    lib.drmaa2_close_msession.restype = drmaa2_error
+    lib.drmaa2_close_msession.argtypes = [POINTER(DRMAA2_MSESSION)]
+    lib.drmaa2_destroy_jsession.restype = drmaa2_error
+    lib.drmaa2_destroy_jsession.argtypes = [c_char_p]
+    lib.drmaa2_destroy_rsession.restype = drmaa2_error
+    lib.drmaa2_destroy_rsession.argtypes = [c_char_p]
+    lib.drmaa2_get_jsession_names.restype = drmaa2_string_list
+    lib.drmaa2_get_jsession_names.argtypes = []
+    lib.drmaa2_get_rsession_names.restype = drmaa2_string_list
+    lib.drmaa2_get_rsession_names.argtypes = []
+    lib.drmaa2_register_event_notification.restype = drmaa2_error
+    lib.drmaa2_register_event_notification.argtypes = [
         POINTER(DRMAA2_CALLBACK)]
-    return DRMAA_LIB
+
+
+_LIBRARY_LOCK = threading.RLock()
+
+
+@contextlib.contextmanager
+def using_library(library, environment=None):
+    """Point every module of this package at another library for the
+    body of a with-statement, and back again afterwards. Other threads
+    that do the same wait until it finishes, because the library is
+    a global of each module. Objects made inside, such as a JobSession,
+    belong to that library, so use them only inside it.
+
+    :param library: A library from open_drmaa_library, or a Simulator.
+    :param environment dict: Environment variables to set meanwhile,
+                             such as SGE_CELL, which the library reads.
+    :return: A context manager that gives the library.
+    """
+    import sys
+    from .engine import CtypesEngine
+    with _LIBRARY_LOCK:
+        saved = list()
+        # The cffi engine was built against the default library.
+        engine = CtypesEngine()
+        for name, module in list(sys.modules.items()):
+            if module is None or not (
+                    name == "drmaa2" or name.startswith("drmaa2.")):
+                continue
+            for attribute, value in (("DRMAA_LIB", library),
+                                     ("ENGINE", engine)):
+                if hasattr(module, attribute):
+                    saved.append(
+                        (module, attribute, getattr(module, attribute)))
+                    setattr(module, attribute, value)
+        try:
+            with using_environment(environment):
+                yield library
+        finally:
+            for module, attribute, value in reversed(saved):
+                setattr(module, attribute, value)
+
+
+@contextlib.contextmanager
+def using_environment(environment):
+    """Set environment variables for the body of a with-statement, such
+    as the SGE_CELL that a library reads when it opens a session, and
+    put them back afterwards. Other threads that do the same, or that
+    call using_library, wait until it finishes.
+
+    :param environment dict: Variable names and values. It may be None.
+    :return: A context manager.
+    """
+    with _LIBRARY_LOCK:
+        saved_environment = {key: os.environ.get(key)
+                             for key in (environment or dict())}
+        os.environ.update(environment or dict())
+        try:
+            yield
+        finally:
+            for key, value in saved_environment.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
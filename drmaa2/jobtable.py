@@ -0,0 +1,241 @@
+"""
+A JobTable tracks millions of jobs in a few flat arrays instead of
+a Job namedtuple, two strings, and a dict entry for each::
+
+    table = JobTable()
+    for job in session.run_bulk(job_template, 1, 1000000):
+        table.add(job, JState.queued)
+    while table.count(JState.queued, JState.running):
+        table.refresh(session)
+        ...
+
+Each row holds the job number and task number, a small code for the
+session name, the JState, and the exit status, which is under 50
+bytes a job, with the hash index. Job IDs must look like "123"
+or, for a task of an array job, "123.4".
+"""
+import array
+import logging
+import re
+from .interface import JState, ListType
+from .session import Job, JobInfo
+from .wrapping import DRMAA2List
+
+
+LOGGER = logging.getLogger("drmaa2.jobtable")
+UNSET = JState.unset.value
+LISTED = [JState.queued, JState.queued_held, JState.running,
+          JState.suspended, JState.requeued, JState.requeued_held,
+          JState.done, JState.failed]
+
+
+def _parse(job_id):
+    number, _, task = str(job_id).partition(".")
+    try:
+        return int(number), int(task) if task else 0
+    except ValueError:
+        raise ValueError("A JobTable needs numeric job IDs, not {}".format(
+            job_id))
+
+
+class JobTable:
+    """Jobs, their states, and their exit statuses, in arrays."""
+    def __init__(self):
+        self.numbers = array.array("q")
+        self.tasks = array.array("i")
+        """Zero for a job that isn't part of an array job."""
+        self.sessions = array.array("H")
+        """An index into session_names."""
+        self.states = array.array("b")
+        """JState values."""
+        self.exit_status = array.array("h")
+        """Exit status, or -1 if it isn't known."""
+        self.session_names = list()
+        self._session_codes = dict()
+        # Open addressing, with row + 1 in each slot and 0 for empty.
+        self._slots = array.array("q", bytes(8 * 1024))
+        self._mask = 1023
+
+    def __len__(self):
+        return len(self.numbers)
+
+    @property
+    def nbytes(self):
+        """Bytes in the arrays, which is nearly all the table uses."""
+        return sum(column.itemsize * len(column) for column in (
+            self.numbers, self.tasks, self.sessions, self.states,
+            self.exit_status, self._slots))
+
+    def _probe(self, number, task):
+        """The hash slot for a job and its row, which is -1 if absent."""
+        slots, numbers, tasks = self._slots, self.numbers, self.tasks
+        mask = self._mask
+        slot = ((number * 0x9E3779B1) ^ task) & mask
+        while True:
+            row = slots[slot] - 1
+            if row < 0:
+                return slot, -1
+            if numbers[row] == number and tasks[row] == task:
+                return slot, row
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        size = 2 * len(self._slots)
+        self._slots = array.array("q", bytes(8 * size))
+        self._mask = size - 1
+        for row in range(len(self.numbers)):
+            slot, _ = self._probe(self.numbers[row], self.tasks[row])
+            self._slots[slot] = row + 1
+
+    def add(self, job, state=None):
+        """Track a job. Adding a job again returns its row.
+
+        :param job Job: The job.
+        :param state JState: What to record for its state, if anything.
+        :return int: Its row.
+        """
+        number, task = _parse(job.id)
+        slot, row = self._probe(number, task)
+        if row < 0:
+            code = self._session_codes.get(job.sessionName)
+            if code is None:
+                code = len(self.session_names)
+                self._session_codes[job.sessionName] = code
+                self.session_names.append(job.sessionName)
+            row = len(self.numbers)
+            self.numbers.append(number)
+            self.tasks.append(task)
+            self.sessions.append(code)
+            self.states.append(UNSET)
+            self.exit_status.append(-1)
+            self._slots[slot] = row + 1
+            if 2 * len(self.numbers) > len(self._slots):
+                self._grow()
+        if state is not None:
+            self.states[row] = JState(state).value
+        return row
+
+    def extend(self, jobs, state=None):
+        """Track many jobs.
+
+        :return list(int): Their rows.
+        """
+        return [self.add(job, state) for job in jobs]
+
+    def row(self, job):
+        """The row of a job, found in constant time.
+
+        :param job: A Job or a job ID.
+        :return int: The row.
+        :raises KeyError: If the table doesn't have it.
+        """
+        job_id = job.id if isinstance(job, Job) else job
+        row = self._probe(*_parse(job_id))[1]
+        if row < 0:
+            raise KeyError(job_id)
+        return row
+
+    def __contains__(self, job):
+        try:
+            self.row(job)
+            return True
+        except (KeyError, ValueError):
+            return False
+
+    def job_id(self, row):
+        task = self.tasks[row]
+        if task:
+            return "{}.{}".format(self.numbers[row], task)
+        return str(self.numbers[row])
+
+    def job(self, row):
+        """Make the Job for a row."""
+        return Job(self.job_id(row), self.session_names[self.sessions[row]])
+
+    def state(self, row):
+        """The recorded JState of a row, or None if it isn't known."""
+        value = self.states[row]
+        return None if value == UNSET else JState(value)
+
+    def set_state(self, rows, state, exit_status=None):
+        """Record one state for many rows at once.
+
+        :param rows: A row or an iterable of rows.
+        :param state JState: The state.
+        :param exit_status int: If given, record this too.
+        """
+        if isinstance(rows, int):
+            rows = (rows,)
+        value = JState(state).value
+        states, statuses = self.states, self.exit_status
+        if exit_status is None:
+            for row in rows:
+                states[row] = value
+        else:
+            for row in rows:
+                states[row] = value
+                statuses[row] = exit_status
+
+    def _pattern(self, states):
+        values = bytes(JState(state).value & 0xFF for state in states)
+        return re.compile(b"[" + re.escape(values) + b"]")
+
+    def count(self, *states):
+        """How many rows are in any of the given states. This scans
+        the state array as bytes, so it takes milliseconds for
+        millions of rows."""
+        column = self.states.tobytes()
+        if len(states) == 1:
+            return column.count(bytes([JState(states[0]).value & 0xFF]))
+        return len(self._pattern(states).findall(column))
+
+    def rows_in(self, *states):
+        """Rows in any of the given states, in order.
+
+        :return array: Row numbers.
+        """
+        column = self.states.tobytes()
+        return array.array("q", (match.start() for match in
+                                 self._pattern(states).finditer(column)))
+
+    def refresh(self, session, states=LISTED, chunk_size=4096):
+        """Ask the scheduler for the jobs in each state, one listing
+        per state, and record what it says for the jobs in this table.
+
+        :param session: A JobSession or MonitoringSession.
+        :param states: The JStates to ask about.
+        :return int: How many rows changed state.
+        """
+        changed = 0
+        for state in states:
+            value = JState(state).value
+            job_filter = JobInfo(library=session.library)
+            job_filter.jobState = JState(state).name
+            for chunk in session.jobs(job_filter, chunk_size=chunk_size):
+                for job in chunk:
+                    try:
+                        row = self._probe(*_parse(job.id))[1]
+                    except ValueError:
+                        continue
+                    if row >= 0 and self.states[row] != value:
+                        self.states[row] = value
+                        changed += 1
+        LOGGER.debug("refresh changed {} rows".format(changed))
+        return changed
+
+    def joblist(self, rows=None, library=None):
+        """A native job list, laid out straight from the table, to
+        pass to wait_any_terminated.
+
+        :param rows: Rows to include, by default all of them.
+        :param library: The library of the session that will wait,
+                        as its library attribute says.
+        :return DRMAA2List: An indexed list of the jobs.
+        """
+        if rows is None:
+            rows = range(len(self.numbers))
+        names = self.session_names
+        sessions = self.sessions
+        pairs = ((self.job_id(row), names[sessions[row]]) for row in rows)
+        return DRMAA2List(pairs, ListType.joblist, indexed=True,
+                          library=library)
@@ -0,0 +1,251 @@
+"""
+Where does a job's time go? The scheduler's JobInfo says when a job
+was submitted, dispatched, and finished, and how much CPU it used.
+A Lifecycle adds how long the submit call took on the client and keeps
+running distributions of each of these per queue, per session, and
+per job category, so you can tell whether a slow pipeline waits in
+the queue or runs slowly::
+
+    lifecycle = Lifecycle()
+    job = lifecycle.run(js, job_template)
+    ...
+    lifecycle.observe(job)
+    print(lifecycle.summary()[("queue", "all.q")]["queue_wait"])
+
+The distributions are QuantileSketches, which answer quantiles to
+within a relative error using a fixed number of buckets, however
+many jobs they see.
+"""
+import collections
+import datetime
+import math
+import threading
+import time
+from .session import job_info
+
+
+METRICS = ("submit_latency", "queue_wait", "run_time", "cpu_efficiency")
+"""Seconds for the submit call, submission to dispatch, and dispatch to
+finish, then CPU time over wall-clock time times slots."""
+
+
+class QuantileSketch:
+    """Approximate quantiles of positive values in bounded memory.
+    Values fall into buckets whose bounds grow geometrically,
+    so any quantile comes back within relative_accuracy
+    of a value that was added. When there are more than max_buckets,
+    the lowest buckets merge, which costs accuracy only
+    at the low end."""
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets = dict()
+        self._zero = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        if value is None or value < 0 or math.isnan(value):
+            return
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value == 0:
+            self._zero += 1
+            return
+        key = int(math.ceil(math.log(value) / self._log_gamma))
+        self._buckets[key] = self._buckets.get(key, 0) + 1
+        if len(self._buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self._buckets)
+        extra = len(keys) - self.max_buckets
+        lowest = keys[extra]
+        for key in keys[:extra]:
+            self._buckets[lowest] += self._buckets.pop(key)
+
+    def merge(self, other):
+        """Add the values another sketch saw, which must have
+        the same relative accuracy."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Sketches have different accuracy")
+        for key, cnt in other._buckets.items():
+            self._buckets[key] = self._buckets.get(key, 0) + cnt
+        self._zero += other._zero
+        self.count += other.count
+        self.total += other.total
+        for bound in (other.min, other.max):
+            if bound is not None:
+                self.min = bound if self.min is None else min(self.min, bound)
+                self.max = bound if self.max is None else max(self.max, bound)
+        while len(self._buckets) > self.max_buckets:
+            self._collapse()
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q):
+        """The value below which a fraction q of values fall.
+
+        :param q float: From 0 to 1.
+        :return float: The value, or None if nothing was added.
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self._zero
+        if rank < seen:
+            return 0.0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if rank < seen:
+                # The middle of the bucket, by relative error.
+                value = 2 * self._gamma ** key / (1 + self._gamma)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+def _seconds(when):
+    """JobInfo times are datetimes, or a name when unset."""
+    if isinstance(when, datetime.datetime):
+        return when.timestamp()
+    elif isinstance(when, (int, float)) and when >= 0:
+        return when
+    else:
+        return None
+
+
+class Lifecycle:
+    """Distributions of job timings, grouped by queue, session,
+    and job category. Safe to use from many threads."""
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048,
+                 remember=65536):
+        """
+        :param relative_accuracy float: For each QuantileSketch.
+        :param max_buckets int: For each QuantileSketch.
+        :param remember int: How many submitted jobs to remember the
+                             category of, until they are observed.
+        """
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.remember = remember
+        self.sketches = collections.defaultdict(dict)
+        """From (dimension, name) to a dict from metric to sketch."""
+        self._categories = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _add(self, groups, metric, value):
+        if value is None:
+            return
+        for group in groups:
+            metrics = self.sketches[group]
+            if metric not in metrics:
+                metrics[metric] = QuantileSketch(
+                    self.relative_accuracy, self.max_buckets)
+            metrics[metric].add(value)
+
+    @staticmethod
+    def _groups(queue=None, session=None, category=None):
+        groups = [("all", "all")]
+        for dimension, name in (("queue", queue), ("session", session),
+                                ("category", category)):
+            if name:
+                groups.append((dimension, name))
+        return groups
+
+    def run(self, session, job_template):
+        """Submit a job, timing the call.
+
+        :param session JobSession: Where to run it.
+        :param job_template JobTemplate: What to run.
+        :return Job: The job.
+        """
+        start = time.monotonic()
+        job = session.run(job_template)
+        latency = time.monotonic() - start
+        category = job_template.jobCategory
+        self.record_submit(latency, job.sessionName, category)
+        if category:
+            with self._lock:
+                self._categories[job.id] = category
+                if len(self._categories) > self.remember:
+                    self._categories.popitem(last=False)
+        return job
+
+    def record_submit(self, latency, session=None, category=None):
+        """Record how long one submit call took, in seconds."""
+        with self._lock:
+            self._add(self._groups(session=session, category=category),
+                      "submit_latency", latency)
+
+    def record(self, submitted, dispatched, finished, cpu_time=None,
+               wallclock_time=None, slots=None, queue=None, session=None,
+               category=None):
+        """Record one finished job from its times, in seconds
+        since the epoch. Unknown values can be None."""
+        queue_wait = run_time = efficiency = None
+        if submitted is not None and dispatched is not None:
+            queue_wait = max(dispatched - submitted, 0)
+        if dispatched is not None and finished is not None:
+            run_time = max(finished - dispatched, 0)
+        wall = wallclock_time if wallclock_time else run_time
+        if cpu_time is not None and wall:
+            efficiency = cpu_time / (wall * (slots or 1))
+        groups = self._groups(queue, session, category)
+        with self._lock:
+            self._add(groups, "queue_wait", queue_wait)
+            self._add(groups, "run_time", run_time)
+            self._add(groups, "cpu_efficiency", efficiency)
+
+    def observe(self, job, info=None, category=None):
+        """Record a finished job from what the scheduler knows about it.
+
+        :param job Job: The job.
+        :param info JobInfo: Its information, if you already asked.
+        :param category str: Its job category. Jobs submitted through
+                             run remember their category.
+        """
+        info = info or job_info(job)
+        with self._lock:
+            category = category or self._categories.pop(job.id, None)
+        self.record(
+            _seconds(info.submissionTime), _seconds(info.dispatchTime),
+            _seconds(info.finishTime), info.cpuTime, info.wallclockTime,
+            info.slots, info.queueName, job.sessionName, category)
+
+    def observe_columns(self, columns, session=None):
+        """Record jobs from a chunk of accounting.info_chunks."""
+        for idx in range(len(columns["jobId"])):
+            with self._lock:
+                category = self._categories.pop(columns["jobId"][idx], None)
+            self.record(
+                columns["submissionTime"][idx], columns["dispatchTime"][idx],
+                columns["finishTime"][idx], columns["cpuTime"][idx],
+                columns["wallclockTime"][idx], columns["slots"][idx],
+                columns["queueName"][idx], session, category)
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        """Quantiles of every metric in every group.
+
+        :return dict: From (dimension, name) to a dict from metric to a
+                      dict with "count", "mean", and each quantile.
+        """
+        result = dict()
+        with self._lock:
+            for group, metrics in self.sketches.items():
+                result[group] = dict()
+                for metric, sketch in metrics.items():
+                    described = dict(count=sketch.count, mean=sketch.mean)
+                    for q in quantiles:
+                        described[q] = sketch.quantile(q)
+                    result[group][metric] = described
+        return result
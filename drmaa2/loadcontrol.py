@@ -0,0 +1,288 @@
+"""
+A LoadController suspends low-priority jobs on machines that are
+overloaded and resumes them when the load drops, so that interactive
+and high-priority work on those machines keeps its latency without
+limits on each job::
+
+    with MonitoringSession() as monitor, JobSession("backfill") as backfill:
+        with LoadController(monitor, [backfill], high=1.2, low=0.8):
+            ...
+
+Every pass takes one snapshot of the machines. A machine whose load
+per core rises above ``high`` is overloaded until it falls below
+``low``. Between the two it stays as it was, so it doesn't flap.
+On an overloaded machine, the controller suspends jobs from the given
+sessions, the most recently started first, until the load it expects
+is back under ``high``. On a machine that is no longer overloaded, it
+resumes the jobs it suspended there, in the order it suspended them,
+as long as the load it expects stays under ``high``. Decisions go out
+at most ``batch_size`` a pass, and a machine is left alone for
+``cooldown`` seconds after the controller acts on it, because a load
+average takes time to show what changed. If a machine leaves the
+snapshot or becomes unavailable, the controller can't watch its load,
+so it resumes the jobs it suspended there.
+
+DRMAA2 reports how much memory a machine has, not how much is in use,
+so the controller measures load alone. Pass ``load_of`` to measure
+it differently.
+"""
+import collections
+import datetime
+import logging
+import threading
+import time
+from .interface import JState
+from .session import JobInfo, job_info, job_resume, job_suspend
+from .errors import DRMAA2Exception
+
+
+LOGGER = logging.getLogger("drmaa2.loadcontrol")
+
+
+def cores(machine):
+    """How many cores a MachineInfo has, at least one."""
+    return max(machine.sockets * machine.coresPerSocket, 1)
+
+
+def per_core_load(machine):
+    """A machine's load average divided by its cores."""
+    return machine.load / cores(machine)
+
+
+Placement = collections.namedtuple("Placement",
+                                   "machine slots started session")
+Placement.__doc__ = """Where a running job is, how many slots it has,
+when it started, in seconds since the epoch, and the JobSession it
+came from."""
+
+
+class LoadController:
+    """Suspends and resumes jobs from some sessions to keep machine
+    load between two thresholds."""
+    def __init__(self, monitor, sessions, high=1.0, low=0.7, batch_size=100,
+                 cooldown=60, interval=30, load_of=per_core_load,
+                 low_priority=None, clock=time.monotonic):
+        """
+        :param monitor MonitoringSession: For snapshots of the machines.
+        :param sessions: JobSessions whose jobs may be suspended.
+        :param high float: Load per core above which a machine is
+                           overloaded.
+        :param low float: Load per core below which it no longer is.
+        :param batch_size int: Most suspends and resumes in one pass.
+        :param cooldown float: Seconds to leave a machine alone after
+                               acting on it.
+        :param interval float: Seconds between passes of the thread.
+        :param load_of: Function from a MachineInfo to its load.
+        :param low_priority: Function from a Job and its JobInfo to
+                             whether it may be suspended. By default,
+                             every job from the sessions may be.
+        :param clock: Function that returns seconds.
+        """
+        if not low < high:
+            raise ValueError("low must be less than high")
+        self.monitor = monitor
+        self.sessions = list(sessions)
+        self.high = high
+        self.low = low
+        self.batch_size = batch_size
+        self.cooldown = cooldown
+        self.interval = interval
+        self.load_of = load_of
+        self.low_priority = low_priority
+        self.clock = clock
+        self.loads = dict()
+        """From machine name to its load in the latest snapshot."""
+        self.overloaded = set()
+        """Names of machines above high that haven't gone below low."""
+        self.suspended = collections.defaultdict(collections.OrderedDict)
+        """From machine name to the jobs suspended there, in order,
+        each with its Placement."""
+        self._placements = dict()
+        """From job ID to a Placement, or None if the job may not be
+        suspended, for running jobs."""
+        self._acted = dict()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """Run passes in a daemon thread.
+
+        :return LoadController: This controller.
+        """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, daemon=True, name="drmaa2-loadcontrol")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the thread, after the pass it is on. Suspended jobs
+        stay suspended. Call resume_all to let them go."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except Exception as err:
+                LOGGER.warning("Load control pass failed: {}".format(err))
+
+    def step(self):
+        """Take a snapshot, decide, and act.
+
+        :return (int, int): How many jobs were suspended and resumed.
+        """
+        machines = {machine.name: machine
+                    for machine in self.monitor.iter_machines()
+                    if machine.available}
+        self.loads = {name: self.load_of(machine)
+                      for name, machine in machines.items()}
+        self.overloaded &= set(machines)
+        for name, load in self.loads.items():
+            if load > self.high:
+                self.overloaded.add(name)
+            elif load < self.low:
+                self.overloaded.discard(name)
+        now = self.clock()
+        settled = {name for name in machines
+                   if now - self._acted.get(name, -self.cooldown)
+                   >= self.cooldown}
+        budget = self.batch_size
+        suspended_cnt = 0
+        hot = sorted(self.overloaded & settled, key=self.loads.get,
+                     reverse=True)
+        if hot:
+            running = self._running()
+            for name in hot:
+                picked = self._to_suspend(machines[name],
+                                          running.get(name, ()), budget)
+                suspended_cnt += self._apply(name, picked, job_suspend, now)
+                budget -= len(picked)
+        resumed_cnt = 0
+        for name in list(self.suspended):
+            if name not in machines:
+                picked = list(self.suspended[name].items())[:budget]
+            elif name in self.overloaded or name not in settled:
+                continue
+            else:
+                picked = self._to_resume(machines[name], budget)
+            resumed_cnt += self._apply(name, picked, job_resume, now)
+            budget -= len(picked)
+        if suspended_cnt or resumed_cnt:
+            LOGGER.debug("Suspended {} and resumed {} jobs".format(
+                suspended_cnt, resumed_cnt))
+        return suspended_cnt, resumed_cnt
+
+    def _running(self):
+        """Running jobs from the sessions that may be suspended.
+
+        :return dict: From machine name to a list of (Placement, Job).
+        """
+        placements = dict()
+        running = collections.defaultdict(list)
+        for session in self.sessions:
+            job_filter = JobInfo(library=session.library)
+            job_filter.jobState = JState.running.name
+            for jobs in session.jobs(job_filter, chunk_size=4096):
+                for job in jobs:
+                    placement = self._placements.get(job.id, False)
+                    if placement is False:
+                        placement = self._place(job, session)
+                    placements[job.id] = placement
+                    if placement is not None:
+                        running[placement.machine].append((placement, job))
+        # Forget jobs that stopped running.
+        self._placements = placements
+        return running
+
+    def _place(self, job, session):
+        try:
+            info = job_info(job, session.library)
+        except (DRMAA2Exception, RuntimeError) as err:
+            LOGGER.debug("No information for {}: {}".format(job, err))
+            return None
+        if self.low_priority and not self.low_priority(job, info):
+            return None
+        machines = info.allocatedMachines
+        if not machines:
+            return None
+        started = info.dispatchTime
+        if isinstance(started, datetime.datetime):
+            started = started.timestamp()
+        else:
+            started = 0
+        slots = info.slots if info.slots and info.slots > 0 else 1
+        return Placement(machines[0], slots, started, session)
+
+    def _to_suspend(self, machine, running, budget):
+        expected = self.loads[machine.name]
+        picked = list()
+        for placement, job in sorted(running, key=lambda pair: pair[0].started,
+                                     reverse=True):
+            if expected <= self.high or len(picked) >= budget:
+                break
+            picked.append((job, placement))
+            expected -= placement.slots / cores(machine)
+        return picked
+
+    def _to_resume(self, machine, budget):
+        expected = self.loads[machine.name]
+        picked = list()
+        for job, placement in self.suspended[machine.name].items():
+            expected += placement.slots / cores(machine)
+            if expected > self.high or len(picked) >= budget:
+                break
+            picked.append((job, placement))
+        return picked
+
+    def _apply(self, name, picked, action, now):
+        done = 0
+        suspended = self.suspended[name]
+        for job, placement in picked:
+            try:
+                action(job, placement.session.library)
+            except DRMAA2Exception as err:
+                LOGGER.debug("Could not {} {}: {}".format(
+                    action.__name__, job, err))
+                worked = False
+            else:
+                done += 1
+                worked = True
+            if action is job_resume:
+                # A job that won't resume has ended or was resumed by
+                # someone else, so stop tracking it either way.
+                suspended.pop(job, None)
+            elif worked:
+                suspended[job] = placement
+                self._placements.pop(job.id, None)
+        if not suspended:
+            del self.suspended[name]
+        if picked:
+            self._acted[name] = now
+        return done
+
+    def resume_all(self):
+        """Resume every job this controller suspended.
+
+        :return int: How many resumed.
+        """
+        resumed = 0
+        for name in list(self.suspended):
+            for job, placement in list(self.suspended[name].items()):
+                try:
+                    job_resume(job, placement.session.library)
+                    resumed += 1
+                except DRMAA2Exception as err:
+                    LOGGER.debug("Could not resume {}: {}".format(job, err))
+            del self.suspended[name]
+        return resumed
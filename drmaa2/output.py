@@ -0,0 +1,271 @@
+"""
+Reading what jobs write to their outputPath and errorPath.
+
+A JobHandle remembers a Job and the output and error paths of the
+template that made it, because templates are modified and reused.
+It resolves the placeholders in those paths and hands back finished
+files as memory-mapped, read-only views, so nothing is copied
+until you look at it::
+
+    handle = JobHandle.run(js, job_template)
+    js.wait_any_terminated([handle.job], "infinite")
+    text = bytes(handle.output()).decode()
+
+While a job runs, ``async for chunk in handle.tail()`` follows the
+file, using inotify where the platform has it. The harvest function
+maps the outputs of many jobs, or of the tasks of an array job,
+using a pool of threads.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import mmap
+import os
+from pathlib import Path
+from .interface import HOME_DIR, WORKING_DIR, PARAMETRIC_INDEX, JState, libc
+from .session import job_state
+
+
+LOGGER = logging.getLogger("drmaa2.output")
+
+# From sys/inotify.h
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+
+def resolve_path(pattern, working_directory=None, index=None, home=None):
+    """Replace DRMAA2 placeholders in an output or error path.
+
+    :param pattern str: A path such as $DRMAA2_HOME_DIR$/out.$DRMAA2_INDEX$.
+                        UGE allows a leading "host:", which is removed.
+    :param working_directory str: The job's working directory. DRMAA2
+                                  says it is the home directory if unset.
+    :param index int: The task index for array jobs.
+    :param home str: The home directory, if not this user's.
+    :return Path: The path to the file.
+    """
+    home = home or os.path.expanduser("~")
+    working_directory = working_directory or home
+    host, colon, path = pattern.partition(":")
+    if colon and "/" not in host and "$" not in host:
+        pattern = path
+    pattern = pattern.replace(HOME_DIR, home)
+    pattern = pattern.replace(WORKING_DIR, str(working_directory))
+    if index is not None:
+        pattern = pattern.replace(PARAMETRIC_INDEX, str(index))
+    path = Path(pattern)
+    if not path.is_absolute():
+        path = Path(working_directory) / path
+    return path
+
+
+def map_file(path):
+    """Memory-map a file read-only.
+
+    :param path Path: The file.
+    :return memoryview: A view on the file. The mapping lasts as long as
+                        the view. An empty file gives an empty view.
+    """
+    with open(str(path), "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapped, "madvise"):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return memoryview(mapped)
+
+
+class JobHandle:
+    """A Job together with where it writes its output."""
+    def __init__(self, job, job_template, index=None):
+        """
+        :param job Job: The job, as returned by JobSession.run.
+        :param job_template JobTemplate: The template as it was when the
+                                         job was submitted.
+        :param index int: The task index, for a task of an array job.
+        """
+        self.job = job
+        self.index = index
+        self.working_directory = job_template.workingDirectory
+        self.join_files = job_template.joinFiles
+        self.job_name = (job_template.jobName or
+                         Path(str(job_template.remoteCommand or "job")).name)
+        self.output_template = job_template.outputPath
+        self.error_template = job_template.errorPath
+
+    @property
+    def output_pattern(self):
+        return self.output_template or self._default_pattern("o")
+
+    @property
+    def error_pattern(self):
+        return self.error_template or self._default_pattern("e")
+
+    def _default_pattern(self, kind):
+        """Grid Engine writes to name.o<job id> in the home directory
+        when no path is given, with the task index after it."""
+        pattern = "{}/{}.{}{}".format(
+            HOME_DIR, self.job_name, kind, self.job.id)
+        if self.index is not None:
+            pattern += "." + PARAMETRIC_INDEX
+        return pattern
+
+    @classmethod
+    def run(cls, session, job_template):
+        """Submit a job and return a handle to it."""
+        return cls(session.run(job_template), job_template)
+
+    def tasks(self, indices):
+        """Handles for tasks of an array job that shares this template.
+
+        :param indices: Iterable of task indices.
+        :return list(JobHandle): One per task.
+        """
+        handles = list()
+        for index in indices:
+            handle = self.__class__.__new__(self.__class__)
+            handle.__dict__.update(self.__dict__)
+            handle.index = index
+            handles.append(handle)
+        return handles
+
+    def output_path(self):
+        return resolve_path(self.output_pattern, self.working_directory,
+                            self.index)
+
+    def error_path(self):
+        if self.join_files:
+            return self.output_path()
+        return resolve_path(self.error_pattern, self.working_directory,
+                            self.index)
+
+    def output(self):
+        """Memory-mapped view of the finished output file."""
+        return map_file(self.output_path())
+
+    def error(self):
+        """Memory-mapped view of the finished error file."""
+        return map_file(self.error_path())
+
+    def finished(self):
+        """Whether the job has stopped, so its files won't grow."""
+        return job_state(self.job) in (JState.done, JState.failed)
+
+    async def tail(self, stream="output", poll_interval=1.0,
+                   chunk_size=65536):
+        """Follow the output of a running job, as an async generator
+        of bytes. It ends once the job is finished and the file is
+        read to its end.
+
+        :param stream str: "output" or "error".
+        :param poll_interval float: Seconds between checks on the job
+                                    when the file doesn't change.
+        :param chunk_size int: Largest chunk to yield.
+        """
+        path = self.output_path() if stream == "output" else self.error_path()
+        loop = asyncio.get_running_loop()
+        watcher = _Watcher(path)
+        try:
+            while not path.exists():
+                if await loop.run_in_executor(None, self.finished):
+                    return
+                await watcher.wait(poll_interval)
+            with open(str(path), "rb") as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if chunk:
+                        yield chunk
+                    elif await loop.run_in_executor(None, self.finished):
+                        chunk = f.read()
+                        if chunk:
+                            yield chunk
+                        return
+                    else:
+                        await watcher.wait(poll_interval)
+        finally:
+            watcher.close()
+
+
+def harvest(handles, stream="output", max_workers=8):
+    """Map the finished outputs of many jobs, using a pool of threads
+    so that opening files and starting read-ahead happen in parallel.
+    It maps at most max_workers files ahead of what it has yielded,
+    so handles can be a generator of any length.
+
+    :param handles: Iterable of JobHandle, perhaps from JobHandle.tasks.
+    :param stream str: "output" or "error".
+    :param max_workers int: Number of threads.
+    :return: Generator of (JobHandle, memoryview or exception),
+             in the order of handles. A missing file gives the
+             exception instead of raising it.
+    """
+    def read(handle):
+        try:
+            view = handle.output() if stream == "output" else handle.error()
+        except OSError as err:
+            return handle, err
+        if len(view) and hasattr(view.obj, "madvise"):
+            view.obj.madvise(mmap.MADV_WILLNEED)
+        return handle, view
+
+    pending = collections.deque()
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        for handle in handles:
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+            pending.append(executor.submit(read, handle))
+        while pending:
+            yield pending.popleft().result()
+
+
+class _Watcher:
+    """Waits for a file to change, using inotify on its directory
+    if libc has it and polling otherwise."""
+    def __init__(self, path):
+        self.fd = None
+        if not hasattr(libc, "inotify_init1"):
+            return
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return
+        # Watch the directory so we see the file being created, too.
+        watch = libc.inotify_add_watch(
+            fd, str(path.parent).encode(),
+            IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE)
+        if watch < 0:
+            os.close(fd)
+            return
+        self.fd = fd
+
+    async def wait(self, timeout):
+        if self.fd is None:
+            await asyncio.sleep(timeout)
+            return
+        loop = asyncio.get_running_loop()
+        changed = loop.create_future()
+
+        def readable():
+            if not changed.done():
+                changed.set_result(None)
+
+        loop.add_reader(self.fd, readable)
+        try:
+            await asyncio.wait_for(changed, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            loop.remove_reader(self.fd)
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
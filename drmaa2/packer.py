@@ -0,0 +1,208 @@
+"""
+A ReservationPacker runs many short jobs inside an advance reservation,
+so each starts in slots that are already held for it instead of
+waiting its turn in the scheduler's queue::
+
+    with JobSession() as js, ReservationPacker(js, slots=32) as packer:
+        for job_template, seconds in work:
+            packer.add(job_template, seconds)
+        for job_template, job in packer.run():
+            ...
+
+The packer takes jobs from its backlog a block at a time. It plans
+each block by longest processing time first: the longest job goes into
+whichever slot would be free soonest, then the next longest, and so on.
+It submits the jobs in that order. A scheduler that starts reserved
+jobs in the order they were submitted then follows the plan. The
+reservation lasts as long as the plan, times ``margin``, but never more
+than ``max_duration``. Jobs that would run past ``max_duration`` wait
+for the next block, and a job longer than that can't be added. Once
+every job in a block has ended, the packer terminates the reservation
+rather than hold idle slots until it expires.
+
+If the library lacks the advance_reservation capability, the packer
+submits jobs to the queue as usual.
+"""
+import heapq
+import logging
+import math
+from .interface import Capability, Error, ListType, Times
+from .errors import CheckError, DRMAA2Exception, last_errno
+from .capabilities import supports
+from .reservation import ReservationSession, ReservationTemplate
+from .wrapping import DRMAA2List
+
+
+LOGGER = logging.getLogger("drmaa2.packer")
+
+
+def plan(durations, slots, max_duration=None):
+    """Pack one-slot jobs into slots, longest first, each into the
+    slot that would be free soonest.
+
+    :param durations: Expected seconds for each job.
+    :param slots int: How many slots there are.
+    :param max_duration float: Leave out jobs that would end after this.
+    :return (list(int), float): Indices of the jobs that fit, in the
+                                order to submit them, and when the
+                                last of them should end.
+    """
+    order = sorted(range(len(durations)), key=lambda idx: durations[idx],
+                   reverse=True)
+    ends = [0.0] * max(slots, 1)
+    chosen = list()
+    for idx in order:
+        soonest = ends[0]
+        seconds = durations[idx]
+        if max_duration is not None and soonest + seconds > max_duration:
+            continue
+        heapq.heapreplace(ends, soonest + seconds)
+        chosen.append(idx)
+    return chosen, max(ends)
+
+
+class ReservationPacker:
+    """Submits a backlog of one-slot jobs in blocks, each inside an
+    advance reservation sized for it."""
+    def __init__(self, job_session, slots=16, max_duration=3600, margin=1.25,
+                 candidate_machines=None, reservation_session=None):
+        """
+        :param job_session JobSession: Where to run the jobs.
+        :param slots int: Most slots to reserve at once.
+        :param max_duration float: Longest reservation, in seconds.
+        :param margin float: Reserve the planned time times this, in
+                             case jobs run longer than expected.
+        :param candidate_machines: Machine names for the reservation.
+        :param reservation_session ReservationSession: By default,
+            the packer makes a session and destroys it on close.
+        """
+        self.job_session = job_session
+        self.slots = slots
+        self.max_duration = max_duration
+        self.margin = margin
+        self.candidate_machines = candidate_machines
+        self.reservation_session = reservation_session
+        self._own_session = reservation_session is None
+        self.reservation = None
+        """The Reservation for the block that is running, if any."""
+        self.blocks = 0
+        self._backlog = list()
+
+    def __len__(self):
+        """How many jobs are in the backlog."""
+        return len(self._backlog)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add(self, job_template, seconds):
+        """Put a job in the backlog. The packer sets the template's
+        reservationId when it submits, so add a template only once
+        and don't change it afterwards.
+
+        :param job_template JobTemplate: A job that needs one slot.
+        :param seconds float: How long it should run, at most
+                              max_duration.
+        """
+        if job_template.minSlots not in (None, 1):
+            raise ValueError("The packer can only pack one-slot jobs")
+        if self.max_duration is not None and seconds > self.max_duration:
+            raise ValueError("A {}s job can't fit in a {}s reservation".format(
+                seconds, self.max_duration))
+        self._backlog.append((job_template, seconds))
+
+    def submit_block(self):
+        """Reserve slots for as much of the backlog as fits, and
+        submit those jobs into the reservation.
+
+        :return list((JobTemplate, Job)): The jobs submitted.
+        """
+        if not self._backlog:
+            return list()
+        if not supports(Capability.advance_reservation):
+            LOGGER.warning("This DRM can't reserve slots, so jobs queue.")
+            block, self._backlog = self._backlog, list()
+            return [(job_template, self.job_session.run(job_template))
+                    for (job_template, seconds) in block]
+        durations = [seconds for (job_template, seconds) in self._backlog]
+        slots = min(self.slots, len(durations))
+        chosen, makespan = plan(durations, slots, self.max_duration)
+        request = ReservationTemplate()
+        request.minSlots = slots
+        request.maxSlots = slots
+        duration = math.ceil(makespan * self.margin)
+        if self.max_duration is not None:
+            duration = min(duration, math.ceil(self.max_duration))
+        request.duration = duration
+        if self.candidate_machines:
+            request.candidateMachines = self.candidate_machines
+        if self.reservation_session is None:
+            self.reservation_session = ReservationSession()
+        self.reservation = self.reservation_session.request(request)
+        del request
+        LOGGER.debug("Reserved {} slots for {} jobs over {}s".format(
+            slots, len(chosen), makespan))
+        submitted = list()
+        for idx in chosen:
+            job_template = self._backlog[idx][0]
+            job_template.reservationId = self.reservation.id
+            submitted.append((job_template,
+                              self.job_session.run(job_template)))
+        taken = set(chosen)
+        self._backlog = [entry for (idx, entry) in enumerate(self._backlog)
+                         if idx not in taken]
+        self.blocks += 1
+        return submitted
+
+    def run(self, how_long=Times.infinite):
+        """Run the whole backlog, one block at a time, and release each
+        reservation as soon as its jobs have ended.
+
+        :param how_long: Timeout for each wait, as for wait_any_terminated.
+        :return: A generator of (JobTemplate, Job) as each job ends.
+        :raises DRMAA2Exception: If a wait fails other than by timing out.
+        """
+        active = DRMAA2List([], ListType.joblist, indexed=True)
+        templates = dict()
+        while self._backlog or templates:
+            if not templates:
+                for job_template, job in self.submit_block():
+                    active.append(job)
+                    templates[job] = job_template
+            job = self.job_session.wait_any_terminated(active, how_long)
+            if job is None:
+                library = self.job_session.library
+                errno = last_errno(library)
+                if errno != Error.timeout.value:
+                    CheckError(errno, library)
+                continue
+            active.remove(job)
+            job_template = templates.pop(job)
+            if not templates:
+                self.release()
+            yield job_template, job
+
+    def release(self):
+        """Terminate the reservation for the current block, if any."""
+        if self.reservation is not None:
+            LOGGER.debug("Releasing {}".format(self.reservation))
+            try:
+                self.reservation.terminate()
+            except DRMAA2Exception as err:
+                LOGGER.debug("Could not terminate {}: {}".format(
+                    self.reservation, err))
+            self.reservation = None
+
+    def close(self):
+        """Release the reservation, and destroy the reservation session
+        if the packer made it."""
+        self.release()
+        if self._own_session and self.reservation_session is not None:
+            session = self.reservation_session
+            self.reservation_session = None
+            session.close()
+            session.__del__()
+            session.destroy()
@@ -0,0 +1,227 @@
+"""
+A SessionPool keeps a few named job sessions open and lends them out,
+so that handling a request doesn't start with a round trip to the
+qmaster to create a session, and so that each request doesn't leave
+another session behind in the scheduler::
+
+    pool = SessionPool("webapp", size=4)
+    with pool.lease() as js:
+        job = js.run(job_template)
+
+The sessions are named from the prefix, so a restarted process finds
+the same sessions with JobSession.from_existing instead of making new
+ones. A session is checked before it is lent if it sat idle, and a
+session that stays idle longer than the time to live is closed.
+Closing it keeps its name in the scheduler, ready to reopen.
+"""
+import contextlib
+import logging
+import threading
+import time
+from .interface import *
+from .errors import *
+from .session import JobSession
+
+
+LOGGER = logging.getLogger("drmaa2.pool")
+DRMAA_LIB = load_drmaa_library()
+
+
+def healthy(session):
+    """Whether the library still knows this open session by its name."""
+    if not session._open:
+        return False
+    try:
+        name = return_str(
+            DRMAA_LIB.drmaa2_jsession_get_session_name(session._session))
+    except Exception as err:
+        LOGGER.debug("Session {} failed its check: {}".format(
+            session.name, err))
+        return False
+    return name == session.name
+
+
+def open_session(name):
+    """Reattach to a session of this name, or make it."""
+    try:
+        return JobSession.from_existing(name)
+    except RuntimeError:
+        LOGGER.debug("Creating pooled session {}".format(name))
+        return JobSession(name, keep=True)
+
+
+class SessionPool:
+    """Lends out job sessions, one borrower at a time for each."""
+    def __init__(self, prefix, size=4, ttl=300, check_after=10,
+                 opener=open_session, check=healthy):
+        """
+        :param prefix str: Sessions are named prefix-0, prefix-1, and so on.
+        :param size int: The most sessions to have open.
+        :param ttl float: Seconds a session may sit idle before it closes.
+        :param check_after float: Seconds idle after which a session is
+                                  checked before it is lent again.
+        :param opener: Function from a name to an open JobSession.
+        :param check: Function that says whether a JobSession works.
+        """
+        if size < 1:
+            raise ValueError("A pool needs at least one session")
+        self.prefix = prefix
+        self.size = size
+        self.ttl = ttl
+        self.check_after = check_after
+        self.opener = opener
+        self.check = check
+        self._idle = list()
+        """Stack of (last used, name, session). Session is None if closed."""
+        for idx in reversed(range(size)):
+            self._idle.append((0, "{}-{}".format(prefix, idx), None))
+        self._leased = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def leased(self):
+        """Number of sessions lent out now."""
+        return self._leased
+
+    @property
+    def open_count(self):
+        """Number of sessions open, whether lent or idle."""
+        with self._condition:
+            idle = sum(1 for entry in self._idle if entry[2] is not None)
+            return idle + self._leased
+
+    def prewarm(self):
+        """Open every session now, instead of on first use."""
+        with self._condition:
+            entries, self._idle = self._idle, list()
+        try:
+            for idx, (used, name, session) in enumerate(entries):
+                if session is None:
+                    entries[idx] = (time.monotonic(), name, self.opener(name))
+        finally:
+            with self._condition:
+                self._idle.extend(entries)
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        """Borrow a session for the body of a with-statement.
+        If the body raises a DRMAA2Exception, or the RuntimeError that
+        a JobSession raises when the library returns nothing, the
+        session is checked before anyone else gets it.
+
+        :param timeout float: Seconds to wait for a free session,
+                              or None to wait as long as it takes.
+        :raises TimeoutError: If no session came free in time.
+        """
+        name, session, stale = self._take(timeout)
+        try:
+            # Opening and checking talk to the qmaster, so they
+            # happen outside the lock.
+            if stale and not self.check(session):
+                LOGGER.debug("Pooled session {} is unhealthy".format(name))
+                self._discard(session)
+                session = None
+            if session is None:
+                session = self.opener(name)
+        except BaseException:
+            self._give_back(name, None)
+            raise
+        try:
+            yield session
+        except (DRMAA2Exception, RuntimeError):
+            if not self.check(session):
+                self._discard(session)
+                session = None
+            raise
+        finally:
+            self._give_back(name, session)
+
+    def _take(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while not self._idle:
+                if self._closed:
+                    raise RuntimeError("SessionPool is closed")
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("No session free in the pool")
+                self._condition.wait(remaining)
+            # The most recently used session is warmest.
+            used, name, session = self._idle.pop()
+            self._leased += 1
+        stale = (session is not None and self.check_after is not None and
+                 time.monotonic() - used > self.check_after)
+        return name, session, stale
+
+    def _give_back(self, name, session):
+        with self._condition:
+            self._leased -= 1
+            if self._closed:
+                expired = [session] if session is not None else []
+            else:
+                self._idle.append((time.monotonic(), name, session))
+                expired = self._expire()
+            self._condition.notify()
+        for session in expired:
+            self._discard(session)
+
+    def _expire(self):
+        """Take idle sessions past their time to live out of the pool.
+        Call this holding the lock."""
+        expired = list()
+        now = time.monotonic()
+        for idx, (used, name, session) in enumerate(self._idle):
+            if session is not None and now - used > self.ttl:
+                expired.append(session)
+                self._idle[idx] = (used, name, None)
+        return expired
+
+    def reap(self):
+        """Close sessions that have been idle too long.
+
+        :return int: How many were closed.
+        """
+        with self._condition:
+            expired = self._expire()
+        for session in expired:
+            self._discard(session)
+        return len(expired)
+
+    def _discard(self, session):
+        LOGGER.debug("Closing pooled session {}".format(session.name))
+        try:
+            session.close()
+        except DRMAA2Exception as err:
+            LOGGER.debug("Could not close {}: {}".format(session.name, err))
+        session.__del__()
+
+    def close(self, destroy=False):
+        """Close the idle sessions. Leased sessions are closed when
+        they come back.
+
+        :param destroy bool: Also remove them from the scheduler.
+        """
+        with self._condition:
+            entries = self._idle
+            self._idle = list()
+            self._closed = True
+            self._condition.notify_all()
+        for used, name, session in entries:
+            if session is not None:
+                self._discard(session)
+            if destroy:
+                try:
+                    JobSession.destroy_named(name)
+                except DRMAA2Exception as err:
+                    LOGGER.debug("Could not destroy {}: {}".format(name, err))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
@@ -0,0 +1,231 @@
+"""
+A Reaper removes finished jobs from the scheduler's memory, so a
+session that lives for weeks lists its jobs as quickly as on its first
+day. Before it reaps a job, it asks for the job's information and keeps
+it, in memory and, if given a journal, in an accounting file::
+
+    with JobSession("nightly", keep=True) as session:
+        reaper = session.start_reaper(keep=1000, max_age=3600,
+                                      journal="nightly.csv")
+        ...
+        exit_status = reaper.info(job.id)["exitStatus"]
+
+The reaper only removes jobs that their owner is done with, meaning
+jobs that wait_any_terminated on the session has returned, or jobs
+passed to consume. Otherwise a wait loop, such as JobSession.map,
+would never hear that those jobs finished. Of those, a job is reaped
+once more than ``keep`` jobs that finished after it are waiting, or
+once it finished more than ``max_age`` seconds ago. Set both to None
+to reap each job as soon as it is consumed and collected. The reaper
+works in a daemon thread every ``interval`` seconds, or call reap_once
+from your own loop. The journal is a CSV file, appended on each pass,
+with the columns of accounting.export_accounting.
+"""
+import collections
+import heapq
+import logging
+import threading
+import time
+from ctypes import byref
+from .interface import *
+from .errors import last_error
+from .accounting import COLUMNS, info_columns, write_chunks
+from .session import JobInfo, JobStrategy
+
+
+LOGGER = logging.getLogger("drmaa2.reaper")
+
+
+class Reaper:
+    """Collects information about a session's finished jobs, then
+    reaps them according to a retention policy."""
+    def __init__(self, session, keep=1000, max_age=None, interval=60,
+                 batch_size=1000, journal=None, cache_size=10000,
+                 clock=time.time):
+        """
+        :param session JobSession: The session whose jobs to reap.
+        :param keep int: How many consumed jobs to leave in the scheduler.
+        :param max_age float: Seconds after it finishes to reap a
+                              consumed job.
+        :param interval float: Seconds between passes of the thread.
+        :param batch_size int: Jobs listed and journaled at a time.
+        :param journal str: CSV file to append to before reaping.
+        :param cache_size int: How many jobs' information to keep in
+                               memory, newest first.
+        :param clock: Function that returns seconds since the epoch.
+        """
+        self.session = session
+        self.keep = keep
+        self.max_age = max_age
+        self.interval = interval
+        self.batch_size = batch_size
+        self.journal = journal
+        self.cache_size = cache_size
+        self.clock = clock
+        self.collected = 0
+        """Jobs whose information was collected."""
+        self.reaped = 0
+        """Jobs removed from the scheduler."""
+        self._cache = collections.OrderedDict()
+        self._waiting = list()
+        """A heap of (finishTime, job ID, Job) collected and consumed,
+        but not reaped."""
+        self._held = dict()
+        """From job ID to (finishTime, job ID, Job), for jobs collected
+        but not yet consumed."""
+        self._consumed = set()
+        """IDs of jobs consumed before they were collected."""
+        self._newly_consumed = collections.deque()
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """Start reaping in a daemon thread.
+
+        :return Reaper: This reaper.
+        """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, daemon=True,
+                name="drmaa2-reaper-{}".format(self.session.name))
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the thread, after the pass it is on."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reap_once()
+            except Exception as err:
+                LOGGER.warning("Reaping {} failed: {}".format(
+                    self.session.name, err))
+
+    def consume(self, *jobs):
+        """Say that the caller is done with these finished jobs, so they
+        may be reaped. JobSession.wait_any_terminated calls this for
+        each job it returns. This doesn't wait for a pass to finish.
+
+        :param jobs: Job objects.
+        """
+        self._newly_consumed.extend(job.id for job in jobs)
+
+    def info(self, job_id):
+        """What the scheduler said about a job before it was reaped.
+
+        :param job_id str: The job's ID.
+        :return dict: From column name to value, or None if this
+                      didn't collect the job or has forgotten it.
+        """
+        with self._lock:
+            return self._cache.get(job_id)
+
+    def reap_once(self):
+        """Collect the information of newly finished jobs, then reap
+        those the retention policy no longer keeps.
+
+        :return int: How many jobs were reaped.
+        """
+        with self._lock:
+            self._collect()
+            self._take_consumed()
+            return self._reap(self._due())
+
+    def _take_consumed(self):
+        while self._newly_consumed:
+            job_id = self._newly_consumed.popleft()
+            entry = self._held.pop(job_id, None)
+            if entry is not None:
+                heapq.heappush(self._waiting, entry)
+            elif job_id not in self._seen:
+                self._consumed.add(job_id)
+
+    def _collect(self):
+        for state in (JState.done, JState.failed):
+            job_filter = JobInfo(library=self.session.library)
+            job_filter.jobState = state.name
+            for jobs in self.session.jobs(job_filter,
+                                          chunk_size=self.batch_size):
+                self._collect_chunk(
+                    [job for job in jobs if job.id not in self._seen])
+
+    def _collect_chunk(self, jobs):
+        library = self.session._lib
+        columns = {name: list() for (name, kind) in COLUMNS}
+        collected = list()
+        for job in jobs:
+            info_ptr = library.drmaa2_j_get_info(JobStrategy.to_void(job))
+            if not info_ptr:
+                LOGGER.debug("No information for {}: {}".format(
+                    job, last_error(library)))
+                continue
+            try:
+                info_columns(columns, info_ptr.contents, self.session.library)
+            finally:
+                library.drmaa2_jinfo_free(byref(info_ptr))
+            collected.append(job)
+        if not collected:
+            return
+        if self.journal:
+            write_chunks([columns], self.journal, "csv")
+        now = self.clock()
+        for idx, job in enumerate(collected):
+            row = {name: columns[name][idx] for (name, kind) in COLUMNS}
+            self._cache[job.id] = row
+            finished = row["finishTime"]
+            entry = (finished if finished is not None else now, job.id, job)
+            if job.id in self._consumed:
+                self._consumed.discard(job.id)
+                heapq.heappush(self._waiting, entry)
+            else:
+                self._held[job.id] = entry
+            self._seen.add(job.id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        self.collected += len(collected)
+
+    def _due(self):
+        """Take consumed jobs the policy no longer keeps off the heap."""
+        waiting = self._waiting
+        if self.keep is None and self.max_age is None:
+            keep, oldest = 0, None
+        else:
+            keep = self.keep if self.keep is not None else len(waiting)
+            oldest = (self.clock() - self.max_age
+                      if self.max_age is not None else None)
+        due = list()
+        while waiting and (len(waiting) > keep or
+                           (oldest is not None and waiting[0][0] < oldest)):
+            due.append(heapq.heappop(waiting)[2])
+        return due
+
+    def _reap(self, jobs):
+        library = self.session._lib
+        reaped = 0
+        for job in jobs:
+            if library.drmaa2_j_reap(JobStrategy.to_void(job)):
+                # Leave it in _seen so it isn't journaled twice.
+                LOGGER.debug("Could not reap {}: {}".format(
+                    job, last_error(library)))
+                continue
+            self._seen.discard(job.id)
+            reaped += 1
+        self.reaped += reaped
+        if reaped:
+            LOGGER.debug("Reaped {} jobs from {}".format(
+                reaped, self.session.name))
+        return reaped
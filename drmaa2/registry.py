@@ -0,0 +1,122 @@
+"""
+A TemplateRegistry keeps serialized JobTemplates in one append-only file,
+keyed by the hash of their contents. Any number of processes can share
+the file. Each reads it through a memory map, so looking up a template
+copies only that template's bytes, and storing a template that is
+already there does nothing::
+
+    registry = TemplateRegistry("/scratch/me/templates.reg")
+    key = registry.put(job_template)
+    # In a worker process
+    job_template = TemplateRegistry("/scratch/me/templates.reg").get(key)
+
+Each record is a four-byte little-endian length, the 32-byte SHA-256
+digest of the payload, and the payload from JobTemplate.to_bytes.
+"""
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+from .session import JobTemplate
+
+
+LOGGER = logging.getLogger("drmaa2.registry")
+HEADER = struct.Struct("<I32s")
+
+
+class TemplateRegistry:
+    """An on-disk store of templates, deduplicated by content hash."""
+    def __init__(self, path):
+        """
+        :param path str: The registry file, which is created if missing.
+        """
+        self.path = str(path)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND,
+                           0o644)
+        self._map = None
+        self._scanned = 0
+        self._offsets = dict()
+
+    def close(self):
+        self._map = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        self._refresh()
+        return len(self._offsets)
+
+    def __contains__(self, key):
+        self._refresh()
+        return key in self._offsets
+
+    def keys(self):
+        self._refresh()
+        return list(self._offsets)
+
+    def _refresh(self):
+        """Index records that other processes appended since last time."""
+        size = os.fstat(self._fd).st_size
+        if size == self._scanned:
+            return
+        # Views from get_bytes may still hold the old map, so let
+        # garbage collection close it.
+        self._map = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+        position = self._scanned
+        while position + HEADER.size <= size:
+            length, digest = HEADER.unpack_from(self._map, position)
+            start = position + HEADER.size
+            if start + length > size:
+                break  # Another process is still writing this one.
+            self._offsets.setdefault(digest.hex(), (start, length))
+            position = start + length
+        self._scanned = position
+
+    def put_bytes(self, payload):
+        """Store a serialized template.
+
+        :param payload bytes: From JobTemplate.to_bytes.
+        :return str: The hex content hash, which is the key.
+        """
+        digest = hashlib.sha256(payload).digest()
+        key = digest.hex()
+        if key in self:
+            return key
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            self._refresh()
+            if key not in self._offsets:
+                os.write(self._fd, HEADER.pack(len(payload), digest) + payload)
+                LOGGER.debug("Registered template {}".format(key))
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return key
+
+    def get_bytes(self, key):
+        """A read-only view of a stored serialization.
+
+        :param key str: The hex content hash.
+        :return memoryview: The payload.
+        :raises KeyError: If there is no such template.
+        """
+        if key not in self:
+            raise KeyError(key)
+        start, length = self._offsets[key]
+        return memoryview(self._map)[start:start + length]
+
+    def put(self, job_template):
+        """Store a JobTemplate and return its content hash."""
+        return self.put_bytes(job_template.to_bytes())
+
+    def get(self, key):
+        """Rebuild the JobTemplate stored under a content hash."""
+        return JobTemplate.from_bytes(self.get_bytes(key))
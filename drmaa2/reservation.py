@@ -0,0 +1,201 @@
+"""
+Advance reservations hold slots for a while, so that jobs that name
+the reservation start in those slots without waiting in the queue::
+
+    with ReservationSession() as rs:
+        request = ReservationTemplate()
+        request.minSlots = request.maxSlots = 16
+        request.duration = 3600
+        reservation = rs.request(request)
+        job_template.reservationId = reservation.id
+        ...
+        reservation.terminate()
+
+The library has no drmaa2_r_free, so reservation handles aren't freed.
+"""
+import collections
+import datetime
+from ctypes import byref, c_char_p
+from uuid import uuid4
+from .interface import *
+from .errors import *
+from .wrapping import *
+
+
+LOGGER = logging.getLogger("drmaa2.reservation")
+DRMAA_LIB = load_drmaa_library()
+
+
+class ReservationTemplate:
+    """What to reserve. This wraps a DRMAA2_RTEMPLATE."""
+    def __init__(self):
+        self._wrapped = DRMAA_LIB.drmaa2_rtemplate_create()
+
+    def __del__(self):
+        if getattr(self, "_wrapped", None) and DRMAA_LIB:
+            DRMAA_LIB.drmaa2_rtemplate_free(byref(self._wrapped))
+            self._wrapped = None
+
+    reservationName = DRMAA2String("reservationName")
+    """A name for the reservation."""
+    startTime = DRMAA2Time("startTime")
+    """When the reservation starts. Unset means now."""
+    endTime = DRMAA2Time("endTime")
+    """When it ends."""
+    duration = DRMAA2Seconds("duration")
+    """How many seconds it lasts, as an alternative to endTime."""
+    minSlots = DRMAA2LongLong("minSlots")
+    """Fewest slots to reserve."""
+    maxSlots = DRMAA2LongLong("maxSlots")
+    """Most slots to reserve."""
+    jobCategory = DRMAA2String("jobCategory")
+    """A job category whose machines to reserve."""
+    usersACL = DRMAA2StringList("usersACL", ListType.stringlist)
+    """Users who may run jobs in the reservation."""
+    candidateMachines = DRMAA2StringList("candidateMachines",
+                                         ListType.stringlist)
+    """Machine names where the slots may be."""
+    minPhysMemory = DRMAA2LongLong("minPhysMemory")
+    """Least physical memory each machine must have."""
+    machineOS = DRMAA2Enum("machineOS", OS)
+    """Operating system of the machines, from the OS enum."""
+    machineArch = DRMAA2Enum("machineArch", CPU)
+    """Architecture of the machines, from the CPU enum."""
+
+
+ReservationInfo = collections.namedtuple(
+    "ReservationInfo", "reservationId reservationName reservedStartTime "
+    "reservedEndTime reservedSlots")
+ReservationInfo.__doc__ = """A copy of what a DRMAA2_RINFO says about a
+reservation. Times are datetimes, or None if unset."""
+
+
+def _moment(when):
+    return datetime.datetime.fromtimestamp(when) if when >= 0 else None
+
+
+class Reservation:
+    """A reservation the scheduler granted, which wraps a drmaa2_r."""
+    def __init__(self, handle):
+        self._wrapped = drmaa2_r(handle)
+        self.id = return_str(DRMAA_LIB.drmaa2_r_get_id(self._wrapped))
+
+    def __repr__(self):
+        return "Reservation({!r})".format(self.id)
+
+    def info(self):
+        """Ask the scheduler about this reservation.
+
+        :return ReservationInfo: What it knows.
+        """
+        info_ptr = DRMAA_LIB.drmaa2_r_get_info(self._wrapped)
+        if not info_ptr:
+            raise RuntimeError(last_error())
+        try:
+            info = info_ptr.contents
+            slots = info.reservedSlots
+            return ReservationInfo(
+                info.reservationId.value.decode()
+                if info.reservationId else None,
+                info.reservationName.value.decode()
+                if info.reservationName else None,
+                _moment(info.reservedStartTime),
+                _moment(info.reservedEndTime),
+                slots if slots != UNSET_NUM else None)
+        finally:
+            DRMAA_LIB.drmaa2_rinfo_free(byref(info_ptr))
+
+    def terminate(self):
+        """Give the slots back, whether or not the reservation has
+        started. Jobs that were waiting for it fail."""
+        CheckError(DRMAA_LIB.drmaa2_r_terminate(self._wrapped))
+
+
+class ReservationSession:
+    """Asks the scheduler for advance reservations. This wraps a
+    drmaa2_rsession, in the same way JobSession wraps a job session."""
+    def __init__(self, name=None, contact=None, keep=False):
+        """
+        :param name str: A name for the session. The default is a UUID.
+        :param contact str: Maybe leave this None.
+        :param keep bool: Whether to leave the session in the scheduler
+                          when used as a context manager.
+        """
+        name = name or uuid4().hex
+        LOGGER.debug("Creating ReservationSession {}".format(name))
+        contact_str = contact.encode() if contact else c_char_p()
+        handle = DRMAA_LIB.drmaa2_create_rsession(name.encode(), contact_str)
+        if not handle:
+            raise RuntimeError(last_error())
+        self._session = drmaa2_rsession(handle)
+        self._open = True
+        self.name = name
+        self.keep = keep
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        self.__del__()
+        if not self.keep:
+            self.destroy()
+
+    @classmethod
+    def from_existing(cls, name):
+        """Open a reservation session that already exists.
+
+        :param name str: Its name, as from names.
+        """
+        handle = DRMAA_LIB.drmaa2_open_rsession(name.encode())
+        if not handle:
+            raise RuntimeError(last_error())
+        obj = cls.__new__(cls)
+        obj._session = drmaa2_rsession(handle)
+        obj._open = True
+        obj.name = name
+        obj.keep = True
+        return obj
+
+    @staticmethod
+    def names():
+        """Ask the scheduler what reservation sessions exist.
+
+        :return list(str): Their names.
+        """
+        name_list = DRMAA_LIB.drmaa2_get_rsession_names()
+        return list(DRMAA2List.stream(name_list, ListType.stringlist))
+
+    def request(self, reservation_template):
+        """Ask for a reservation.
+
+        :param reservation_template ReservationTemplate: What to reserve.
+        :return Reservation: The reservation, if the scheduler grants it.
+        """
+        handle = DRMAA_LIB.drmaa2_rsession_request_reservation(
+            self._session, reservation_template._wrapped)
+        if not handle:
+            raise RuntimeError(last_error())
+        reservation = Reservation(handle)
+        LOGGER.debug("Granted {}".format(reservation))
+        return reservation
+
+    def close(self):
+        """Close the session, which leaves its reservations in place."""
+        if self._open:
+            CheckError(DRMAA_LIB.drmaa2_close_rsession(self._session))
+            self._open = False
+
+    def destroy(self):
+        """Remove the session from the scheduler."""
+        ReservationSession.destroy_named(self.name)
+
+    @staticmethod
+    def destroy_named(name):
+        LOGGER.debug("Destroying reservation session {}".format(name))
+        CheckError(DRMAA_LIB.drmaa2_destroy_rsession(name.encode()))
+
+    def __del__(self):
+        if getattr(self, "_session", None):
+            DRMAA_LIB.drmaa2_rsession_free(byref(self._session))
+            self._session = None
@@ -8,12 +8,16 @@ provide access to the native library.
 
 """
 import collections
+import hashlib
+import json
 from ctypes import cast
 from ctypes import byref
+from ctypes import addressof, create_string_buffer, sizeof
 from uuid import uuid4
 from .interface import *
 from .errors import *
 from .wrapping import *
+from .capabilities import supports
 
 
 LOGGER = logging.getLogger("drmaa2.session")
@@ -107,8 +111,8 @@ class JobTemplate:
     resourceLimits = DRMAA2Dict("resourceLimits")
     """A list of desired resources, as a dict of strings where
     the keys are from the ResourceLimits Enum."""
-    accountingId = DRMAA2Dict("accountingId")
-    """A dictionary of accounting information."""
+    accountingId = DRMAA2String("accountingId")
+    """A string of accounting information."""
 
     def implementation_specific(self):
         """Each implementation of DRMAA (UGE, SGE, etc) can add
@@ -144,6 +148,74 @@ class JobTemplate:
             self._wrapped, name.encode(), value.encode())
         )
 
+    @classmethod
+    def _fields(cls):
+        """The descriptors that wrap struct members, in struct order."""
+        return [(name, cls.__dict__[name])
+                for (name, _) in DRMAA2_JTEMPLATE._fields_
+                if name in cls.__dict__]
+
+    def to_dict(self):
+        """All values that are set, including implementation-specific
+        ones, as a dictionary of plain Python types. Times are kept
+        as the integers in the struct."""
+        values = dict()
+        for name, descriptor in self._fields():
+            if isinstance(descriptor, DRMAA2Time):
+                value = getattr(self._wrapped.contents, name)
+                if value == Times.unset.value:
+                    value = None
+            else:
+                value = getattr(self, name)
+            if value or value == 0 and not isinstance(value, bool):
+                values[name] = value
+        impl = dict()
+        for name in self.implementation_specific():
+            try:
+                value = self.get_impl_spec(name)
+            except DRMAA2Exception:
+                value = None  # UGE complains about unset values.
+            if value:
+                impl[name] = value
+        if impl:
+            values["implementationSpecific"] = impl
+        return values
+
+    @classmethod
+    def from_dict(cls, values):
+        """Make a new JobTemplate from the output of to_dict."""
+        template = cls()
+        descriptors = dict(cls._fields())
+        for name, value in values.items():
+            if name == "implementationSpecific":
+                for impl_name, impl_value in value.items():
+                    template.set_impl_spec(impl_name, impl_value)
+            elif isinstance(descriptors[name], DRMAA2Time):
+                setattr(template._wrapped.contents, name, value)
+            else:
+                setattr(template, name, value)
+        return template
+
+    def to_bytes(self):
+        """A canonical serialization, meaning two templates with the
+        same values give the same bytes. It is compact JSON with
+        sorted keys and without the unset values."""
+        return json.dumps(self.to_dict(), sort_keys=True,
+                          separators=(",", ":")).encode()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Make a new JobTemplate from the output of to_bytes."""
+        return cls.from_dict(json.loads(bytes(data).decode()))
+
+    def content_hash(self):
+        """A stable hex digest of the values in this template."""
+        return hashlib.sha256(self.to_bytes()).hexdigest()
+
+    def __reduce__(self):
+        """Templates pickle through their canonical serialization."""
+        return (self.__class__.from_bytes, (self.to_bytes(),))
+
     def __repr__(self):
         return "JobTemplate" + self.__str__()
 
@@ -247,7 +319,8 @@ class JobStrategy:
         j = cast(void_ptr, POINTER(DRMAA2_J))
         if j:
             c = j.contents
-            return Job(c.id.value.decode(), c.sessionName.value.decode())
+            return Job(c.id.value.decode(),
+                       STRING_INTERN.from_bytes(c.sessionName.value))
         else:
             return None
 
@@ -259,19 +332,245 @@ class JobStrategy:
         j.sessionName = job.sessionName.encode()
         return byref(j)
 
+    @staticmethod
+    def pack(jobs):
+        """Given Pythonic Jobs, lay out all of them at once for
+        a DRMAA2List. There is one array of DRMAA2_J and one buffer
+        of NUL-terminated strings, in which each distinct session
+        name appears once.
+
+        :param jobs: An iterable of Job, or of (id, session name) pairs.
+        :return: A list of ctypes objects that own the memory, which
+                 the caller must keep, and the address of each DRMAA2_J.
+        """
+        pieces = list()
+        fields_to_pieces = list()
+        session_pieces = dict()
+        for job_id, session_name in jobs:
+            fields_to_pieces.append(len(pieces))
+            pieces.append(job_id)
+            session_idx = session_pieces.get(session_name)
+            if session_idx is None:
+                session_idx = len(pieces)
+                session_pieces[session_name] = session_idx
+                pieces.append(session_name)
+            fields_to_pieces.append(session_idx)
+        if not pieces:
+            return list(), list()
+        packed = ("\0".join(pieces) + "\0").encode()
+        # Find where each piece starts, in bytes, after encoding.
+        piece_offsets = [0]
+        terminator = packed.find(b"\0")
+        while terminator < len(packed) - 1:
+            piece_offsets.append(terminator + 1)
+            terminator = packed.find(b"\0", terminator + 1)
+        strings = create_string_buffer(packed, len(packed))
+        base = addressof(strings)
+        fields = (c_void_p * len(fields_to_pieces))(
+            *[base + piece_offsets[p] for p in fields_to_pieces])
+        job_cnt = len(fields_to_pieces) // 2
+        arena = (DRMAA2_J * job_cnt).from_buffer(fields)
+        stride = sizeof(DRMAA2_J)
+        start = addressof(arena)
+        return [strings, fields, arena], range(
+            start, start + job_cnt * stride, stride)
+
     @staticmethod
     def compare_pointers(a, b):
         """For searching a list, is this value equal to the one
-        we are searching for? Arguments are ctypes pointers."""
-        return JobStrategy.from_void(a) == JobStrategy.from_void(b)
-        # return libc.memcmp(a, b, ctypes.sizeof(DRMAA2_J))
+        we are searching for? Arguments are ctypes pointers.
+        This compares the strings in place with strcmp."""
+        a_ptr = cast(a, POINTER(DRMAA2_J))
+        b_ptr = cast(b, POINTER(DRMAA2_J))
+        if a_ptr and b_ptr:
+            return a_ptr.contents == b_ptr.contents
+        else:
+            return not a_ptr and not b_ptr
+
+
+class JobInfo:
+    """Information about a job, which wraps a DRMAA2_JINFO.
+    An empty JobInfo is also a filter for listing jobs, where
+    members that are set must match."""
+    def __init__(self, wrapped=None, library=None):
+        """
+        :param wrapped: A pointer to a DRMAA2_JINFO, which this object
+                        will free. If None, this makes an empty one.
+        :param library: The library that made or will free it,
+                        if not the package's.
+        """
+        self._lib = library if library is not None else DRMAA_LIB
+        self._wrapped = wrapped or self._lib.drmaa2_jinfo_create()
+
+    def __del__(self):
+        if getattr(self, "_wrapped", None):
+            self._lib.drmaa2_jinfo_free(byref(self._wrapped))
+            self._wrapped = None
+
+    jobId = DRMAA2String("jobId")
+    """The job ID as a string."""
+    exitStatus = DRMAA2LongLong("exitStatus")
+    """Exit status of the job, or None if it hasn't exited."""
+    terminatingSignal = DRMAA2String("terminatingSignal")
+    """Name of the signal that ended the job."""
+    annotation = DRMAA2String("annotation")
+    """Human-readable text from the scheduler."""
+    jobState = DRMAA2Enum("jobState", JState)
+    """Name of the state, from the JState enum."""
+    jobSubState = DRMAA2String("jobSubState")
+    """Implementation-specific substate."""
+    allocatedMachines = DRMAA2StringList("allocatedMachines",
+                                         ListType.stringlist)
+    """Names of machines where the job runs."""
+    submissionMachine = DRMAA2String("submissionMachine", interned=True)
+    """Name of the machine from which the job was submitted."""
+    jobOwner = DRMAA2String("jobOwner", interned=True)
+    """User who owns the job."""
+    slots = DRMAA2LongLong("slots")
+    """Number of slots the job has."""
+    queueName = DRMAA2String("queueName", interned=True)
+    """Queue where the job runs."""
+    wallclockTime = DRMAA2LongLong("wallclockTime")
+    """Seconds the job has run."""
+    cpuTime = DRMAA2LongLong("cpuTime")
+    """Seconds of CPU time used."""
+    submissionTime = DRMAA2Time("submissionTime")
+    """When the job was submitted."""
+    dispatchTime = DRMAA2Time("dispatchTime")
+    """When the job started to run."""
+    finishTime = DRMAA2Time("finishTime")
+    """When the job ended."""
+
+
+def job_info(job, library=None):
+    """Ask the scheduler for information about a job.
+
+    :param job Job: The job.
+    :param library: The library of the job's cell, if not the package's.
+    :return JobInfo: What it knows.
+    """
+    library = library if library is not None else DRMAA_LIB
+    info_ptr = library.drmaa2_j_get_info(JobStrategy.to_void(job))
+    if not info_ptr:
+        raise RuntimeError(last_error(library))
+    return JobInfo(info_ptr, library)
+
+
+MachineInfo = collections.namedtuple(
+    "MachineInfo", "name available sockets coresPerSocket threadsPerCore "
+    "load physMemory virtMemory machineArch machineOS machineOSVersion")
+MachineInfo.__doc__ = """A copy of a DRMAA2_MACHINEINFO. The architecture
+and operating system are names from the CPU and OS enums, and the version
+is a tuple of strings."""
+
+
+@conversion_strategy(ListType.machineinfolist)
+class MachineInfoStrategy:
+    @staticmethod
+    def from_void(void_ptr):
+        """Given a ctypes.c_void_p, return a MachineInfo."""
+        machine_ptr = cast(void_ptr, POINTER(DRMAA2_MACHINEINFO))
+        if not machine_ptr:
+            return None
+        m = machine_ptr.contents
+        if m.machineOSVersion:
+            version = m.machineOSVersion.contents
+            os_version = (STRING_INTERN.from_bytes(version.major.value),
+                          STRING_INTERN.from_bytes(version.minor.value))
+        else:
+            os_version = None
+        return MachineInfo(
+            STRING_INTERN.from_bytes(m.name.value),
+            m.available == Bool.true.value, m.sockets, m.coresPerSocket,
+            m.threadsPerCore, m.load, m.physMemory, m.virtMemory,
+            CPU(m.machineArch).name, OS(m.machineOS).name, os_version)
+
+    @staticmethod
+    def to_void(machine):
+        raise TypeError("The library makes machine lists. We don't.")
+
+    @staticmethod
+    def compare_pointers(a, b):
+        return (cast(a, POINTER(DRMAA2_MACHINEINFO)).contents ==
+                cast(b, POINTER(DRMAA2_MACHINEINFO)).contents)
+
+
+@conversion_strategy(ListType.queueinfolist)
+class QueueInfoStrategy:
+    @staticmethod
+    def from_void(void_ptr):
+        """Given a ctypes.c_void_p, return the name of the queue."""
+        queue_ptr = cast(void_ptr, POINTER(DRMAA2_QUEUEINFO))
+        if queue_ptr:
+            return STRING_INTERN.from_bytes(queue_ptr.contents.name.value)
+        else:
+            return None
+
+    @staticmethod
+    def to_void(queue):
+        raise TypeError("The library makes queue lists. We don't.")
+
+    @staticmethod
+    def compare_pointers(a, b):
+        return QueueInfoStrategy.from_void(a) == QueueInfoStrategy.from_void(b)
+
+
+def job_state(job):
+    """Ask the scheduler for the state of a job.
+
+    :param job Job: The job.
+    :return JState: Its state.
+    """
+    substate = drmaa2_string()
+    state = DRMAA_LIB.drmaa2_j_get_state(JobStrategy.to_void(job),
+                                         byref(substate))
+    if substate:
+        DRMAA_LIB.drmaa2_string_free(byref(substate))
+    if state == JState.unset.value:
+        check_errno()
+    return JState(state)
+
+
+def job_hold(job):
+    """Put a queued job on hold."""
+    CheckError(DRMAA_LIB.drmaa2_j_hold(JobStrategy.to_void(job)))
+
+
+def job_release(job):
+    """Release a job that was held or submitted with submitAsHold."""
+    CheckError(DRMAA_LIB.drmaa2_j_release(JobStrategy.to_void(job)))
+
+
+def job_suspend(job, library=None):
+    """Stop a running job where it is, keeping its slots.
+
+    :param job Job: The job.
+    :param library: The library of the job's cell, if not the package's.
+    """
+    library = library if library is not None else DRMAA_LIB
+    CheckError(library.drmaa2_j_suspend(JobStrategy.to_void(job)), library)
+
+
+def job_resume(job, library=None):
+    """Continue a suspended job.
+
+    :param job Job: The job.
+    :param library: The library of the job's cell, if not the package's.
+    """
+    library = library if library is not None else DRMAA_LIB
+    CheckError(library.drmaa2_j_resume(JobStrategy.to_void(job)), library)
+
+
+def job_terminate(job):
+    """Stop a job, whether it is queued, held, or running."""
+    CheckError(DRMAA_LIB.drmaa2_j_terminate(JobStrategy.to_void(job)))
 
 
 class JobSession:
     """The JobSession is the central class for running jobs.
     This Python class wraps a ctypes.Structure called
     DRMAA2_JSESSION."""
-    def __init__(self, name=None, contact=None, keep=False):
+    def __init__(self, name=None, contact=None, keep=False, library=None):
         """The IDL description says this should have a contact name,
         but it isn't supported. UGE always makes the contact your
         user name.
@@ -282,18 +581,22 @@ class JobSession:
         :param keep bool: This says whether to destroy this
                           session when it is reaped. Sessions normally
                           live forever until you destroy them.
+        :param library: A library from open_drmaa_library, for a session
+                        in another cell. By default, the package's.
         """
         name = name or uuid4().hex
         LOGGER.debug("Creating JobSession {}".format(name))
+        self.library = library
         contact_str = contact.encode() if contact else c_char_p()
-        self._session = DRMAA_LIB.drmaa2_create_jsession(
+        self._session = self._lib.drmaa2_create_jsession(
             name.encode(), contact_str
         )
         if not self._session:
-            raise RuntimeError(last_error())
+            raise RuntimeError(last_error(self._lib))
         self._open = True
         self.name = name
         self.keep = keep
+        self.reaper = None
 
     def __enter__(self):
         """Interface to make this a context manager."""
@@ -307,7 +610,7 @@ class JobSession:
             self.destroy()
 
     @classmethod
-    def from_existing(cls, name):
+    def from_existing(cls, name, library=None):
         """Creates a JobSession from a name. This goes to the scheduler,
         finds the session with that name, and creates an interface
         to it.
@@ -315,13 +618,15 @@ class JobSession:
         the job would be listed here as tangkend@crunch.
 
         :param name str: The string name from the names method.
+        :param library: As for the constructor.
         :return: JobSession instance.
         """
-        session = DRMAA_LIB.drmaa2_open_jsession(name.encode())
-        if not session:
-            raise RuntimeError(last_error())
         # Skip the __init__ if this job session already exists.
         obj = cls.__new__(cls)
+        obj.library = library
+        session = obj._lib.drmaa2_open_jsession(name.encode())
+        if not session:
+            raise RuntimeError(last_error(obj._lib))
         obj._session = session
         obj.name = name
         obj._open = True
@@ -331,52 +636,94 @@ class JobSession:
     def names():
         """Ask the scheduler what job sessions exist.
         :return list(str): returns a list of names."""
+        return list(JobSession.iter_names())
+
+    @staticmethod
+    def iter_names():
+        """Like names, but a generator that decodes one name at a time."""
         name_list = DRMAA_LIB.drmaa2_get_jsession_names()
-        session_names = list()
-        if name_list:
-            session_cnt = DRMAA_LIB.drmaa2_list_size(name_list)
-            LOGGER.debug("There are {} sessions".format(session_cnt))
-            for session_idx in range(session_cnt):
-                void_p = DRMAA_LIB.drmaa2_list_get(name_list, session_idx)
-                name = cast(void_p, drmaa2_string).value.decode()
-                session_names.append(name)
-            LOGGER.debug("Retrieved names of sessions.")
-            DRMAA_LIB.drmaa2_list_free(byref(c_void_p(name_list)))
-        else:
-            pass  # Nothing to return.
-        return session_names
+        return DRMAA2List.stream(name_list, ListType.stringlist)
+
+    def jobs(self, job_filter=None, chunk_size=None):
+        """The jobs in this session, decoded as you iterate.
+        The library's list is freed when the generator is
+        exhausted or closed, so stop early with close()::
+
+            running = JobInfo()
+            running.jobState = "running"
+            for job in js.jobs(running):
+                ...
+
+        :param job_filter JobInfo: Only jobs that match what is set here.
+        :param chunk_size int: If given, yield lists of this many jobs.
+        :return: Generator of Job, or of lists of Job.
+        """
+        filter_ptr = job_filter._wrapped if job_filter else None
+        job_list = self._lib.drmaa2_jsession_get_jobs(
+            self._session, filter_ptr)
+        if not job_list:
+            check_errno(self._lib)
+        return DRMAA2List.stream(job_list, ListType.joblist, chunk_size,
+                                 self.library)
+
+    @property
+    def _lib(self):
+        return self.library if self.library is not None else DRMAA_LIB
 
     def close(self):
         """A session must be closed to relinquish resources."""
         LOGGER.debug("close JobSession")
+        reaper = getattr(self, "reaper", None)
+        if reaper is not None:
+            reaper.stop()
+            self.reaper = None
         if self._open:
-            CheckError(DRMAA_LIB.drmaa2_close_jsession(self._session))
+            CheckError(self._lib.drmaa2_close_jsession(self._session),
+                       self.library)
             self._open = False
 
+    def start_reaper(self, **kwargs):
+        """Reap this session's finished jobs in a background thread,
+        after keeping their information. Closing the session stops it.
+        The arguments are those of reaper.Reaper, such as keep=1000
+        or max_age=3600.
+
+        It reaps only jobs that wait_any_terminated has returned
+        or that were passed to its consume method.
+
+        :return Reaper: The running reaper, whose info method has
+                        what was known about reaped jobs.
+        """
+        from .reaper import Reaper
+        if getattr(self, "reaper", None) is None:
+            self.reaper = Reaper(self, **kwargs).start()
+        return self.reaper
+
     def destroy(self):
         """Destroying a session removes it from the scheduler's memory.
         I wouldn't do this before it's closed."""
-        JobSession.destroy_named(self.name)
+        JobSession.destroy_named(self.name, self.library)
 
     @staticmethod
-    def destroy_named(name):
+    def destroy_named(name, library=None):
         """Destroy a session by name, removing it from the
         scheduler's memory."""
         LOGGER.debug("Destroying {}".format(name))
-        CheckError(DRMAA_LIB.drmaa2_destroy_jsession(
-            name.encode()))
+        library = library if library is not None else DRMAA_LIB
+        CheckError(library.drmaa2_destroy_jsession(
+            name.encode()), library)
 
     def __del__(self):
         """This frees allocated free store to hold the session.
         Call this after closing the session."""
         LOGGER.debug("free JobSession")
         if self._session:
-            DRMAA_LIB.drmaa2_jsession_free(pointer(self._session))  # void
+            self._lib.drmaa2_jsession_free(pointer(self._session))  # void
             self._session = None
 
     @property
     def contact(self):
-        contact_str = DRMAA_LIB.drmaa2_jsession_get_contact(self._session)
+        contact_str = self._lib.drmaa2_jsession_get_contact(self._session)
         if contact_str:
             return contact_str.decode()
         else:
@@ -390,16 +737,46 @@ class JobSession:
         :return Job: The Job, meaning its job_id and session name.
         """
         LOGGER.debug("enter run of {}".format(job_template))
-        job = DRMAA_LIB.drmaa2_jsession_run_job(
+        job = self._lib.drmaa2_jsession_run_job(
             self._session, job_template._wrapped)
         if not job:
             LOGGER.debug("Error submitting job.")
-            raise RuntimeError(last_error())
+            raise RuntimeError(last_error(self._lib))
         job_obj = JobStrategy.from_ptr(job)
         LOGGER.debug("run returning {}".format(job_obj))
-        DRMAA_LIB.drmaa2_j_free(job)
+        self._lib.drmaa2_j_free(job)
         return job_obj
 
+    def run_bulk(self, job_template, begin=1, end=1, step=1,
+                 max_parallel=None):
+        """Run an array job, where each task sees its index
+        in $DRMAA2_INDEX$.
+
+        :param job_template JobTemplate: The template for every task.
+        :param begin int: First index.
+        :param end int: Last index, included.
+        :param step int: Distance between indices.
+        :param max_parallel int: Most tasks to run at once. If the library
+                                 lacks the bulk_jobs_maxparallel
+                                 capability, this is ignored with a warning.
+        :return list(Job): The tasks.
+        """
+        if max_parallel is None:
+            max_parallel = UNSET_NUM
+        elif not supports(Capability.bulk_jobs_maxparallel):
+            LOGGER.warning("This DRM can't limit tasks running at once.")
+            max_parallel = UNSET_NUM
+        array = self._lib.drmaa2_jsession_run_bulk_jobs(
+            self._session, job_template._wrapped, begin, end, step,
+            max_parallel)
+        if not array:
+            raise RuntimeError(last_error(self._lib))
+        jobs = DRMAA2List.return_list(
+            self._lib.drmaa2_jarray_get_jobs(array), ListType.joblist,
+            self.library)
+        self._lib.drmaa2_jarray_free(byref(array))
+        return jobs
+
     def wait_any_terminated(self, job_list, how_long):
         """
         What is the next job that completes on the job list.
@@ -410,26 +787,193 @@ class JobSession:
                          Times.now, or the string "infinite" or "now" or "zero".
         :return: a Job object or None
         """
-        if isinstance(how_long, int):
-            try:
-                how_long = Times(how_long)
-            except ValueError:
-                if __name__ == '__main__':
-                    pass  # Well, the integer may be correct
-        elif isinstance(how_long, str):
-            how_long = Times[how_long]
-        else:
+        if isinstance(how_long, Times):
             how_long = how_long.value
-        if isinstance(job_list, DRMAA2List):
-            jobs_ptr = job_list.list_ptr
+        elif isinstance(how_long, str):
+            how_long = Times[how_long].value
         else:
-            jobs_ptr = DRMAA2List(job_list, ListType.joblist).list_ptr
-        job_ptr = DRMAA_LIB.drmaa2_jsession_wait_any_terminated(
-            self._session, jobs_ptr, drmaa2_time(how_long))
+            how_long = int(how_long)
+        if not isinstance(job_list, DRMAA2List):
+            # Keep a reference so the list isn't freed during the wait.
+            job_list = DRMAA2List(job_list, ListType.joblist,
+                                  library=self.library)
+        job_ptr = self._lib.drmaa2_jsession_wait_any_terminated(
+            self._session, job_list.list_ptr, drmaa2_time(how_long))
         if job_ptr:
             job = JobStrategy.from_ptr(job_ptr)
             # The returned job_ptr is NOT a copy, so don't free it.
+            reaper = getattr(self, "reaper", None)
+            if reaper is not None:
+                reaper.consume(job)
             return job
         else:
             return None
 
+    def map(self, job_templates, window=100, ordered=False,
+            how_long=Times.infinite):
+        """Run a stream of jobs, keeping at most window of them in
+        the scheduler at once. This takes the next template only when
+        a job finishes, so the input can be a generator of any length.
+
+        :param job_templates: Any iterable of JobTemplate. The same
+                              template can come back repeatedly after
+                              being modified.
+        :param window int: How many jobs may be in flight at once.
+        :param ordered bool: Yield in submission order instead of
+                             completion order. Finished jobs that wait
+                             for an earlier one count against the window.
+        :param how_long: Timeout for each wait, as for wait_any_terminated.
+        :return: A generator of (position, Job), where position is the
+                 index of the template in job_templates.
+        :raises DRMAA2Exception: If a wait fails other than by timing out.
+        """
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        templates = iter(job_templates)
+        active = DRMAA2List([], ListType.joblist, indexed=True,
+                            library=self.library)
+        positions = dict()
+        finished = dict()
+        submitted_cnt = 0
+        yielded_cnt = 0
+        exhausted = False
+        while True:
+            while not exhausted and len(positions) + len(finished) < window:
+                try:
+                    job_template = next(templates)
+                except StopIteration:
+                    exhausted = True
+                    break
+                job = self.run(job_template)
+                active.append(job)
+                positions[job] = submitted_cnt
+                submitted_cnt += 1
+            if not positions:
+                break
+            job = self.wait_any_terminated(active, how_long)
+            if job is None:
+                errno = last_errno(self._lib)
+                if errno != Error.timeout.value:
+                    CheckError(errno, self._lib)
+                continue
+            active.remove(job)
+            position = positions.pop(job)
+            if ordered:
+                finished[position] = job
+                while yielded_cnt in finished:
+                    yield yielded_cnt, finished.pop(yielded_cnt)
+                    yielded_cnt += 1
+            else:
+                yield position, job
+
+
+class MonitoringSession:
+    """A monitoring session asks about all jobs, queues, and machines
+    in the cluster, not only those from one job session.
+    This wraps a DRMAA2_MSESSION."""
+    def __init__(self, name=None, library=None):
+        """
+        :param name str: Name for this session. UGE doesn't keep it.
+        :param library: As for JobSession.
+        """
+        name = name or uuid4().hex
+        LOGGER.debug("Opening MonitoringSession {}".format(name))
+        self.library = library
+        self._session = self._lib.drmaa2_open_msession(name.encode())
+        if not self._session:
+            raise RuntimeError(last_error(self._lib))
+        self._open = True
+        self.name = name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        self.__del__()
+
+    def close(self):
+        LOGGER.debug("close MonitoringSession")
+        if self._open:
+            CheckError(self._lib.drmaa2_close_msession(self._session),
+                       self.library)
+            self._open = False
+
+    @property
+    def _lib(self):
+        return self.library if self.library is not None else DRMAA_LIB
+
+    def __del__(self):
+        if getattr(self, "_session", None):
+            self._lib.drmaa2_msession_free(pointer(self._session))
+            self._session = None
+
+    def all_jobs(self, job_filter=None):
+        """Every job the scheduler knows.
+
+        :param job_filter JobInfo: Only jobs that match what is set here.
+        :return list(Job): The jobs.
+        """
+        filter_ptr = job_filter._wrapped if job_filter else None
+        job_list = self._lib.drmaa2_msession_get_all_jobs(
+            self._session, filter_ptr)
+        if not job_list:
+            check_errno(self._lib)
+            return list()
+        return DRMAA2List.return_list(job_list, ListType.joblist,
+                                      self.library)
+
+    def jobs(self, job_filter=None, chunk_size=None):
+        """Like all_jobs, but a generator that decodes jobs as you
+        iterate, for clusters with more jobs than you want in memory.
+        See JobSession.jobs."""
+        filter_ptr = job_filter._wrapped if job_filter else None
+        job_list = self._lib.drmaa2_msession_get_all_jobs(
+            self._session, filter_ptr)
+        if not job_list:
+            check_errno(self._lib)
+        return DRMAA2List.stream(job_list, ListType.joblist, chunk_size,
+                                 self.library)
+
+    def iter_machines(self, names=None, chunk_size=None):
+        """Like machines, but a generator that decodes as you iterate."""
+        name_list = (DRMAA2List(names, library=self.library)
+                     if names else None)
+        machine_list = self._lib.drmaa2_msession_get_all_machines(
+            self._session, name_list.list_ptr if name_list else None)
+        if not machine_list:
+            check_errno(self._lib)
+        return DRMAA2List.stream(
+            machine_list, ListType.machineinfolist, chunk_size, self.library)
+
+    def machines(self, names=None):
+        """Information about machines.
+
+        :param names: A list of machine names, or None for all of them.
+        :return list(MachineInfo): The machines.
+        """
+        name_list = (DRMAA2List(names, library=self.library)
+                     if names else None)
+        machine_list = self._lib.drmaa2_msession_get_all_machines(
+            self._session, name_list.list_ptr if name_list else None)
+        if not machine_list:
+            check_errno(self._lib)
+            return list()
+        return DRMAA2List.return_list(machine_list, ListType.machineinfolist,
+                                      self.library)
+
+    def queues(self, names=None):
+        """Names of queues.
+
+        :param names: A list of queue names, or None for all of them.
+        :return list(str): The queue names.
+        """
+        name_list = (DRMAA2List(names, library=self.library)
+                     if names else None)
+        queue_list = self._lib.drmaa2_msession_get_all_queues(
+            self._session, name_list.list_ptr if name_list else None)
+        if not queue_list:
+            check_errno(self._lib)
+            return list()
+        return DRMAA2List.return_list(queue_list, ListType.queueinfolist,
+                                      self.library)
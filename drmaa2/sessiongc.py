@@ -0,0 +1,129 @@
+"""
+Finding and destroying job sessions that nobody uses.
+
+UGE keeps a named job session until someone destroys it, and a
+JobSession without a name gets a fresh UUID, so abandoned sessions
+pile up and make drmaa2_get_jsession_names slow. A session is stale
+when it has jobs and every one of them is done or failed. A session
+with no jobs may have just been made by a process that hasn't
+submitted yet, so it counts as stale only if you ask for that::
+
+    with MonitoringSession() as monitor:
+        names = stale_sessions(monitor, keep=[js.name])
+    collect_sessions(names, dry_run=True)   # Look first.
+    collect_sessions(names, max_workers=16)
+
+Sessions are destroyed from a pool of threads because each
+destroy is a round trip to the qmaster.
+"""
+import collections
+import concurrent.futures
+import logging
+from .interface import JState
+from .session import JobInfo, JobSession
+
+
+LOGGER = logging.getLogger("drmaa2.sessiongc")
+
+FINISHED = {JState.done, JState.failed}
+
+Collected = collections.namedtuple("Collected", "destroyed failed")
+Collected.__doc__ = """What collect_sessions did. destroyed is a list of
+session names and failed is a list of (name, exception)."""
+
+
+def short_name(name):
+    """UGE lists sessions as user@name but destroys them by name."""
+    return name.split("@")[-1]
+
+
+def _sessions_with(monitoring_session, states):
+    """Names of job sessions that have a job in any of these states,
+    from one filtered list of jobs per state."""
+    found = set()
+    job_filter = JobInfo(library=monitoring_session.library)
+    for state in states:
+        job_filter.jobState = state.name
+        for job in monitoring_session.all_jobs(job_filter):
+            found.add(short_name(job.sessionName))
+    return found
+
+
+def live_sessions(monitoring_session):
+    """Names of job sessions that have a job that isn't finished,
+    including jobs whose state the scheduler can't tell.
+
+    :param monitoring_session MonitoringSession: Where to ask for jobs.
+    :return set(str): Session names, without the user@ part.
+    """
+    return _sessions_with(
+        monitoring_session,
+        [state for state in JState
+         if state != JState.unset and state not in FINISHED])
+
+
+def stale_sessions(monitoring_session, names=None, keep=(),
+                   include_empty=False):
+    """Job sessions whose jobs have all finished.
+
+    :param monitoring_session MonitoringSession: Where to ask for jobs.
+    :param names: Session names to consider. The default is
+                  every session the scheduler has.
+    :param keep: Session names never to call stale, such as the
+                 sessions this process has open.
+    :param include_empty bool: Also call sessions with no jobs stale.
+    :return list(str): Session names as they were given.
+    """
+    if names is None:
+        names = JobSession.names()
+    protected = {short_name(n) for n in keep}
+    protected.update(live_sessions(monitoring_session))
+    if include_empty:
+        return [n for n in names if short_name(n) not in protected]
+    finished = _sessions_with(monitoring_session, FINISHED)
+    return [n for n in names if short_name(n) not in protected and
+            short_name(n) in finished]
+
+
+def collect_sessions(names, max_workers=8, dry_run=False, progress=None,
+                     destroy=JobSession.destroy_named):
+    """Destroy job sessions, several at a time.
+
+    :param names: Session names, as from stale_sessions.
+    :param max_workers int: Most destroys to have in flight at once.
+    :param dry_run bool: Report what would be destroyed, but don't.
+    :param progress: Called as progress(done, total, name, error)
+                     after each session, where error is None
+                     if it was destroyed.
+    :param destroy: Function that destroys one session by name.
+    :return Collected: Which were destroyed and which failed.
+    """
+    names = list(names)
+    if dry_run:
+        for idx, name in enumerate(names):
+            if progress:
+                progress(idx + 1, len(names), name, None)
+        return Collected(names, list())
+
+    def destroy_one(name):
+        try:
+            destroy(short_name(name))
+        except Exception as err:
+            return name, err
+        return name, None
+
+    destroyed = list()
+    failed = list()
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(destroy_one, n) for n in names]
+        for future in concurrent.futures.as_completed(futures):
+            name, err = future.result()
+            if err is None:
+                destroyed.append(name)
+            else:
+                failed.append((name, err))
+            if progress:
+                progress(len(destroyed) + len(failed), len(names), name, err)
+    LOGGER.debug("Destroyed {} sessions, {} failed".format(
+        len(destroyed), len(failed)))
+    return Collected(destroyed, failed)
@@ -0,0 +1,1174 @@
+"""
+A scheduler that lives in this process and runs on a virtual clock,
+for testing code built on this package with a million jobs in minutes.
+A Simulator has the same functions as the DRMAA2 library, so the
+wrappers call it instead of libdrmaa2.so::
+
+    with simulate(queues={"all.q": 500}, durations={"fit": 3600}) as sim:
+        with JobSession() as js:
+            for position, job in js.map(templates, window=1000):
+                ...
+        print(sim.report())
+
+Jobs take slots from their queue in first-come, first-served order, and
+each queue has a fixed number of slots. A job's duration comes from
+its job category in the durations, which can be a number of seconds,
+a distribution such as ``("lognormal", 5, 1)`` or ``("exponential", 60)``,
+or a list of durations to replay, such as from an accounting export.
+Without a category, ``/bin/sleep N`` runs N seconds, ``/bin/false``
+fails, and anything else takes the "default" duration.
+Waiting advances the virtual clock to the next event at once.
+
+Setting DRMAA2_SIMULATE in the environment before importing drmaa2
+uses a simulator in place of the library. Its value can be the path
+to a JSON file of keyword arguments for Simulator.
+Most of the tests run this way, ``DRMAA2_SIMULATE=1 pytest``, except
+those for Univa extensions, which the simulator doesn't have.
+"""
+import array
+import collections
+import ctypes
+import csv
+import getpass
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from ctypes import addressof, c_char_p, c_void_p, cast, pointer, POINTER
+from pathlib import Path
+from .interface import (Capability, JState, ListType, DRMAA2_J, DRMAA2_JARRAY,
+                        DRMAA2_JINFO, DRMAA2_JSESSION, DRMAA2_JTEMPLATE,
+                        DRMAA2_MACHINEINFO, DRMAA2_MSESSION, DRMAA2_QUEUEINFO,
+                        DRMAA2_RINFO, DRMAA2_RTEMPLATE, DRMAA2_VERSION, CPU,
+                        OS, Times, drmaa2_string, UNSET_NUM, UNSET_ENUM,
+                        using_library)
+
+
+LOGGER = logging.getLogger("drmaa2.simulator")
+
+# Error numbers from drmaa2.h
+SUCCESS = 0
+DENIED_BY_DRMS = 1
+SESSION_MANAGEMENT = 4
+TIMEOUT = 5
+INVALID_ARGUMENT = 7
+INVALID_SESSION = 8
+INVALID_STATE = 9
+UNSUPPORTED_OPERATION = 12
+
+UNSET_TIME = Times.unset.value
+CArgObject = type(ctypes.byref(ctypes.c_int()))
+TERMINAL = (JState.done.value, JState.failed.value)
+REAPED = -2
+"""The state of a job the scheduler has forgotten."""
+DONE = min(TERMINAL)
+TIME_FIELDS = ("startTime", "deadlineTime", "submissionTime", "dispatchTime",
+               "finishTime", "wallclockTime", "endTime", "duration",
+               "reservedStartTime", "reservedEndTime")
+
+
+def _number(value):
+    return value.value if hasattr(value, "value") else value
+
+
+def _address(arg):
+    """The address a ctypes argument would pass to C."""
+    if arg is None:
+        return 0
+    if isinstance(arg, int):
+        return arg
+    if isinstance(arg, CArgObject):
+        return addressof(arg._obj)
+    if isinstance(arg, (bytes, c_char_p, ctypes._Pointer)):
+        return cast(arg, c_void_p).value or 0
+    if isinstance(arg, c_void_p):
+        return arg.value or 0
+    return addressof(arg)
+
+
+def _pointee(arg):
+    """For the free functions, which take a pointer to a pointer,
+    the address that pointer points to."""
+    if isinstance(arg, CArgObject):
+        inner = arg._obj
+    elif isinstance(arg, ctypes._Pointer):
+        inner = arg.contents
+    else:
+        return _address(arg)
+    if isinstance(inner, (ctypes._Pointer, c_void_p, c_char_p)):
+        return _address(inner)
+    return addressof(inner)
+
+
+def _unset_struct(struct_type):
+    """Make a struct with the DRMAA2 unset value in each field."""
+    struct = struct_type()
+    for name, kind in struct_type._fields_:
+        if name in TIME_FIELDS:
+            setattr(struct, name, UNSET_TIME)
+        elif kind is ctypes.c_longlong:
+            setattr(struct, name, UNSET_NUM)
+        elif kind is ctypes.c_int and name in ("jobState", "machineOS",
+                                               "machineArch", "exitStatus"):
+            setattr(struct, name, UNSET_ENUM)
+    return struct
+
+
+def _draw(spec, rng):
+    """A duration in seconds from a number, distribution, or iterator."""
+    if callable(spec):
+        return float(spec(rng))
+    if isinstance(spec, (int, float)):
+        return float(spec)
+    if hasattr(spec, "__next__"):
+        return float(next(spec))
+    name, *params = spec
+    if name == "exponential":
+        return rng.expovariate(1.0 / params[0])
+    elif name == "lognormal":
+        return rng.lognormvariate(*params)
+    elif name == "uniform":
+        return rng.uniform(*params)
+    elif name == "normal":
+        return max(rng.gauss(*params), 0.0)
+    raise ValueError("Unknown distribution {}".format(name))
+
+
+def trace_durations(path):
+    """Durations of jobs in a CSV file from the accounting export,
+    to replay in a simulation.
+
+    :param path str: The CSV file.
+    :return list(float): Seconds from dispatch to finish of each job.
+    """
+    durations = list()
+    with open(str(path), newline="") as src:
+        for row in csv.DictReader(src):
+            if row["dispatchTime"] and row["finishTime"]:
+                durations.append(
+                    float(row["finishTime"]) - float(row["dispatchTime"]))
+    return durations
+
+
+class _List:
+    """A native list. Entries are addresses, and keep holds the
+    objects that own the memory at those addresses, for the strings
+    and structs that the simulator makes. Like the library, it doesn't
+    copy what callers add. For a job list, jobs holds the simulator's
+    index of each entry and members counts them, so that waiting on a
+    list doesn't read every job's ID again. Waiting on a list returns
+    each finished job once, as the library does, and returned holds
+    those it has. No job in the list that wasn't returned had finished
+    when the simulator had ended clean_at jobs, and None means it
+    hasn't looked."""
+    def __init__(self, list_type, jobs=()):
+        self.list_type = list_type
+        self.entries = list()
+        self.keep = dict()
+        if list_type == ListType.joblist.value:
+            self.jobs = list(jobs)
+        else:
+            self.jobs = None
+        self.members = collections.Counter(jobs)
+        self.returned = set()
+        self.clean_at = None
+
+
+class _Reservation:
+    """Slots taken from a queue and given a queue of their own, whose
+    name is that of the queue they came from."""
+    def __init__(self, reservation_id, name, queue, parent, slots, start,
+                 end):
+        self.id = reservation_id
+        self.name = name
+        self.queue = queue
+        self.parent = parent
+        self.slots = slots
+        self.start = start
+        self.end = end
+
+
+class Simulator:
+    """Stands in for libdrmaa2.so, with a scheduler on a virtual clock."""
+    def __init__(self, queues=None, durations=None, failure_rate=0.0,
+                 machines=None, capabilities=(), seed=0, start_time=None,
+                 user=None):
+        """
+        :param queues dict: From queue name to its number of slots. The
+                            first queue is where jobs go by default.
+        :param durations dict: From job category to seconds, a
+            distribution tuple, a function of a random.Random, or a list
+            to replay. The "default" entry is for other jobs.
+        :param failure_rate float: Chance that a job fails.
+        :param machines int: How many machines share the slots.
+        :param capabilities: Capability names the library claims.
+        :param seed int: For the random number generator.
+        :param start_time float: Virtual time at the start, in seconds
+                                 since the epoch. The default is now.
+        :param user str: Owner of the jobs.
+        """
+        self.queues = collections.OrderedDict(queues or {"all.q": 100})
+        self.default_queue = next(iter(self.queues))
+        self.durations = dict(durations or dict())
+        self.durations.setdefault("default", 60)
+        for category, spec in self.durations.items():
+            if isinstance(spec, list):
+                self.durations[category] = itertools.cycle(spec)
+        self.failure_rate = failure_rate
+        self.machine_cnt = machines or 1
+        self.capabilities = {Capability[c] if isinstance(c, str) else c
+                             for c in capabilities}
+        self.rng = random.Random(seed)
+        self.now = float(start_time if start_time is not None else time.time())
+        self.started_at = self.now
+        self.user = (user or getpass.getuser()).encode()
+
+        # One entry per job, in compact arrays, so a million jobs fit.
+        self._state = array.array("b")
+        self._slots = array.array("H")
+        self._queue = array.array("H")
+        self._session = array.array("I")
+        self._submitted = array.array("d")
+        self._dispatched = array.array("d")
+        self._finish = array.array("d")
+        """Duration until the job starts, then the time it ends."""
+        self._queue_names = list(self.queues)
+        self._free = [self.queues[q] for q in self._queue_names]
+        self._waiting = [collections.deque() for q in self._queue_names]
+        self._events = list()
+        self._ended = array.array("I")
+        """Jobs in the order they ended."""
+        self._session_names = list()
+        self._session_index = dict()
+        self._session_jobs = dict()
+        self._lists = dict()
+        self._dicts = dict()
+        self._handles = itertools.count(0x1000, 0x10)
+        self._fails = set()
+        self._unlisted = collections.Counter()
+        """Reaped jobs still in each session's array of jobs."""
+        self._errno = SUCCESS
+        self._error_text = None
+        self._array_ids = itertools.count(1)
+        self._rsessions = dict()
+        """From reservation session name to its reservation handles."""
+        self._rsession_handles = dict()
+        self._reservations = dict()
+        """From handle to _Reservation."""
+        self._reservation_ids = dict()
+        self._released = dict()
+        """From the queue of a terminated reservation to its parent."""
+
+        self.calls = collections.Counter()
+        self.sim_cpu = 0.0
+        self._nesting = threading.local()
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        self._cpu_at_start = usage.ru_utime + usage.ru_stime
+        self._instrument()
+
+    @classmethod
+    def from_environment(cls):
+        """Make a simulator as DRMAA2_SIMULATE in the environment says."""
+        setting = os.environ.get("DRMAA2_SIMULATE", "")
+        if setting and Path(setting).is_file():
+            with open(setting) as src:
+                return cls(**json.load(src))
+        return cls()
+
+    def _instrument(self):
+        """Count calls and the CPU spent in the simulator, so the rest
+        of the process time belongs to the code that calls it. A call
+        that the simulator makes to itself, as creating a session opens
+        it, belongs to the call that made it."""
+        clock = time.process_time
+        nesting = self._nesting
+        for name in dir(self):
+            if not name.startswith(("drmaa2_", "uge_drmaa2_")):
+                continue
+            method = getattr(self, name)
+
+            # Like the library, a call clears the last error,
+            # except for freeing memory or asking about the error.
+            resets = not name.endswith("_free") and "lasterror" not in name
+
+            def timed(*args, _method=method, _name=name, _resets=resets):
+                if getattr(nesting, "depth", 0):
+                    return _method(*args)
+                start = clock()
+                if _resets:
+                    self._errno = SUCCESS
+                    self._error_text = None
+                nesting.depth = 1
+                try:
+                    return _method(*args)
+                finally:
+                    nesting.depth = 0
+                    self.calls[_name] += 1
+                    self.sim_cpu += clock() - start
+
+            setattr(self, name, timed)
+
+    def report(self):
+        """What the simulation cost.
+
+        :return dict: Jobs, virtual seconds elapsed, and the CPU seconds
+            of the process since the simulator was made, of the
+            simulator, and of everything else, which is the wrapper and
+            the code being tested, along with peak resident memory of
+            the process in bytes and calls to each function.
+        """
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        process_cpu = usage.ru_utime + usage.ru_stime - self._cpu_at_start
+        # Linux reports kilobytes, macOS bytes.
+        scale = 1 if sys.platform == "darwin" else 1024
+        return dict(
+            jobs=len(self._state),
+            virtual_seconds=self.now - self.started_at,
+            process_cpu=process_cpu,
+            simulator_cpu=self.sim_cpu,
+            wrapper_cpu=process_cpu - self.sim_cpu,
+            peak_rss=usage.ru_maxrss * scale,
+            calls=dict(self.calls),
+        )
+
+    # Errors
+    def _fail(self, errno, text):
+        self._errno = errno
+        self._error_text = text
+        return None
+
+    def drmaa2_lasterror(self):
+        return self._errno
+
+    def drmaa2_lasterror_text(self):
+        if self._error_text is None:
+            return None
+        return drmaa2_string(self._error_text.encode())
+
+    def drmaa2_string_free(self, string):
+        pass
+
+    # Lists
+    def _new_list(self, list_type):
+        handle = next(self._handles)
+        self._lists[handle] = _List(list_type)
+        return handle
+
+    def _string_list(self, strings):
+        handle = self._new_list(ListType.stringlist.value)
+        native = self._lists[handle]
+        for value in strings:
+            address = _address(value)
+            native.entries.append(address)
+            native.keep[address] = value
+        return handle
+
+    def _job_list(self, indices):
+        handle = self._new_list(ListType.joblist.value)
+        native = _List(ListType.joblist.value, indices)
+        self._lists[handle] = native
+        for idx in indices:
+            job = self._job_struct(idx)
+            address = addressof(job)
+            native.entries.append(address)
+            native.keep[address] = job
+        return handle
+
+    def drmaa2_list_create(self, list_type, callback):
+        return self._new_list(_number(list_type))
+
+    def drmaa2_list_free(self, list_ptr):
+        self._lists.pop(_pointee(list_ptr), None)
+
+    uge_drmaa2_list_free_root = drmaa2_list_free
+
+    def drmaa2_list_size(self, list_ptr):
+        native = self._lists.get(_address(list_ptr))
+        if native is None:
+            self._fail(INVALID_ARGUMENT, "No such list")
+            return -1
+        return len(native.entries)
+
+    def drmaa2_list_get(self, list_ptr, idx):
+        native = self._lists.get(_address(list_ptr))
+        idx = _number(idx)
+        if native is None or not 0 <= idx < len(native.entries):
+            return self._fail(INVALID_ARGUMENT, "No entry {}".format(idx))
+        return native.entries[idx] or None
+
+    def drmaa2_list_add(self, list_ptr, value):
+        native = self._lists.get(_address(list_ptr))
+        if native is None:
+            return INVALID_ARGUMENT
+        if isinstance(value, str):
+            value = value.encode()
+        address = _address(value)
+        if native.jobs is not None:
+            idx = self._index(address, quiet=True)
+            native.jobs.append(idx)
+            native.members[idx] += 1
+            if idx is None or self._state[idx] >= DONE:
+                native.clean_at = None
+        native.entries.append(address)
+        return SUCCESS
+
+    def drmaa2_list_del(self, list_ptr, idx):
+        native = self._lists.get(_address(list_ptr))
+        idx = _number(idx)
+        if native is None or not 0 <= idx < len(native.entries):
+            return INVALID_ARGUMENT
+        address = native.entries.pop(idx)
+        if native.jobs is not None:
+            self._forget(native, native.jobs.pop(idx))
+        if address in native.keep and address not in native.entries:
+            del native.keep[address]
+        return SUCCESS
+
+    @staticmethod
+    def _forget(native, job):
+        native.members[job] -= 1
+        if not native.members[job]:
+            del native.members[job]
+            native.returned.discard(job)
+
+    def uge_drmaa2_list_set(self, list_ptr, idx, value):
+        native = self._lists.get(_address(list_ptr))
+        idx = _number(idx)
+        if native is None or not 0 <= idx < len(native.entries):
+            return INVALID_ARGUMENT
+        address = _address(value)
+        if native.jobs is not None:
+            job = self._index(address, quiet=True)
+            self._forget(native, native.jobs[idx])
+            native.jobs[idx] = job
+            native.members[job] += 1
+            if job is None or self._state[job] >= DONE:
+                native.clean_at = None
+        native.entries[idx] = address
+        return SUCCESS
+
+    # Dictionaries
+    def drmaa2_dict_create(self, callback):
+        handle = next(self._handles)
+        self._dicts[handle] = dict()
+        return handle
+
+    def drmaa2_dict_free(self, dict_ptr):
+        self._dicts.pop(_pointee(dict_ptr), None)
+
+    def drmaa2_dict_list(self, dict_ptr):
+        values = self._dicts.get(_address(dict_ptr))
+        if values is None:
+            return self._fail(INVALID_ARGUMENT, "No such dictionary")
+        return self._string_list(list(values))
+
+    def drmaa2_dict_has(self, dict_ptr, key):
+        return int(key in self._dicts.get(_address(dict_ptr), ()))
+
+    def drmaa2_dict_get(self, dict_ptr, key):
+        return self._dicts.get(_address(dict_ptr), dict()).get(key)
+
+    def drmaa2_dict_del(self, dict_ptr, key):
+        self._dicts.get(_address(dict_ptr), dict()).pop(key, None)
+        return SUCCESS
+
+    def drmaa2_dict_set(self, dict_ptr, key, value):
+        values = self._dicts.get(_address(dict_ptr))
+        if values is None:
+            return INVALID_ARGUMENT
+        values[key] = value
+        return SUCCESS
+
+    # Structs that callers create and free
+    def drmaa2_jtemplate_create(self):
+        return pointer(_unset_struct(DRMAA2_JTEMPLATE))
+
+    def drmaa2_jinfo_create(self):
+        return pointer(_unset_struct(DRMAA2_JINFO))
+
+    def drmaa2_rtemplate_create(self):
+        return pointer(_unset_struct(DRMAA2_RTEMPLATE))
+
+    def _free_struct(self, arg):
+        pass  # The pointer the caller holds owns the memory.
+
+    drmaa2_jtemplate_free = _free_struct
+    drmaa2_j_free = _free_struct
+    drmaa2_jarray_free = _free_struct
+    drmaa2_jsession_free = _free_struct
+    drmaa2_msession_free = _free_struct
+    drmaa2_version_free = _free_struct
+    drmaa2_machineinfo_free = _free_struct
+    drmaa2_queueinfo_free = _free_struct
+    drmaa2_notification_free = _free_struct
+    drmaa2_rtemplate_free = _free_struct
+    drmaa2_rinfo_free = _free_struct
+    drmaa2_rsession_free = _free_struct
+
+    def drmaa2_jinfo_free(self, info_ptr):
+        address = _pointee(info_ptr)
+        if address:
+            info = cast(address, POINTER(DRMAA2_JINFO)).contents
+            self._lists.pop(info.allocatedMachines, None)
+
+    def _impl_spec(self):
+        return self._string_list([])
+
+    drmaa2_jtemplate_impl_spec = _impl_spec
+    drmaa2_jinfo_impl_spec = _impl_spec
+    drmaa2_rtemplate_impl_spec = _impl_spec
+    drmaa2_rinfo_impl_spec = _impl_spec
+    drmaa2_queueinfo_impl_spec = _impl_spec
+    drmaa2_machineinfo_impl_spec = _impl_spec
+    drmaa2_notification_impl_spec = _impl_spec
+
+    def _unsupported(self, *args):
+        self._fail(UNSUPPORTED_OPERATION, "The simulator can't do that")
+        return UNSUPPORTED_OPERATION
+
+    drmaa2_set_instance_value = _unsupported
+    drmaa2_register_event_notification = _unsupported
+
+    def drmaa2_get_instance_value(self, *args):
+        return self._fail(UNSUPPORTED_OPERATION, "No instance values")
+
+    drmaa2_describe_attribute = drmaa2_get_instance_value
+    drmaa2_j_get_jtemplate = drmaa2_get_instance_value
+
+    # The library itself
+    def drmaa2_get_drms_name(self):
+        return drmaa2_string(b"DRMAA2 Simulator")
+
+    def drmaa2_get_drms_version(self):
+        version = DRMAA2_VERSION()
+        version.major = b"1"
+        version.minor = b"0"
+        return pointer(version)
+
+    def drmaa2_supports(self, capability):
+        return int(Capability(_number(capability)) in self.capabilities)
+
+    # Sessions
+    def _session_of(self, session_ptr):
+        return session_ptr.contents.name.value
+
+    def drmaa2_create_jsession(self, name, contact):
+        if name in self._session_index:
+            return self._fail(SESSION_MANAGEMENT,
+                              "Session {} exists".format(name.decode()))
+        self._session_index[name] = len(self._session_names)
+        self._session_names.append(name)
+        self._session_jobs[name] = array.array("I")
+        return self.drmaa2_open_jsession(name)
+
+    def drmaa2_open_jsession(self, name):
+        if name not in self._session_jobs:
+            return self._fail(INVALID_SESSION,
+                              "No session {}".format(name.decode()))
+        session = DRMAA2_JSESSION()
+        session.name = name
+        session.contact = self.user
+        return pointer(session)
+
+    def drmaa2_close_jsession(self, session_ptr):
+        return SUCCESS
+
+    def drmaa2_destroy_jsession(self, name):
+        if self._session_jobs.pop(name, None) is None:
+            self._fail(INVALID_SESSION, "No session {}".format(name.decode()))
+            return INVALID_SESSION
+        # Its jobs keep the old session number, which is no longer alive,
+        # so a new session of the same name doesn't list them.
+        del self._session_index[name]
+        self._unlisted.pop(name, None)
+        return SUCCESS
+
+    def drmaa2_get_jsession_names(self):
+        return self._string_list(
+            [self.user + b"@" + name for name in self._session_jobs])
+
+    def drmaa2_jsession_get_contact(self, session_ptr):
+        return drmaa2_string(self.user)
+
+    def drmaa2_jsession_get_session_name(self, session_ptr):
+        return drmaa2_string(self._session_of(session_ptr))
+
+    def drmaa2_jsession_get_job_categories(self, session_ptr):
+        return self._string_list(
+            [c.encode() for c in self.durations if c != "default"])
+
+    def drmaa2_open_msession(self, name):
+        session = DRMAA2_MSESSION()
+        session.name = name
+        return pointer(session)
+
+    def drmaa2_close_msession(self, session_ptr):
+        return SUCCESS
+
+    # The scheduler
+    def _duration(self, template):
+        category = template.jobCategory.value
+        if category and category.decode() in self.durations:
+            return _draw(self.durations[category.decode()], self.rng), False
+        command = Path((template.remoteCommand.value or b"").decode()).name
+        if command == "false":
+            return 0.0, True
+        elif command == "true":
+            return 0.0, False
+        elif command == "sleep" and template.args:
+            native = self._lists.get(_address(template.args))
+            if native and native.entries:
+                return float(ctypes.string_at(native.entries[0])), False
+        return _draw(self.durations["default"], self.rng), False
+
+    def _submit(self, session_name, template):
+        idx = len(self._state)
+        queue_name = template.queueName.value
+        reservation_id = template.reservationId.value
+        if reservation_id:
+            reservation = self._reservation_ids.get(reservation_id.decode())
+            if reservation is None or reservation.queue in self._released:
+                self._fail(INVALID_ARGUMENT, "No reservation {}".format(
+                    reservation_id.decode()))
+                return None
+            queue = reservation.queue
+            capacity = reservation.slots
+        elif queue_name:
+            try:
+                queue = self._queue_names.index(queue_name.decode())
+            except ValueError:
+                self._fail(INVALID_ARGUMENT,
+                           "No queue {}".format(queue_name.decode()))
+                return None
+            capacity = self.queues[self._queue_names[queue]]
+        else:
+            queue = 0
+            capacity = self.queues[self.default_queue]
+        slots = template.minSlots if template.minSlots > 0 else 1
+        if slots > capacity:
+            self._fail(INVALID_ARGUMENT, "Queue has fewer than {} slots"
+                       .format(slots))
+            return None
+        duration, fails = self._duration(template)
+        if not fails and self.failure_rate:
+            fails = self.rng.random() < self.failure_rate
+        held = bool(template.submitAsHold)
+        self._state.append(JState.queued_held.value if held
+                           else JState.queued.value)
+        self._slots.append(slots)
+        self._queue.append(queue)
+        self._session.append(self._session_index[session_name])
+        self._submitted.append(self.now)
+        self._dispatched.append(-1.0)
+        self._finish.append(duration)
+        if fails:
+            self._fails.add(idx)
+        self._session_jobs[session_name].append(idx)
+        if not held:
+            self._waiting[queue].append(idx)
+            self._dispatch(queue)
+        return idx
+
+    def _dispatch(self, queue):
+        waiting = self._waiting[queue]
+        while waiting:
+            idx = waiting[0]
+            if self._state[idx] != JState.queued.value:
+                waiting.popleft()  # Held or terminated while waiting.
+                continue
+            if self._slots[idx] > self._free[queue]:
+                break
+            waiting.popleft()
+            self._free[queue] -= self._slots[idx]
+            self._state[idx] = JState.running.value
+            self._dispatched[idx] = self.now
+            self._finish[idx] = self.now + self._finish[idx]
+            heapq.heappush(self._events, (self._finish[idx], idx))
+
+    def _end(self, idx, state):
+        self._ended.append(idx)
+        if self._state[idx] in (JState.running.value,
+                                JState.suspended.value):
+            queue = self._queue[idx]
+            self._free[queue] += self._slots[idx]
+            self._state[idx] = state
+            self._finish[idx] = self.now
+            self._dispatch(queue)
+            if queue in self._released:
+                self._give_back(queue)
+        else:
+            self._state[idx] = state
+            self._finish[idx] = self.now
+
+    def _step(self, deadline):
+        """Run the next event, if it happens before the deadline.
+
+        :return int: The job that ended, or None if nothing did.
+        """
+        while self._events:
+            when, idx = self._events[0]
+            if deadline is not None and when > deadline:
+                return None
+            heapq.heappop(self._events)
+            if (self._state[idx] != JState.running.value or
+                    self._finish[idx] != when):
+                continue  # Terminated or suspended since.
+            self.now = max(self.now, when)
+            failed = idx in self._fails
+            self._fails.discard(idx)
+            self._end(idx, JState.failed.value if failed
+                      else JState.done.value)
+            return idx
+        return None
+
+    def _deadline(self, how_long):
+        how_long = _number(how_long)
+        if how_long == Times.infinite.value:
+            return None
+        elif how_long in (Times.zero.value, Times.now.value):
+            return self.now
+        return self.now + how_long
+
+    def _first_terminated(self, native):
+        if native.clean_at is None:
+            # Done and failed are the largest states, so max, which loops
+            # in C, rules out the usual case that none has finished.
+            state, jobs = self._state, native.jobs
+            returned = native.returned
+            found = None
+            if jobs and max(map(state.__getitem__, jobs)) >= DONE:
+                found = next((i for i in jobs if state[i] >= DONE and
+                              i not in returned), None)
+        else:
+            # Only jobs that ended since last time can have finished.
+            members, returned = native.members, native.returned
+            found = next((i for i in self._ended[native.clean_at:]
+                          if i in members and i not in returned), None)
+        if found is None:
+            native.clean_at = len(self._ended)
+        return found
+
+    def _first_started(self, native):
+        dispatched = self._dispatched
+        if native.jobs and max(map(dispatched.__getitem__, native.jobs)) >= 0:
+            return next(i for i in native.jobs if dispatched[i] >= 0)
+        return None
+
+    def _wait(self, native, first, how_long):
+        """Advance the clock until one of the jobs is done waiting.
+
+        :param native _List: The jobs.
+        :param first: _first_terminated or _first_started.
+        :return int: The job, or None on a timeout or if none can finish.
+        """
+        deadline = self._deadline(how_long)
+        found = first(native)
+        while found is None:
+            ended = self._step(deadline)
+            if ended is None:
+                if deadline is not None:
+                    self.now = max(self.now, deadline)
+                    self._fail(TIMEOUT, "Timed out")
+                else:
+                    self._fail(INVALID_STATE, "No job can finish")
+                return None
+            if first == self._first_terminated:
+                if ended in native.members:
+                    found = ended
+            else:
+                # A job may have started because ended freed its slots.
+                found = first(native)
+        return found
+
+    # Reservations
+    def drmaa2_create_rsession(self, name, contact):
+        if name in self._rsessions:
+            return self._fail(SESSION_MANAGEMENT,
+                              "Session {} exists".format(name.decode()))
+        self._rsessions[name] = list()
+        return self.drmaa2_open_rsession(name)
+
+    def drmaa2_open_rsession(self, name):
+        if name not in self._rsessions:
+            return self._fail(INVALID_SESSION,
+                              "No session {}".format(name.decode()))
+        handle = next(self._handles)
+        self._rsession_handles[handle] = name
+        return handle
+
+    def drmaa2_close_rsession(self, session_ptr):
+        return SUCCESS
+
+    def drmaa2_destroy_rsession(self, name):
+        if self._rsessions.pop(name, None) is None:
+            self._fail(INVALID_SESSION, "No session {}".format(name.decode()))
+            return INVALID_SESSION
+        return SUCCESS
+
+    def drmaa2_get_rsession_names(self):
+        return self._string_list(
+            [self.user + b"@" + name for name in self._rsessions])
+
+    def drmaa2_rsession_request_reservation(self, session_ptr, template_ptr):
+        name = self._rsession_handles.get(_address(session_ptr))
+        if name not in self._rsessions:
+            return self._fail(INVALID_SESSION, "No such session")
+        template = template_ptr.contents
+        slots = template.minSlots if template.minSlots > 0 else 1
+        parent = 0
+        if slots > self._free[parent]:
+            return self._fail(DENIED_BY_DRMS, "Only {} slots are free".format(
+                self._free[parent]))
+        if template.duration >= 0:
+            end = self.now + template.duration
+        else:
+            end = template.endTime
+        queue = len(self._free)
+        self._queue_names.append(self._queue_names[parent])
+        self._free[parent] -= slots
+        self._free.append(slots)
+        self._waiting.append(collections.deque())
+        reservation = _Reservation(
+            str(len(self._reservation_ids) + 1),
+            template.reservationName.value, queue, parent, slots,
+            self.now, end)
+        handle = next(self._handles)
+        self._reservations[handle] = reservation
+        self._reservation_ids[reservation.id] = reservation
+        self._rsessions[name].append(handle)
+        return handle
+
+    def _reservation(self, r):
+        reservation = self._reservations.get(_address(r))
+        if reservation is None:
+            self._fail(INVALID_ARGUMENT, "No such reservation")
+        return reservation
+
+    def drmaa2_r_get_id(self, r):
+        reservation = self._reservation(r)
+        if reservation is None:
+            return None
+        return drmaa2_string(reservation.id.encode())
+
+    def drmaa2_r_get_info(self, r):
+        reservation = self._reservation(r)
+        if reservation is None:
+            return None
+        info = _unset_struct(DRMAA2_RINFO)
+        info.reservationId = reservation.id.encode()
+        info.reservationName = reservation.name
+        info.reservedStartTime = int(reservation.start)
+        info.reservedEndTime = int(reservation.end)
+        info.reservedSlots = reservation.slots
+        return pointer(info)
+
+    def drmaa2_r_terminate(self, r):
+        reservation = self._reservation(r)
+        if reservation is None:
+            return self._errno
+        queue = reservation.queue
+        if queue in self._released:
+            return SUCCESS
+        self._released[queue] = reservation.parent
+        reservation.end = self.now
+        for idx in self._waiting[queue]:
+            if self._state[idx] == JState.queued.value:
+                self._end(idx, JState.failed.value)
+        self._waiting[queue].clear()
+        self._give_back(queue)
+        return SUCCESS
+
+    def _give_back(self, queue):
+        """Return a terminated reservation's idle slots to its queue."""
+        parent = self._released[queue]
+        self._free[parent] += self._free[queue]
+        self._free[queue] = 0
+        self._dispatch(parent)
+
+    # Jobs
+    def _job_struct(self, idx):
+        job = DRMAA2_J()
+        job.id = str(idx + 1).encode()
+        job.sessionName = self._session_names[self._session[idx]]
+        return job
+
+    def _index(self, job_arg, quiet=False):
+        """The simulator's index of a job.
+
+        :param quiet bool: Don't set the last error for an unknown job.
+        :return int: The index, or None if there is no such job.
+        """
+        address = _address(job_arg)
+        job_id = None
+        if address:
+            job_id = cast(address, POINTER(DRMAA2_J)).contents.id.value
+        try:
+            idx = int(job_id) - 1
+        except (TypeError, ValueError):
+            idx = -1
+        if not 0 <= idx < len(self._state) or self._state[idx] == REAPED:
+            if not quiet:
+                self._fail(INVALID_ARGUMENT, "No job {}".format(job_id))
+            return None
+        return idx
+
+    def _job_list_of(self, list_ptr):
+        native = self._lists.get(_address(list_ptr))
+        if native is None or native.jobs is None:
+            return _List(ListType.joblist.value)
+        if None in native.members:
+            # Leave out jobs the simulator didn't make.
+            known = _List(ListType.joblist.value,
+                          [idx for idx in native.jobs if idx is not None])
+            known.returned = native.returned
+            return known
+        return native
+
+    def drmaa2_jsession_run_job(self, session_ptr, template_ptr):
+        idx = self._submit(self._session_of(session_ptr),
+                           template_ptr.contents)
+        if idx is None:
+            return None
+        return pointer(self._job_struct(idx))
+
+    def drmaa2_jsession_run_bulk_jobs(self, session_ptr, template_ptr,
+                                      begin, end, step, max_parallel):
+        session_name = self._session_of(session_ptr)
+        indices = list()
+        for task in range(_number(begin), _number(end) + 1, _number(step)):
+            idx = self._submit(session_name, template_ptr.contents)
+            if idx is None:
+                return None
+            indices.append(idx)
+        job_array = DRMAA2_JARRAY()
+        job_array.id = str(next(self._array_ids)).encode()
+        job_array.sessionName = session_name
+        job_array.jobList = self._job_list(indices)
+        return pointer(job_array)
+
+    def drmaa2_jarray_get_jobs(self, array_ptr):
+        return self._job_list(
+            self._job_list_of(array_ptr.contents.jobList).jobs)
+
+    def drmaa2_jarray_get_id(self, array_ptr):
+        return drmaa2_string(array_ptr.contents.id.value)
+
+    def drmaa2_jarray_get_session_name(self, array_ptr):
+        return drmaa2_string(array_ptr.contents.sessionName.value)
+
+    def drmaa2_jsession_wait_any_terminated(self, session_ptr, list_ptr,
+                                            how_long):
+        native = self._job_list_of(list_ptr)
+        idx = self._wait(native, self._first_terminated, how_long)
+        if idx is None:
+            return None
+        native.returned.add(idx)
+        return pointer(self._job_struct(idx))
+
+    def drmaa2_jsession_wait_any_started(self, session_ptr, list_ptr,
+                                         how_long):
+        idx = self._wait(self._job_list_of(list_ptr), self._first_started,
+                         how_long)
+        return None if idx is None else pointer(self._job_struct(idx))
+
+    def drmaa2_j_wait_terminated(self, job_ptr, how_long):
+        idx = self._index(job_ptr)
+        if idx is None:
+            return self._errno
+        found = self._wait(_List(ListType.joblist.value, [idx]),
+                           self._first_terminated, how_long)
+        return SUCCESS if found is not None else self._errno
+
+    def drmaa2_j_wait_started(self, job_ptr, how_long):
+        idx = self._index(job_ptr)
+        if idx is None:
+            return self._errno
+        found = self._wait(_List(ListType.joblist.value, [idx]),
+                           self._first_started, how_long)
+        return SUCCESS if found is not None else self._errno
+
+    def drmaa2_j_get_id(self, job_ptr):
+        return drmaa2_string(job_ptr.contents.id.value)
+
+    def drmaa2_j_get_state(self, job_ptr, substate):
+        idx = self._index(job_ptr)
+        if idx is None:
+            return JState.undetermined.value
+        return self._state[idx]
+
+    def drmaa2_j_hold(self, job_ptr):
+        idx = self._index(job_ptr)
+        if idx is None or self._state[idx] != JState.queued.value:
+            self._fail(INVALID_STATE, "Only queued jobs can be held")
+            return INVALID_STATE
+        self._state[idx] = JState.queued_held.value
+        return SUCCESS
+
+    def drmaa2_j_release(self, job_ptr):
+        idx = self._index(job_ptr)
+        if idx is None or self._state[idx] != JState.queued_held.value:
+            self._fail(INVALID_STATE, "Only held jobs can be released")
+            return INVALID_STATE
+        self._state[idx] = JState.queued.value
+        self._waiting[self._queue[idx]].append(idx)
+        self._dispatch(self._queue[idx])
+        return SUCCESS
+
+    def drmaa2_j_suspend(self, job_ptr):
+        idx = self._index(job_ptr)
+        if idx is None or self._state[idx] != JState.running.value:
+            self._fail(INVALID_STATE, "Only running jobs can be suspended")
+            return INVALID_STATE
+        # Keep the time left, stored negative, until it resumes.
+        self._state[idx] = JState.suspended.value
+        self._finish[idx] = self.now - self._finish[idx]
+        return SUCCESS
+
+    def drmaa2_j_resume(self, job_ptr):
+        idx = self._index(job_ptr)
+        if idx is None or self._state[idx] != JState.suspended.value:
+            self._fail(INVALID_STATE, "Only suspended jobs can be resumed")
+            return INVALID_STATE
+        self._state[idx] = JState.running.value
+        self._finish[idx] = self.now - self._finish[idx]
+        heapq.heappush(self._events, (self._finish[idx], idx))
+        return SUCCESS
+
+    def drmaa2_j_terminate(self, job_ptr):
+        idx = self._index(job_ptr)
+        if idx is None:
+            return self._errno
+        if self._state[idx] in TERMINAL:
+            return SUCCESS
+        self._fails.discard(idx)
+        self._end(idx, JState.failed.value)
+        return SUCCESS
+
+    def drmaa2_j_reap(self, job_ptr):
+        idx = self._index(job_ptr)
+        if idx is None or self._state[idx] not in TERMINAL:
+            self._fail(INVALID_STATE, "Only finished jobs can be reaped")
+            return INVALID_STATE
+        self._state[idx] = REAPED
+        self._unlisted[self._session_names[self._session[idx]]] += 1
+        return SUCCESS
+
+    def drmaa2_j_get_info(self, job_ptr):
+        idx = self._index(job_ptr)
+        if idx is None:
+            return None
+        info = _unset_struct(DRMAA2_JINFO)
+        state = self._state[idx]
+        info.jobId = str(idx + 1).encode()
+        info.jobState = state
+        info.jobOwner = self.user
+        info.submissionMachine = b"simulator"
+        info.slots = self._slots[idx]
+        info.queueName = self._queue_names[self._queue[idx]].encode()
+        info.submissionTime = int(self._submitted[idx])
+        if self._dispatched[idx] >= 0:
+            info.dispatchTime = int(self._dispatched[idx])
+            machine = "sim{}".format(idx % self.machine_cnt).encode()
+            info.allocatedMachines = self._string_list([machine])
+            if state in TERMINAL:
+                ran = self._finish[idx] - self._dispatched[idx]
+            else:
+                ran = self.now - self._dispatched[idx]
+            info.wallclockTime = int(ran)
+            info.cpuTime = int(ran * self._slots[idx])
+        if state in TERMINAL:
+            info.finishTime = int(self._finish[idx])
+            info.exitStatus = 0 if state == JState.done.value else 1
+        return pointer(info)
+
+    def _matches(self, idx, filter_ptr):
+        if self._state[idx] == REAPED:
+            return False
+        if not filter_ptr:
+            return True
+        wanted = filter_ptr.contents
+        if wanted.jobState not in (UNSET_ENUM, self._state[idx]):
+            return False
+        queue = wanted.queueName.value
+        if queue and queue.decode() != self._queue_names[self._queue[idx]]:
+            return False
+        return True
+
+    def drmaa2_jsession_get_jobs(self, session_ptr, filter_ptr):
+        name = self._session_of(session_ptr)
+        jobs = self._session_jobs.get(name, ())
+        if self._unlisted.pop(name, 0) and jobs:
+            jobs = array.array("I", (i for i in jobs
+                                     if self._state[i] != REAPED))
+            self._session_jobs[name] = jobs
+        return self._job_list(
+            [i for i in jobs if self._matches(i, filter_ptr)])
+
+    def drmaa2_msession_get_all_jobs(self, session_ptr, filter_ptr):
+        alive = {self._session_index[n] for n in self._session_jobs}
+        return self._job_list(
+            [i for i in range(len(self._state))
+             if self._session[i] in alive and self._matches(i, filter_ptr)])
+
+    def drmaa2_msession_get_all_queues(self, session_ptr, names):
+        wanted = self._names(names)
+        handle = self._new_list(ListType.queueinfolist.value)
+        native = self._lists[handle]
+        for name in self.queues:
+            if wanted is None or name in wanted:
+                queue = DRMAA2_QUEUEINFO()
+                queue.name = name.encode()
+                native.entries.append(addressof(queue))
+                native.keep[addressof(queue)] = queue
+        return handle
+
+    def drmaa2_msession_get_all_machines(self, session_ptr, names):
+        wanted = self._names(names)
+        total = sum(self.queues.values())
+        busy = total - sum(self._free)
+        handle = self._new_list(ListType.machineinfolist.value)
+        native = self._lists[handle]
+        for idx in range(self.machine_cnt):
+            name = "sim{}".format(idx)
+            if wanted is not None and name not in wanted:
+                continue
+            cores = max(total // self.machine_cnt, 1)
+            version = DRMAA2_VERSION()
+            version.major = b"1"
+            version.minor = b"0"
+            machine = DRMAA2_MACHINEINFO()
+            machine.name = name.encode()
+            machine.available = 1
+            machine.sockets = 1
+            machine.coresPerSocket = cores
+            machine.threadsPerCore = 1
+            machine.load = busy / total
+            machine.physMemory = cores * 4 * 1024 * 1024
+            machine.virtMemory = machine.physMemory
+            machine.machineArch = CPU.X64.value
+            machine.machineOS = OS.LINUX.value
+            machine.machineOSVersion = pointer(version)
+            native.entries.append(addressof(machine))
+            native.keep[addressof(machine)] = machine
+        return handle
+
+    def _names(self, names):
+        native = self._lists.get(_address(names))
+        if native is None:
+            return None
+        return {ctypes.string_at(a).decode() for a in native.entries}
+
+
+def simulate(**config):
+    """Use a Simulator in place of the library, for the body of a
+    with-statement. Keyword arguments go to Simulator.
+
+    :return: A context manager that gives the Simulator.
+    """
+    return using_library(Simulator(**config))
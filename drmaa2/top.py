@@ -0,0 +1,139 @@
+"""
+The data behind the ``top`` command of clustermon. On each tick, a
+ClusterTracker streams the jobs in each state from a monitoring
+session, one listing per state, and counts them a chunk at a time
+without keeping the lists. It learns a running job's queue from its
+job information the first time it sees the job running, and keeps it
+while the job runs. So a tick makes one listing for each of the seven
+states, one listing of machines, and one drmaa2_j_get_info for each
+job that started running since the last tick. The render function
+turns a Snapshot into lines of text, which the screen compares with
+the lines it drew last time so it redraws only the rows that changed.
+"""
+import collections
+import logging
+import time
+from .interface import JState
+from .errors import DRMAA2Exception
+from .session import JobInfo, job_info
+
+
+LOGGER = logging.getLogger("drmaa2.top")
+
+COLUMNS = [JState.queued, JState.queued_held, JState.running,
+           JState.suspended, JState.requeued, JState.done, JState.failed]
+
+
+Snapshot = collections.namedtuple("Snapshot", "when sessions queues machines")
+Snapshot.__doc__ = """What the cluster looked like at one tick.
+sessions is a dict from session name to a Counter of JState,
+queues is a Counter of running jobs by queue name, and machines
+is a list of MachineInfo, most loaded first."""
+
+
+class ClusterTracker:
+    """Counts every job in the cluster by session, state, and queue."""
+    def __init__(self, monitoring_session, chunk_size=4096):
+        """
+        :param monitoring_session MonitoringSession: Where to ask.
+        :param chunk_size int: Jobs to decode at a time.
+        """
+        self.session = monitoring_session
+        self.chunk_size = chunk_size
+        self._filters = dict()
+        self._queue_of = dict()
+        """From each running Job to its queue name."""
+
+    def _filter(self, state):
+        """A JobInfo that matches jobs in a state, made once."""
+        job_filter = self._filters.get(state)
+        if job_filter is None:
+            job_filter = JobInfo(library=self.session.library)
+            job_filter.jobState = state.name
+            self._filters[state] = job_filter
+        return job_filter
+
+    def _queue(self, job):
+        try:
+            return job_info(job, self.session.library).queueName
+        except (DRMAA2Exception, RuntimeError) as err:
+            LOGGER.debug("No queue for {}: {}".format(job, err))
+            return None
+
+    def tick(self):
+        """Ask the scheduler how things stand.
+
+        :return Snapshot: The cluster now.
+        """
+        sessions = collections.defaultdict(collections.Counter)
+        queue_of = dict()
+        for state in COLUMNS:
+            for jobs in self.session.jobs(self._filter(state),
+                                          chunk_size=self.chunk_size):
+                for job in jobs:
+                    sessions[job.sessionName][state] += 1
+                    if state == JState.running:
+                        queue = self._queue_of.get(job, False)
+                        if queue is False:
+                            queue = self._queue(job)
+                        queue_of[job] = queue
+        # Forget jobs that stopped running.
+        self._queue_of = queue_of
+        queues = collections.Counter(
+            queue for queue in queue_of.values() if queue)
+        machines = sorted(self.session.machines(),
+                          key=lambda m: m.load, reverse=True)
+        return Snapshot(time.time(), dict(sessions), queues, machines)
+
+
+def render(snapshot, width=80, height=24):
+    """Lay out a snapshot as lines of text that fit the screen.
+    Memory in DRMAA2 is in kilobytes.
+
+    :param snapshot Snapshot: From ClusterTracker.tick.
+    :return list(str): Lines, each at most width characters.
+    """
+    lines = list()
+    job_cnt = sum(sum(c.values()) for c in snapshot.sessions.values())
+    lines.append("{}  {} jobs  {} sessions  {} hosts  (q to quit)".format(
+        time.strftime("%H:%M:%S", time.localtime(snapshot.when)), job_cnt,
+        len(snapshot.sessions), len(snapshot.machines)))
+    lines.append("")
+    header = "{:<30}".format("SESSION") + "".join(
+        "{:>10}".format(state.name[:9]) for state in COLUMNS)
+    lines.append(header)
+    by_size = sorted(snapshot.sessions.items(),
+                     key=lambda item: (-sum(item[1].values()), item[0]))
+    for session_name, counts in by_size:
+        lines.append("{:<30}".format(str(session_name)[:29]) + "".join(
+            "{:>10}".format(counts[state]) for state in COLUMNS))
+    lines.append("")
+    lines.append("{:<30}{:>10}".format("QUEUE", "running"))
+    for queue, running in sorted(snapshot.queues.items()):
+        lines.append("{:<30}{:>10}".format(queue[:29], running))
+    lines.append("")
+    lines.append("{:<30}{:>10}{:>10}{:>14}".format(
+        "HOST", "load", "cores", "mem MB"))
+    for machine in snapshot.machines:
+        if len(lines) >= height:
+            break
+        cores = machine.sockets * machine.coresPerSocket
+        lines.append("{:<30}{:>10.2f}{:>10}{:>14}".format(
+            str(machine.name)[:29], machine.load, cores,
+            machine.physMemory // 1024))
+    return [line[:width] for line in lines[:height]]
+
+
+def changed_rows(previous, current):
+    """Which rows to redraw.
+
+    :return list((int, str)): Row number and its new text. The text is
+                              empty for rows that are no longer used.
+    """
+    changes = list()
+    for row in range(max(len(previous), len(current))):
+        old = previous[row] if row < len(previous) else None
+        new = current[row] if row < len(current) else ""
+        if old != new:
+            changes.append((row, new))
+    return changes
@@ -0,0 +1,267 @@
+"""
+A Workflow is a directed acyclic graph of JobTemplates, where an edge
+says one job can't start until another finishes successfully.
+It submits the whole graph, one topological frontier at a time,
+and then waits on all of it from a single loop.
+
+There are two ways to make a child wait for its parents.
+
+ - If the DRM accepts a hold-job list as an implementation-specific
+   attribute of the job template, then the workflow sets that attribute
+   and the scheduler releases the child.
+ - Otherwise, the child is submitted with submitAsHold, and the workflow
+   calls drmaa2_j_release when the last of its parents is done.
+
+Either way, if a parent fails, its descendants are terminated
+or never submitted. The scheduler releases a child when a parent
+ends, even if it failed, so before a child goes in with a hold-job
+list, the workflow asks whether its parents have already ended.
+The state of each node is a plain dictionary, so a later process
+can save it and resume the workflow from it::
+
+    flow = Workflow()
+    flow.add("fit", fit_template)
+    flow.add("plot", plot_template, depends_on=["fit"])
+    with JobSession() as js:
+        state = flow.run(js)
+"""
+import collections
+import logging
+from .interface import *
+from .errors import *
+from .session import (Job, ext_set, job_state, job_release, job_terminate,
+                      implementation_specific)
+from .wrapping import DRMAA2List
+
+
+LOGGER = logging.getLogger("drmaa2.workflow")
+DRMAA_LIB = load_drmaa_library()
+
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+SUBMITTED = "submitted"
+HELD = "held"
+FINISHED = {DONE, FAILED, SKIPPED}
+
+
+class Workflow:
+    """A graph of named JobTemplates and their dependencies."""
+    def __init__(self, hold_attribute="uge_jt_hold_jid"):
+        """
+        :param hold_attribute str: The implementation-specific job template
+            attribute that takes a comma-separated list of job IDs on
+            which to wait. If the library doesn't list it, then the
+            workflow holds and releases jobs itself.
+        """
+        self.hold_attribute = hold_attribute
+        self.templates = collections.OrderedDict()
+        self.parents = dict()
+        self.children = collections.defaultdict(list)
+        self.state = dict()
+        """From node name to a dict with the job "id" and its "state"."""
+        self._jobs = dict()
+
+    def add(self, name, job_template, depends_on=()):
+        """Add a node.
+
+        :param name str: A name unique within this workflow.
+        :param job_template JobTemplate: What to run. Templates can be
+                                         shared among nodes.
+        :param depends_on: Names of nodes that must finish first. They
+                           don't have to be added yet.
+        """
+        if name in self.templates:
+            raise ValueError("Workflow already has a node {}".format(name))
+        self.templates[name] = job_template
+        self.parents[name] = list(depends_on)
+        for parent in depends_on:
+            self.children[parent].append(name)
+
+    def frontiers(self):
+        """Sort nodes into generations, where every node's parents are
+        in earlier generations.
+
+        :return list(list(str)): Lists of node names.
+        :raises ValueError: If a dependency is missing or there is a cycle.
+        """
+        waiting_on = dict()
+        for name, parents in self.parents.items():
+            for parent in parents:
+                if parent not in self.templates:
+                    raise ValueError("{} depends on unknown node {}".format(
+                        name, parent))
+            waiting_on[name] = len(parents)
+        frontier = [n for (n, cnt) in waiting_on.items() if cnt == 0]
+        generations = list()
+        placed = 0
+        while frontier:
+            generations.append(frontier)
+            placed += len(frontier)
+            next_frontier = list()
+            for name in frontier:
+                for child in self.children[name]:
+                    waiting_on[child] -= 1
+                    if waiting_on[child] == 0:
+                        next_frontier.append(child)
+            frontier = next_frontier
+        if placed != len(self.templates):
+            raise ValueError("Workflow has a cycle.")
+        return generations
+
+    def run(self, session, resume=None):
+        """Submit every node and wait until all of them finish.
+
+        :param session JobSession: Where to run the jobs. To resume,
+                                   this must be the session that ran the
+                                   jobs before.
+        :param resume dict: The state from an earlier run. Nodes that are
+                            done aren't run again, and nodes that were
+                            submitted are found in the session.
+        :return dict: The state, which is also in the state attribute.
+        :raises DRMAA2Exception: If a wait fails other than by timing out.
+        """
+        self.state = dict()
+        self._jobs = dict()
+        for name, node_state in (resume or dict()).items():
+            self.state[name] = dict(node_state)
+        generations = self.frontiers()
+        native = (self.hold_attribute in implementation_specific(
+            DRMAA_LIB.drmaa2_jtemplate_impl_spec))
+        LOGGER.debug("Workflow native dependencies: {}".format(native))
+
+        active = DRMAA2List([], ListType.joblist, indexed=True)
+        by_id = dict()
+        self._reattach(session, active, by_id)
+        for generation in generations:
+            for name in generation:
+                if name not in self.state:
+                    self._submit(session, name, native, active, by_id)
+        self._wait(session, active, by_id)
+        return self.state
+
+    def _reattach(self, session, active, by_id):
+        """Look up jobs from an earlier run that were still in flight."""
+        for name, node_state in self.state.items():
+            if node_state["state"] in FINISHED:
+                continue
+            job = Job(node_state["id"], session.name)
+            self._jobs[name] = job
+            current = job_state(job)
+            if current == JState.done:
+                node_state["state"] = DONE
+            elif current == JState.failed:
+                node_state["state"] = FAILED
+            else:
+                active.append(job)
+                by_id[job.id] = name
+        for name, node_state in list(self.state.items()):
+            if node_state["state"] == FAILED:
+                self._skip_descendants(name)
+            elif node_state["state"] == HELD and self._parents_done(name):
+                self._release(name)
+
+    def _parents_done(self, name):
+        return all(self.state.get(p, {}).get("state") == DONE
+                   for p in self.parents[name])
+
+    def _settle_parents(self, name):
+        """Catch parents that have ended since they were submitted."""
+        for parent in self.parents[name]:
+            node_state = self.state[parent]
+            if node_state["state"] not in (SUBMITTED, HELD):
+                continue
+            current = job_state(self._jobs[parent])
+            if current == JState.done:
+                node_state["state"] = DONE
+            elif current == JState.failed:
+                node_state["state"] = FAILED
+                self._skip_descendants(parent)
+
+    def _submit(self, session, name, native, active, by_id):
+        if native:
+            self._settle_parents(name)
+            if name in self.state:
+                return  # Skipped, because a parent failed.
+        parent_states = [self.state[p]["state"] for p in self.parents[name]]
+        if any(s in (FAILED, SKIPPED) for s in parent_states):
+            self.state[name] = dict(id=None, state=SKIPPED)
+            return
+        unfinished = [self.state[p]["id"] for p in self.parents[name]
+                      if self.state[p]["state"] != DONE]
+        template = self.templates[name]
+        node_state = SUBMITTED
+        if unfinished and native:
+            ext_set(template, self.hold_attribute, ",".join(unfinished),
+                    DRMAA_LIB.drmaa2_jtemplate_impl_spec)
+            try:
+                job = session.run(template)
+            finally:
+                ext_set(template, self.hold_attribute, None,
+                        DRMAA_LIB.drmaa2_jtemplate_impl_spec)
+        elif unfinished:
+            was_held = template.submitAsHold
+            template.submitAsHold = True
+            try:
+                job = session.run(template)
+            finally:
+                template.submitAsHold = was_held
+            node_state = HELD
+        else:
+            job = session.run(template)
+        LOGGER.debug("Workflow submitted {} as {}".format(name, job.id))
+        self.state[name] = dict(id=job.id, state=node_state)
+        self._jobs[name] = job
+        active.append(job)
+        by_id[job.id] = name
+
+    def _release(self, name):
+        LOGGER.debug("Workflow releases {}".format(name))
+        job_release(self._jobs[name])
+        self.state[name]["state"] = SUBMITTED
+
+    def _skip_descendants(self, name):
+        """Terminate or skip everything downstream of a failed node."""
+        stack = list(self.children[name])
+        while stack:
+            child = stack.pop()
+            node_state = self.state.get(child)
+            if node_state is None:
+                self.state[child] = dict(id=None, state=SKIPPED)
+            elif node_state["state"] in FINISHED:
+                continue
+            else:
+                try:
+                    job_terminate(self._jobs[child])
+                except DRMAA2Exception as err:
+                    LOGGER.debug("Could not terminate {}: {}".format(
+                        child, err))
+                node_state["state"] = SKIPPED
+            stack.extend(self.children[child])
+
+    def _wait(self, session, active, by_id):
+        while len(active) > 0:
+            job = session.wait_any_terminated(active, Times.infinite)
+            if job is None:
+                library = session.library
+                errno = last_errno(library)
+                if errno != Error.timeout.value:
+                    CheckError(errno, library)
+                continue
+            name = by_id.pop(job.id)
+            active.remove(self._jobs[name])
+            node_state = self.state[name]
+            if node_state["state"] == SKIPPED:
+                continue
+            if job_state(job) == JState.done:
+                node_state["state"] = DONE
+                for child in self.children[name]:
+                    child_state = self.state.get(child)
+                    if (child_state and child_state["state"] == HELD and
+                            self._parents_done(child)):
+                        self._release(child)
+            else:
+                node_state["state"] = FAILED
+                self._skip_descendants(name)
+            LOGGER.debug("Workflow node {} is {}".format(
+                name, node_state["state"]))
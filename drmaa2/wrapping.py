@@ -3,12 +3,14 @@ This module makes decisions about how to wrap the interface
 objects from ctypes.
 """
 import atexit
-from ctypes import byref
-from collections.abc import Sequence
+from ctypes import byref, string_at
+from collections.abc import Mapping, Sequence
 import datetime
 import logging
+import os
 from .interface import *
 from .errors import *
+from .engine import ENGINE, CtypesEngine
 
 
 LOGGER = logging.getLogger("drmaa2.wrapping")
@@ -29,6 +31,69 @@ def print_string_list(wrapped_list):
     print(", ".join([str(x) for x in ptrs]))
 
 
+class InternTable:
+    """Decodes C strings to Python strings so that equal values
+    share one Python object. Every job in a listing carries the same
+    session name, and most share a few queue names, owners, and
+    machine names, so a listing of 100k jobs would otherwise hold
+    100k copies of each. The table is bounded, and it forgets
+    its oldest entries first."""
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._table = dict()
+
+    def __len__(self):
+        return len(self._table)
+
+    def from_bytes(self, raw):
+        """Given bytes read from the library, return the shared str.
+
+        :param raw bytes: A value like drmaa2_string.value. Can be None.
+        :return str: The decoded string or None.
+        """
+        if raw is None:
+            return None
+        try:
+            return self._table[raw]
+        except KeyError:
+            pass
+        value = raw.decode()
+        if len(self._table) >= self.max_size:
+            try:
+                del self._table[next(iter(self._table))]
+            except (KeyError, RuntimeError, StopIteration):
+                pass  # Another thread evicted it first.
+        self._table[raw] = value
+        return value
+
+    def from_address(self, address):
+        """Given the integer address of a char*, return the shared str."""
+        if address:
+            return self.from_bytes(string_at(address))
+        else:
+            return None
+
+    def clear(self):
+        self._table.clear()
+
+
+STRING_INTERN = InternTable()
+"""Shared by all decoding of repeated names, such as session names."""
+
+
+def from_address(address):
+    """Decodes a char* at an integer address, as returned by
+    drmaa2_list_get, with a single read and no intermediate
+    ctypes object. Use this for values that don't repeat, like job IDs.
+
+    :return str: The string or None for a NULL pointer.
+    """
+    if address:
+        return string_at(address).decode()
+    else:
+        return None
+
+
 # Conversion strategies represent our rules for how to translate
 # pointers into Python objects when we work with lists of things
 # that are returned from DRMAA2 or sent to DRMAA2
@@ -44,6 +109,11 @@ def conversion_strategy(list_type):
        class JobStrategy(object):
            ...
 
+    A strategy has from_void, to_void, and compare_pointers. It may
+    also have pack(python_entries), which returns a list of objects
+    to keep alive and the addresses to add to a list, so that
+    a whole list is marshalled at once.
+
     :param list_type: This is from the ListType enum.
     """
     def conversion(cls):
@@ -58,7 +128,7 @@ class StringStrategy:
     @staticmethod
     def from_void(void_ptr):
         """Makes a Python object which is a copy of the value."""
-        return cast(void_ptr, drmaa2_string).value.decode()
+        return from_address(void_ptr)
 
     @staticmethod
     def to_void(name_str):
@@ -70,29 +140,62 @@ class StringStrategy:
 
     @staticmethod
     def compare_pointers(a, b):
-        return StringStrategy.from_void(a) == StringStrategy.from_void(b)
+        return same_string(a, b)
 
 
 class DRMAA2List(Sequence):
     """A DRMAAList owns a DRMAA list of things. This is the Python wrapper.
     The design choice is to keep the wrapped items as a native pointer
-    and return individual items when requested. It also lets
-    you set all of the items at instantiation but not modify that
-    list of items. It's read-only. This will suffice for passing
+    and return individual items when requested. You set the items
+    at instantiation and can append or delete items afterwards.
+    This will suffice for passing
     around a list efficiently without copies, but it also lets
     you make a copy with list(DRMAA2List instance) if that's what
-    you need."""
-    def __init__(self, python_entries, list_type=ListType.stringlist):
+    you need.
+
+    The length is cached so that indexing doesn't ask the library
+    for the size every time. If you ask for it with ``indexed=True``,
+    then the first membership test decodes every entry once into a
+    dictionary, and later tests don't touch the native list.
+
+    A list belongs to the library that made it, which is the package's
+    unless you pass another, as a FederatedSession does for each cell."""
+    def __init__(self, python_entries, list_type=ListType.stringlist,
+                 indexed=False, library=None):
         """If a pointer is passed to this class, then this class
         is responsible for freeing that list pointer. If none is passed,
         then this class creates a list pointer."""
         self.list_type = self.hint_type(list_type)
         self.strategy = STRATEGIES[self.list_type]
-        self.list_ptr = DRMAA_LIB.drmaa2_list_create(
+        self.indexed = indexed
+        self._size = None
+        self._index = None
+        self._appended = dict()
+        self._use_library(library)
+        self.list_ptr = self._lib.drmaa2_list_create(
             self.list_type.value, DRMAA2_LIST_ENTRYFREE())
-        self._pin = [self.strategy.to_void(x) for x in python_entries]
-        for add_item in self._pin:
-            CheckError(DRMAA_LIB.drmaa2_list_add(self.list_ptr, add_item))
+        if hasattr(self.strategy, "pack"):
+            # The strategy lays out all entries in one block of memory.
+            self._pin, add_items = self.strategy.pack(python_entries)
+        else:
+            self._pin = [self.strategy.to_void(x) for x in python_entries]
+            add_items = self._pin
+        for add_item in add_items:
+            CheckError(self._lib.drmaa2_list_add(self.list_ptr, add_item),
+                       self.library)
+
+    def _use_library(self, library):
+        self.library = library
+        # The cffi engine was built against the package's library.
+        self._engine = CtypesEngine(library) if library is not None else None
+
+    @property
+    def _lib(self):
+        return self.library if self.library is not None else DRMAA_LIB
+
+    @property
+    def _list_engine(self):
+        return self._engine or ENGINE
 
     @staticmethod
     def hint_type(list_type):
@@ -104,45 +207,189 @@ class DRMAA2List(Sequence):
             return ListType(list_type)
 
     @classmethod
-    def from_existing(cls, list_ptr, list_type):
+    def from_existing(cls, list_ptr, list_type, indexed=False, library=None):
         obj = cls.__new__(cls)
+        obj._use_library(library)
         obj.list_ptr = list_ptr
         obj.list_type = obj.hint_type(list_type)
         obj.strategy = STRATEGIES[obj.list_type]
+        obj.indexed = indexed
+        obj._size = None
+        obj._index = None
+        obj._pin = list()
+        obj._appended = dict()
         return obj
 
     def __getitem__(self, item):
-        if item >= self.__len__():
+        if isinstance(item, slice):
+            return [self._get(idx) for idx in range(*item.indices(len(self)))]
+        size = self.__len__()
+        if item < 0:
+            item += size
+        if not 0 <= item < size:
             raise IndexError()
-        void_p = DRMAA_LIB.drmaa2_list_get(self.list_ptr, item)
+        return self._get(item)
+
+    def _get(self, item):
+        void_p = self._list_engine.list_get(self.list_ptr, item)
         return self.strategy.from_void(void_p)
 
+    def __iter__(self):
+        """Decodes the entries one at a time, as the engine reads
+        their addresses, so only a block of them is held at once."""
+        from_void = self.strategy.from_void
+        for void_p in self._list_engine.list_addresses(self.list_ptr,
+                                                        self.__len__()):
+            yield from_void(void_p)
+
     def __len__(self):
-        return DRMAA_LIB.drmaa2_list_size(self.list_ptr)
+        if self._size is None:
+            self._size = self._list_engine.list_size(self.list_ptr)
+        return self._size
+
+    def __contains__(self, value):
+        if self.indexed:
+            return value in self._hash_index()
+        else:
+            return super().__contains__(value)
+
+    def index(self, value, start=0, stop=None):
+        if self.indexed and start == 0 and stop is None:
+            try:
+                return self._hash_index()[value]
+            except KeyError:
+                raise ValueError("{} is not in list".format(value))
+        else:
+            return super().index(value, start, stop)
+
+    def _hash_index(self):
+        if self._index is None:
+            self._index = dict()
+            for idx, value in enumerate(self):
+                self._index.setdefault(value, idx)
+        return self._index
+
+    def append(self, python_entry):
+        """Add an item to the end of the native list."""
+        add_item = self.strategy.to_void(python_entry)
+        position = self.__len__()
+        CheckError(self._lib.drmaa2_list_add(self.list_ptr, add_item),
+                   self.library)
+        # Keyed by native position, so that removing one entry releases
+        # only its own memory, even when another entry is equal to it.
+        self._appended[position] = add_item
+        if self._index is not None:
+            self._index.setdefault(python_entry, position)
+        self._size = position + 1
+
+    def remove(self, value):
+        """Remove an entry by value, using the hash index. The last
+        entry moves into its place, so this changes the order,
+        but it doesn't shift the rest of a long wait list. Entries
+        should be unique.
+
+        :raises ValueError: If the value isn't in the list.
+        """
+        index = self._hash_index()
+        try:
+            position = index.pop(value)
+        except KeyError:
+            raise ValueError("{} is not in list".format(value))
+        last = self.__len__() - 1
+        if position != last:
+            last_ptr = self._lib.drmaa2_list_get(self.list_ptr, last)
+            index[self.strategy.from_void(last_ptr)] = position
+            CheckError(self._lib.uge_drmaa2_list_set(
+                self.list_ptr, position, last_ptr), self.library)
+        CheckError(self._lib.drmaa2_list_del(self.list_ptr, last),
+                   self.library)
+        self._size = last
+        self._appended.pop(position, None)
+        moved = self._appended.pop(last, None)
+        if moved is not None and position != last:
+            self._appended[position] = moved
+
+    def __delitem__(self, item):
+        """Remove an item from the native list, as you would
+        after drmaa2_jsession_wait_any_terminated returns it."""
+        size = self.__len__()
+        if item < 0:
+            item += size
+        if not 0 <= item < size:
+            raise IndexError()
+        CheckError(self._lib.drmaa2_list_del(self.list_ptr, item),
+                   self.library)
+        if self._appended:
+            self._appended = {
+                (position - 1 if position > item else position): pin
+                for position, pin in self._appended.items()
+                if position != item}
+        self.invalidate()
+
+    def invalidate(self):
+        """Forget the cached size and index. Call this if something
+        outside this class changes the native list."""
+        self._size = None
+        self._index = None
 
     def __del__(self):
         """This isn't called when you call del but when garbage collection
         happens."""
         if self.list_ptr:
-            DRMAA_LIB.drmaa2_list_free(byref(c_void_p(self.list_ptr)))
+            self._lib.drmaa2_list_free(byref(c_void_p(self.list_ptr)))
             self.list_ptr = None
 
     def __eq__(self, other):
         """Compares two DRMAA2Lists"""
+        if self.list_ptr == other.list_ptr:
+            return True
         self_cnt = self.__len__()
         other_cnt = other.__len__()
         if self_cnt != other_cnt:
             return False
         for cmp_idx in range(self_cnt):
-            self_p = DRMAA_LIB.drmaa2_list_get(self.list_ptr, cmp_idx)
-            other_p = DRMAA_LIB.drmaa2_list_get(other.list_ptr, cmp_idx)
-            if not self.strategy.compare_pointers(self_p, other_p):
+            self_p = self._lib.drmaa2_list_get(self.list_ptr, cmp_idx)
+            other_p = other._lib.drmaa2_list_get(other.list_ptr, cmp_idx)
+            if self_p != other_p and not self.strategy.compare_pointers(
+                    self_p, other_p):
                 return False
         return True
 
     @staticmethod
-    def return_list(string_ptr, list_type):
-        l_ptr = DRMAA2List.from_existing(string_ptr, list_type)
+    def stream(list_ptr, list_type, chunk_size=None, library=None):
+        """Decode a list that the library returned as you iterate,
+        freeing it when the generator finishes or is closed.
+        Without a chunk size, this holds one decoded entry at a time.
+
+        :param list_ptr: A native list, which this now owns. It may be None.
+        :param list_type ListType: What the list holds.
+        :param chunk_size int: If given, yield lists of this many entries.
+        :param library: The library that returned it, if not the package's.
+        :return: Generator of entries, or of lists of entries.
+        """
+        if not list_ptr:
+            return iter(())
+        # Wrap it now, so the list is freed even if nobody iterates.
+        wrapped = DRMAA2List.from_existing(list_ptr, list_type,
+                                           library=library)
+        return DRMAA2List._stream(wrapped, chunk_size)
+
+    @staticmethod
+    def _stream(wrapped, chunk_size):
+        try:
+            if chunk_size is None:
+                for entry in wrapped:
+                    yield entry
+            else:
+                for start in range(0, len(wrapped), chunk_size):
+                    yield wrapped[start:start + chunk_size]
+        finally:
+            wrapped.__del__()
+
+    @staticmethod
+    def return_list(string_ptr, list_type, library=None):
+        l_ptr = DRMAA2List.from_existing(string_ptr, list_type,
+                                         library=library)
         l_py = list(l_ptr)
         l_ptr.__del__()
         return l_py
@@ -151,14 +398,10 @@ class DRMAA2List(Sequence):
 def convert_string_list(string_list):
     python_list = list()
     if string_list:
-        string_cnt = DRMAA_LIB.drmaa2_list_size(string_list)
+        string_cnt = ENGINE.list_size(string_list)
         check_errno()
-        for string_idx in range(string_cnt):
-            void_p = DRMAA_LIB.drmaa2_list_get(string_list, string_idx)
-            assert last_errno() < 1
-            name = cast(void_p, drmaa2_string).value.decode()
-            LOGGER.debug("{} at index {}".format(name, string_idx))
-            python_list.append(name)
+        for void_p in ENGINE.list_addresses(string_list, string_cnt):
+            python_list.append(from_address(void_p))
 
     return python_list
 
@@ -191,10 +434,13 @@ class DRMAA2Bool:
 class DRMAA2String:
     """A descriptor for wrapped strings on structs.
     There is no drmaa2_string_create, so we use ctypes' own allocation
-    and freeing, which happens by default."""
-    def __init__(self, name):
+    and freeing, which happens by default.
+    Set interned=True for values, such as session names, that repeat
+    across many structs."""
+    def __init__(self, name, interned=False):
         self.name = name.split(".")
         self.was_set = False
+        self.interned = interned
 
     def __get__(self, obj, type=None):
         if not obj:  # Case of building docs.
@@ -206,6 +452,8 @@ class DRMAA2String:
         wrapped_value = getattr(base, self.name[-1]).value
         if wrapped_value is None:  # Exclude case where it is "".
             return wrapped_value
+        elif self.interned:
+            return STRING_INTERN.from_bytes(wrapped_value)
         else:
             return wrapped_value.decode()
 
@@ -245,16 +493,18 @@ class DRMAA2StringList:
             return []
         wrapped_list = getattr(obj._wrapped.contents, self.name)
         if wrapped_list:
+            # A JobInfo from another cell keeps that cell's library.
+            library = getattr(obj, "_lib", None) or DRMAA_LIB
             string_list = list()
-            string_cnt = DRMAA_LIB.drmaa2_list_size(wrapped_list)
+            string_cnt = library.drmaa2_list_size(wrapped_list)
             for string_idx in range(string_cnt):
-                void_p = DRMAA_LIB.drmaa2_list_get(wrapped_list, string_idx)
+                void_p = library.drmaa2_list_get(wrapped_list, string_idx)
                 if void_p:
-                    name = cast(void_p, drmaa2_string).value.decode()
+                    name = from_address(void_p)
                     LOGGER.debug("{} at index {}".format(name, string_idx))
                     string_list.append(name)
                 else:
-                    check_errno()
+                    check_errno(library)
                     string_list.append(None)
             return string_list
         else:
@@ -278,15 +528,14 @@ class DRMAA2StringList:
             setattr(obj._wrapped.contents, self.name, wrapped)
 
         if value:
-            # In order to manage memory, attach the list to this object.
-            self.value = [x.encode() for x in value]
+            # In order to manage memory, attach the list to this object,
+            # not to the descriptor, which every instance shares.
+            encoded = [x.encode() for x in value]
+            obj.__dict__.setdefault("_string_lists", dict())[self.name] = \
+                encoded
             LOGGER.debug("Adding string {} values {}".format(self.name, value))
-            string_obj = drmaa2_string()
             for idx in range(len(value)):
-                LOGGER.debug("value going in {} at {} for {}".format(
-                    string_obj.value, string_obj, self.name))
-                CheckError(DRMAA_LIB.drmaa2_list_add(
-                    wrapped, self.value[idx]))
+                CheckError(DRMAA_LIB.drmaa2_list_add(wrapped, encoded[idx]))
 
 
     def free(self):
@@ -294,48 +543,172 @@ class DRMAA2StringList:
             DRMAA_LIB.drmaa2_list_free(byref(self.allocated))
 
 
+def _read_dict(wrapped):
+    """What a native dictionary holds, as a mirror for DRMAA2Dict."""
+    mirror = dict()
+    key_list = DRMAA_LIB.drmaa2_dict_list(wrapped)
+    if key_list:
+        key_cnt = DRMAA_LIB.drmaa2_list_size(key_list)
+        for key_idx in range(key_cnt):
+            void_ptr = DRMAA_LIB.drmaa2_list_get(key_list, key_idx)
+            key_ptr = cast(void_ptr, drmaa2_string).value
+            value_ptr = DRMAA_LIB.drmaa2_dict_get(wrapped, key_ptr)
+            LOGGER.debug("{} {}".format(key_ptr.decode(), value_ptr.decode()))
+            # The library owns these strings, so there is nothing to keep.
+            mirror[key_ptr.decode()] = (value_ptr.decode(), None, None)
+        DRMAA_LIB.drmaa2_list_free(byref(c_void_p(key_list)))
+    return mirror
+
+
+_SHARED_DICTS = set()
+"""Addresses of native dictionaries that belong to an Environment."""
+
+
 class DRMAA2Dict:
+    """A descriptor for dictionaries on structs. Each instance remembers
+    what it last put in the native dictionary, so setting a new dict
+    reads nothing from the library and changes only the keys that
+    differ. Setting an Environment points the struct at that
+    environment's native dictionary, which costs nothing."""
     def __init__(self, name):
         self.name = name
 
+    def _mirror(self, obj, wrapped):
+        """From key to (value, key bytes, value bytes) for what the
+        native dictionary holds. The bytes are what the library
+        points to, so they must live as long as the entries."""
+        mirrors = obj.__dict__.setdefault("_dict_mirrors", dict())
+        address, mirror = mirrors.get(self.name, (None, None))
+        if address != wrapped:
+            mirror = _read_dict(wrapped)
+            mirrors[self.name] = (wrapped, mirror)
+        return mirror
+
     def __get__(self, obj, type=None):
         # Allow for obj=None in case of building docs.
         wrapped = getattr(obj._wrapped.contents, self.name) if obj else None
         if wrapped:
-            key_list = DRMAA_LIB.drmaa2_dict_list(wrapped)
-            if key_list:
-                result = dict()
-                key_cnt = DRMAA_LIB.drmaa2_list_size(key_list)
-                for key_idx in range(key_cnt):
-                    void_ptr = DRMAA_LIB.drmaa2_list_get(key_list, key_idx)
-                    key_ptr = cast(void_ptr, drmaa2_string).value
-                    value_ptr = DRMAA_LIB.drmaa2_dict_get(wrapped, key_ptr)
-                    LOGGER.debug("{} {}".format(
-                        key_ptr.decode(), value_ptr.decode()))
-                    result[key_ptr.decode()] = value_ptr.decode()
-                return result
-            else:
-                return dict()
+            return {key: entry[0]
+                    for (key, entry) in self._mirror(obj, wrapped).items()}
         else:
             return dict()
 
     def __set__(self, obj, value):
         wrapped = getattr(obj._wrapped.contents, self.name)
-        if not wrapped:
+        mirrors = obj.__dict__.setdefault("_dict_mirrors", dict())
+        if isinstance(value, Environment):
+            setattr(obj._wrapped.contents, self.name, value.dict_ptr)
+            # Holding the environment keeps its native dictionary alive.
+            mirrors[self.name] = (value.dict_ptr, value._mirror)
+            mirrors[self.name + ".environment"] = value
+            return
+        if not wrapped or wrapped in _SHARED_DICTS:
+            # Never change an environment that other templates share.
             wrapped = DRMAA_LIB.drmaa2_dict_create(DRMAA2_DICT_ENTRYFREE())
             setattr(obj._wrapped.contents, self.name, wrapped)
-        else:
-            key_list = DRMAA_LIB.drmaa2_dict_list(wrapped)
-            if key_list:
-                key_cnt = DRMAA_LIB.drmaa2_list_size(key_list)
-                for key_idx in range(key_cnt):
-                    void_ptr = DRMAA_LIB.drmaa2_list_get(key_list, key_idx)
-                    key_ptr = cast(void_ptr, drmaa2_string).value
-                    CheckError(DRMAA_LIB.drmaa2_dict_del(wrapped, key_ptr))
+            mirrors[self.name] = (wrapped, dict())
+            mirrors.pop(self.name + ".environment", None)
+        mirror = self._mirror(obj, wrapped)
+        _update_dict(wrapped, mirror, value)
+
+
+def _update_dict(wrapped, mirror, value):
+    """Make a native dictionary hold value, given a mirror of what
+    it holds now, by deleting and setting only the keys that differ."""
+    for key in [key for key in mirror if key not in value]:
+        key_bytes = mirror[key][1] or key.encode()
+        CheckError(DRMAA_LIB.drmaa2_dict_del(wrapped, key_bytes))
+        del mirror[key]
+    for key, entry_value in value.items():
+        previous = mirror.get(key)
+        if previous is not None and previous[0] == entry_value:
+            continue
+        # Keep the first key bytes, in case the library kept that pointer.
+        key_bytes = previous[1] if previous and previous[1] else key.encode()
+        value_bytes = entry_value.encode()
+        CheckError(DRMAA_LIB.drmaa2_dict_set(wrapped, key_bytes, value_bytes))
+        mirror[key] = (entry_value, key_bytes, value_bytes)
+
+
+class Environment(Mapping):
+    """Environment variables marshalled once into a native dictionary,
+    which any number of templates can share::
+
+        baseline = register_environment("baseline")  # From os.environ
+        for idx in range(1000):
+            job_template.jobEnvironment = baseline
+
+    Setting a template's jobEnvironment to a plain dict gives the
+    template a dictionary of its own, and after that, setting it again
+    changes only what differs, so this is the fast way to add a few
+    variables to a large baseline on a template you reuse::
+
+        job_template.jobEnvironment = baseline.updated(TASK=str(idx))
+    """
+    def __init__(self, variables=None):
+        """
+        :param variables dict: Names and values. The default is a copy
+                               of this process's environment.
+        """
+        if variables is None:
+            variables = os.environ
+        self.dict_ptr = DRMAA_LIB.drmaa2_dict_create(DRMAA2_DICT_ENTRYFREE())
+        if not self.dict_ptr:
+            raise RuntimeError(last_error())
+        self._mirror = dict()
+        _update_dict(self.dict_ptr, self._mirror, dict(variables))
+        _SHARED_DICTS.add(self.dict_ptr)
+
+    def __getitem__(self, key):
+        return self._mirror[key][0]
+
+    def __iter__(self):
+        return iter(self._mirror)
 
-        self.dict = {(k.encode(), v.encode()) for (k, v) in value.items()}
-        for key, value in self.dict:
-            CheckError(DRMAA_LIB.drmaa2_dict_set(wrapped, key, value))
+    def __len__(self):
+        return len(self._mirror)
+
+    def updated(self, changes=None, **more):
+        """A plain dict of these variables with some changed.
+
+        :param changes dict: Variables to add or replace.
+        :return dict: A new dict.
+        """
+        variables = dict(self)
+        variables.update(changes or dict())
+        variables.update(more)
+        return variables
+
+    def __del__(self):
+        # At exit, the library may be gone before the registry.
+        if getattr(self, "dict_ptr", None) and DRMAA_LIB:
+            _SHARED_DICTS.discard(self.dict_ptr)
+            DRMAA_LIB.drmaa2_dict_free(byref(c_void_p(self.dict_ptr)))
+            self.dict_ptr = None
+
+
+ENVIRONMENTS = dict()
+"""Named baseline environments, from register_environment."""
+
+
+def register_environment(name, variables=None):
+    """Marshal a baseline environment once, under a name, so that
+    any code in the process can find it with get_environment.
+
+    :param name str: What to call it. This replaces an earlier one.
+    :param variables dict: Names and values, by default os.environ.
+    :return Environment: The baseline.
+    """
+    ENVIRONMENTS[name] = Environment(variables)
+    return ENVIRONMENTS[name]
+
+
+def get_environment(name):
+    """A baseline environment from register_environment.
+
+    :raises KeyError: If there is none by that name.
+    """
+    return ENVIRONMENTS[name]
 
 
 class DRMAA2LongLong:
@@ -405,6 +778,23 @@ class DRMAA2Time:
         setattr(obj._wrapped.contents, self.name, when)
 
 
+class DRMAA2Seconds:
+    """A drmaa2_time that is a length of time, such as a duration,
+    rather than a moment. It reads and writes seconds as an int."""
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, type=None):
+        if not obj:
+            return None
+        seconds = getattr(obj._wrapped.contents, self.name)
+        return seconds if seconds >= 0 else None
+
+    def __set__(self, obj, value):
+        seconds = Times.unset.value if value is None else int(value)
+        setattr(obj._wrapped.contents, self.name, seconds)
+
+
 class Notification:
     """Represents a notification, which is passed back to a callback.
     This wrapps a DRMAA2Notification."""
@@ -413,7 +803,7 @@ class Notification:
 
     event = DRMAA2Enum("event", Event)
     jobId = DRMAA2String("jobId")
-    sessionName = DRMAA2String("sessionName")
+    sessionName = DRMAA2String("sessionName", interned=True)
     jobState = DRMAA2Enum("jobState", JState)
 
 
@@ -448,16 +838,25 @@ def event_callback(cb):
     return wrapper
 
 
+_REGISTERED_CALLBACK = None
+"""The DRMAA2_CALLBACK the library holds. The library keeps only its
+address, so this keeps it alive until it is unset."""
+
+
 def register_event_notification(callback):
     """Register to receive notifications of events for new states,
     migration, or change of attributes.
     Unsupported in Univa Grid Engine"""
+    global _REGISTERED_CALLBACK
     callback_ptr = DRMAA2_CALLBACK(event_callback(callback))
     LOGGER.debug("callback is {}".format(callback_ptr))
     CheckError(DRMAA_LIB.drmaa2_register_event_notification(callback_ptr))
+    _REGISTERED_CALLBACK = callback_ptr
     atexit.register(unset_event_notification)
 
 
 def unset_event_notification():
+    global _REGISTERED_CALLBACK
     LOGGER.debug("unset event notification")
     CheckError(DRMAA_LIB.drmaa2_register_event_notification(DRMAA2_CALLBACK()))
+    _REGISTERED_CALLBACK = None
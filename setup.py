@@ -9,6 +9,10 @@ setup(name="drmaa",
       license="Apache 3.0",
       packages=["drmaa2"],
       install_requires=[],
+      extras_require={"cffi": ["cffi"]},
+      entry_points={
+          "console_scripts": ["clustermon=drmaa2.clustermon:main"],
+      },
       test_suite="py.test",
       tests_require="pytest",
       zip_safe=True)
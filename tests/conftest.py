@@ -0,0 +1,18 @@
+import pytest
+from drmaa2 import JobTemplate
+
+
+def make_sleeper(seconds, category=None):
+    job_template = JobTemplate()
+    job_template.remoteCommand = "/bin/sleep"
+    job_template.args = [str(seconds)]
+    if category:
+        job_template.jobCategory = category
+    return job_template
+
+
+@pytest.fixture
+def sleeper():
+    """A function that makes a JobTemplate to sleep some seconds,
+    optionally in a job category, with the library in use."""
+    return make_sleeper
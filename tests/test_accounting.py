@@ -0,0 +1,65 @@
+import csv
+import pytest
+from drmaa2 import JobSession, accounting
+from drmaa2.accounting import (COLUMNS, export_accounting, last_exported,
+                               last_finish_time, write_chunks)
+from drmaa2.simulator import simulate
+
+
+def chunk(first, cnt):
+    columns = {name: list() for (name, kind) in COLUMNS}
+    for idx in range(first, first + cnt):
+        for name, kind in COLUMNS:
+            columns[name].append(idx if kind == "int64" else str(idx))
+    columns["exitStatus"][0] = None
+    return columns
+
+
+def test_csv_append_and_since(tmp_path):
+    path = tmp_path / "jobs.csv"
+    assert last_finish_time(path) is None
+    assert write_chunks(iter([chunk(0, 3), chunk(3, 2)]), path) == 5
+    assert last_finish_time(path) == 4
+    assert write_chunks(iter([chunk(5, 2)]), path) == 2
+    with path.open() as src:
+        rows = list(csv.DictReader(src))
+    assert [row["jobId"] for row in rows] == [str(i) for i in range(7)]
+    assert rows[0]["exitStatus"] == ""
+    assert last_finish_time(path) == 6
+
+
+def test_parquet_series(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "jobs.parquet"
+    write_chunks(iter([chunk(0, 3)]), path)
+    write_chunks(iter([chunk(3, 2)]), path)
+    assert (tmp_path / "jobs.1.parquet").exists()
+    assert last_finish_time(path) == 4
+
+
+def test_without_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setattr(accounting, "pyarrow", None)
+    write_chunks(iter([chunk(0, 1)]), tmp_path / "jobs.parquet")
+    assert last_finish_time(tmp_path / "jobs.parquet") == 0
+    assert (tmp_path / "jobs.csv").exists()
+    with pytest.raises(ImportError):
+        write_chunks(iter([]), tmp_path / "jobs.parquet", "parquet")
+
+
+def test_incremental_keeps_same_second(tmp_path, sleeper):
+    path = tmp_path / "jobs.csv"
+    with simulate() as simulator:
+        with JobSession() as session:
+            jobs = [session.run(sleeper(10)) for idx in range(2)]
+            for job in jobs:
+                session.wait_any_terminated([job], "infinite")
+            assert export_accounting(session, path, incremental=True) == 2
+            assert export_accounting(session, path, incremental=True) == 0
+            # This one finishes in the second that was exported last.
+            late = session.run(sleeper(0))
+            session.wait_any_terminated([late], "infinite")
+            assert export_accounting(session, path, incremental=True) == 1
+    latest, job_ids = last_exported(path)
+    assert job_ids == {job.id for job in jobs + [late]}
+    with path.open() as src:
+        assert len(list(csv.DictReader(src))) == 3
@@ -0,0 +1,113 @@
+import atexit
+import gc
+import importlib
+import threading
+import weakref
+from drmaa2 import Capability, Event, Job, JState
+from drmaa2 import wrapping
+from drmaa2.capabilities import capabilities, stage_files, watch_jobs
+
+# The package exports a function of the same name as this module.
+MODULE = importlib.import_module("drmaa2.capabilities")
+
+
+class Library:
+    def __init__(self, supported):
+        self.supported = supported
+        self.asked = 0
+
+    def drmaa2_supports(self, value):
+        self.asked += 1
+        return value in self.supported
+
+
+def test_capabilities_cached():
+    library = Library({Capability.callback.value, Capability.jt_email.value})
+    assert capabilities(library) == {Capability.callback, Capability.jt_email}
+    asked = library.asked
+    assert capabilities(library) == {Capability.callback, Capability.jt_email}
+    assert library.asked == asked
+
+
+def test_client_side_staging(tmp_path, monkeypatch):
+    class Template:
+        pass
+
+    monkeypatch.setattr(MODULE, "supports",
+                        lambda capability: False)
+
+    source = tmp_path / "in.dat"
+    source.write_text("input")
+    staging = stage_files(Template(), {str(source): str(tmp_path / "job.in")},
+                          {str(tmp_path / "job.out"): str(tmp_path / "out")})
+    assert not staging.native
+    assert (tmp_path / "job.in").read_text() == "input"
+    (tmp_path / "job.out").write_text("output")
+    assert staging.finish() == [str(tmp_path / "out")]
+    assert (tmp_path / "out").read_text() == "output"
+
+
+def test_polling_watcher():
+    states = {"1": [JState.queued, JState.running, JState.done]}
+    seen = list()
+    done = threading.Event()
+
+    def state_of(job):
+        sequence = states[job.id]
+        return sequence.pop(0) if len(sequence) > 1 else sequence[0]
+
+    def callback(event, job_id, session_name, state):
+        seen.append((event, job_id, state))
+        if state == JState.done:
+            done.set()
+
+    watcher = watch_jobs([Job("1", "s")], callback, 0.001, state_of)
+    assert done.wait(5)
+    watcher.stop()
+    assert [s for (e, i, s) in seen] == [
+        JState.queued, JState.running, JState.done]
+    assert all(e == Event.new_state for (e, i, s) in seen)
+
+
+def test_callback_watcher_gives_enums(monkeypatch):
+    relays = list()
+    monkeypatch.setattr(MODULE, "supports",
+                        lambda capability: capability == Capability.callback)
+    monkeypatch.setattr(MODULE, "register_event_notification",
+                        relays.append)
+    monkeypatch.setattr(MODULE, "unset_event_notification",
+                        lambda: None)
+    seen = list()
+    watcher = watch_jobs([Job("1", "s")],
+                         lambda *args: seen.append(args))
+    # As event_callback passes them along from a Notification.
+    relays[0]("new_state", "1", "s", "running")
+    relays[0]("new_state", "2", "s", "done")
+    watcher.stop()
+    assert seen == [(Event.new_state, "1", "s", JState.running)]
+
+
+class Notifier:
+    """Keeps only a weak reference to the callback, as the library
+    keeps only its address."""
+    def __init__(self):
+        self.registered = None
+
+    def drmaa2_register_event_notification(self, callback_ptr):
+        self.registered = weakref.ref(callback_ptr)
+        return 0
+
+
+def test_registered_callback_stays_alive(monkeypatch):
+    notifier = Notifier()
+    monkeypatch.setattr(wrapping, "DRMAA_LIB", notifier)
+    monkeypatch.setattr(atexit, "register", lambda function: None)
+    monkeypatch.setattr(MODULE, "supports",
+                        lambda capability: capability == Capability.callback)
+    watcher = watch_jobs([Job("1", "s")], lambda *args: None)
+    first = notifier.registered
+    gc.collect()
+    assert first() is not None
+    watcher.stop()
+    gc.collect()
+    assert first() is None
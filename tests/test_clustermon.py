@@ -0,0 +1,31 @@
+import io
+import json
+from drmaa2.clustermon import batch_parser, write_rows
+
+
+def rows(cnt, seen):
+    for idx in range(cnt):
+        seen.append(idx)
+        yield dict(id=str(idx), session="s")
+
+
+def test_write_rows_streams():
+    seen = list()
+    out = io.StringIO()
+    write_rows(rows(3, seen), "ndjson", out)
+    lines = out.getvalue().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["0", "1", "2"]
+
+    out = io.StringIO()
+    write_rows(rows(3, list()), "json", out)
+    assert len(json.loads(out.getvalue())) == 3
+    out = io.StringIO()
+    write_rows(rows(0, list()), "json", out)
+    assert json.loads(out.getvalue()) == []
+
+
+def test_batch_arguments():
+    args = batch_parser().parse_args(["jobs", "--session", "x", "--ndjson"])
+    assert args.session == "x" and args.style == "ndjson"
+    assert batch_parser().parse_args([]).command is None
+    assert batch_parser().parse_args(["sessions"]).style == "text"
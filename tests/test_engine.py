@@ -0,0 +1,63 @@
+import sys
+import types
+import pytest
+from drmaa2 import ListType
+from drmaa2.engine import CffiEngine, load_engine
+from drmaa2.simulator import simulate
+from drmaa2.wrapping import DRMAA2List
+
+
+def test_engine_falls_back_to_ctypes(monkeypatch):
+    assert load_engine("ctypes").name == "ctypes"
+    monkeypatch.setenv("DRMAA2_ENGINE", "ctypes")
+    assert load_engine().name == "ctypes"
+    try:
+        from drmaa2 import _drmaa2_cffi
+    except ImportError:
+        assert load_engine("cffi").name == "ctypes"
+    with pytest.raises(ValueError):
+        load_engine("fortran")
+
+
+def test_simulator_never_gets_cffi(monkeypatch):
+    built = types.ModuleType("drmaa2._drmaa2_cffi")
+    built.ffi = built.lib = None
+    monkeypatch.setitem(sys.modules, "drmaa2._drmaa2_cffi", built)
+    with simulate():
+        assert load_engine("cffi").name == "ctypes"
+
+
+def test_ctypes_reads_as_you_iterate():
+    with simulate() as simulator:
+        names = DRMAA2List([str(idx) for idx in range(1000)],
+                           ListType.stringlist)
+        entries = iter(names)
+        before = simulator.calls["drmaa2_list_get"]
+        assert next(entries) == "0"
+        assert simulator.calls["drmaa2_list_get"] == before + 1
+        assert list(entries)[-1] == "999"
+        names.__del__()
+
+
+def test_cffi_reads_in_blocks():
+    asked = list()
+
+    def addresses(native, start, out, count):
+        asked.append(count)
+        written = max(min(count, 10000 - start), 0)
+        for idx in range(written):
+            out[idx] = start + idx + 1
+        return written
+
+    built = types.SimpleNamespace(
+        ffi=types.SimpleNamespace(
+            cast=lambda kind, value: value,
+            new=lambda kind, size: [0] * size,
+            unpack=lambda out, written: out[:written]),
+        lib=types.SimpleNamespace(
+            drmaa2_list_size=lambda native: 10000,
+            drmaa2py_list_addresses=addresses))
+    engine = CffiEngine(built)
+    assert list(engine.list_addresses(1)) == list(range(1, 10001))
+    assert max(asked) == engine.block_size
+    assert len(asked) == -(-10000 // engine.block_size)
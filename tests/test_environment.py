@@ -0,0 +1,53 @@
+from drmaa2 import JobTemplate, Environment, register_environment
+from drmaa2.wrapping import ENVIRONMENTS
+from drmaa2.simulator import simulate
+
+
+def test_sets_only_changes():
+    variables = {"VAR{}".format(idx): str(idx) for idx in range(200)}
+    with simulate() as simulator:
+        job_template = JobTemplate()
+        job_template.jobEnvironment = variables
+        assert simulator.calls["drmaa2_dict_set"] == 200
+        simulator.calls.clear()
+
+        changed = dict(variables, VAR3="changed", EXTRA="1")
+        del changed["VAR7"]
+        job_template.jobEnvironment = changed
+        assert simulator.calls["drmaa2_dict_set"] == 2
+        assert simulator.calls["drmaa2_dict_del"] == 1
+        assert "drmaa2_dict_list" not in simulator.calls
+        assert job_template.jobEnvironment == changed
+        del job_template
+
+
+def test_shared_baseline():
+    with simulate() as simulator:
+        baseline = register_environment("test", {"HOME": "/home/me"})
+        first = JobTemplate()
+        second = JobTemplate()
+        simulator.calls.clear()
+        first.jobEnvironment = baseline
+        second.jobEnvironment = baseline
+        assert "drmaa2_dict_set" not in simulator.calls
+        assert (first._wrapped.contents.jobEnvironment ==
+                second._wrapped.contents.jobEnvironment)
+        assert second.jobEnvironment == {"HOME": "/home/me"}
+
+        # A change on one template doesn't touch the shared dict.
+        second.jobEnvironment = baseline.updated(TASK="2")
+        assert second.jobEnvironment == {"HOME": "/home/me", "TASK": "2"}
+        assert first.jobEnvironment == {"HOME": "/home/me"}
+        assert dict(baseline) == {"HOME": "/home/me"}
+        simulator.calls.clear()
+        second.jobEnvironment = baseline.updated(TASK="3")
+        assert simulator.calls["drmaa2_dict_set"] == 1
+        del first, second, baseline, ENVIRONMENTS["test"]
+
+
+def test_environment_defaults_to_process(monkeypatch):
+    monkeypatch.setenv("DRMAA2_TEST_VARIABLE", "present")
+    with simulate():
+        environment = Environment()
+        assert environment["DRMAA2_TEST_VARIABLE"] == "present"
+        del environment
@@ -0,0 +1,48 @@
+from drmaa2 import job_info
+from drmaa2.federation import Cluster, ClusterLoad, FederatedSession
+from drmaa2.simulator import Simulator
+
+
+def test_routes_by_depth(sleeper):
+    loads = {"east": ClusterLoad(0, 5, 10, 10),
+             "west": ClusterLoad(0, 2, 10, 10)}
+    clusters = [Cluster("east", library=Simulator()),
+                Cluster("west", library=Simulator())]
+    federation = FederatedSession(
+        clusters, route="depth", measure=lambda c: loads[c.name],
+        clock=lambda: 0)
+    with federation, clusters[0].active():
+        job_template = sleeper(10)
+        routed = [federation.run(job_template).cluster for idx in range(6)]
+        del job_template
+    # West catches up with east after three jobs, then ties go east.
+    assert routed == ["west", "west", "west", "east", "west", "east"]
+
+
+def test_spreads_and_waits_across_clusters(sleeper):
+    clusters = [Cluster("small", library=Simulator(queues={"all.q": 1})),
+                Cluster("large", library=Simulator(queues={"all.q": 8}))]
+    with FederatedSession(clusters) as federation:
+        with clusters[0].active():
+            job_template = sleeper(60)
+            jobs = [federation.run(job_template) for idx in range(10)]
+            del job_template
+        assert sum(1 for job in jobs if job.cluster == "large") == 8
+        # Outside of active, each session uses its own cluster's library.
+        finished = list()
+        while len(finished) < len(jobs):
+            done = federation.wait_any_terminated(how_long="infinite")
+            finished.append(done)
+            library = federation.clusters[done.cluster].library
+            assert job_info(done.job, library).jobState == "done"
+        assert sorted(finished) == sorted(jobs)
+        assert federation.wait_any_terminated(how_long="zero") is None
+        assert federation.runtime["large"] == 60
+        assert federation.wait_any_terminated(jobs[:1], "zero") == jobs[0]
+
+
+def test_wait_times_out(sleeper):
+    clusters = [Cluster("only", library=Simulator())]
+    with FederatedSession(clusters) as federation, clusters[0].active():
+        job = federation.run(sleeper(60))
+        assert federation.wait_any_terminated([job], "zero") is None
@@ -0,0 +1,64 @@
+import logging
+import threading
+import time
+import pytest
+import drmaa2
+
+
+LOGGER = logging.getLogger("test_governor")
+
+
+class SlowSession:
+    """Stands in for a JobSession so we can watch the governor."""
+    def __init__(self, delay, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.concurrent = 0
+        self.most_concurrent = 0
+        self.lock = threading.Lock()
+
+    def run(self, job_template):
+        with self.lock:
+            self.concurrent += 1
+            self.most_concurrent = max(self.most_concurrent, self.concurrent)
+        time.sleep(self.delay)
+        with self.lock:
+            self.concurrent -= 1
+        if self.fail:
+            raise RuntimeError("qmaster says no")
+        return drmaa2.Job(str(job_template), "governed")
+
+
+def test_governor_grows_when_fast():
+    logging.basicConfig(level=logging.DEBUG)
+    governor = drmaa2.SubmissionGovernor(
+        SlowSession(0), initial_limit=2, max_limit=10)
+    for idx in range(50):
+        assert governor.run(idx) == drmaa2.Job(str(idx), "governed")
+    assert governor.limit > 2
+    assert governor.error_rate == 0
+    assert set(governor.latency_percentiles()) == {50, 90, 99}
+
+
+def test_governor_backs_off_on_error():
+    governor = drmaa2.SubmissionGovernor(SlowSession(0, fail=True),
+                                         initial_limit=8)
+    with pytest.raises(RuntimeError):
+        governor.run("template")
+    assert governor.limit == 4
+    assert governor.error_rate == 1
+
+
+def test_governor_limits_concurrency():
+    session = SlowSession(0.05)
+    governor = drmaa2.SubmissionGovernor(
+        session, initial_limit=3, max_limit=3, latency_target=10)
+    threads = [threading.Thread(target=governor.run, args=(idx,))
+               for idx in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert session.most_concurrent <= 3
+    assert governor.queue_depth == 0
+    assert governor.in_flight == 0
@@ -1,3 +1,4 @@
+import ctypes
 import drmaa2
 import logging
 import pytest
@@ -52,3 +53,100 @@ def test_job_list():
     job_list = drmaa2.DRMAA2List(jobs, "joblist")
     assert len(jobs) == len(job_list)
     assert jobs[3] == job_list[3]
+
+
+def test_list_slice_and_index():
+    logging.basicConfig(level=logging.DEBUG)
+    a = ["hi", "there", "bob", "hi"]
+    l = drmaa2.DRMAA2List(a, indexed=True)
+    assert l[-1] == "hi"
+    assert l[1:3] == ["there", "bob"]
+    assert l[::-1] == a[::-1]
+    assert "bob" in l
+    assert "alice" not in l
+    assert l.index("hi") == 0
+    l.append("alice")
+    assert "alice" in l
+    assert len(l) == 5
+    del l[0]
+    assert len(l) == 4
+    assert l.index("hi") == 2
+
+
+def test_list_pins_each_entry():
+    job = drmaa2.Job("123", "hi")
+    jobs = drmaa2.DRMAA2List([], "joblist", indexed=True)
+    jobs.append(job)
+    jobs.append(drmaa2.Job("124", "hi"))
+    jobs.append(job)
+    assert len(jobs._appended) == 3
+    jobs.remove(job)
+    # The copy that moved into the first slot keeps its own memory.
+    assert len(jobs._appended) == 2
+    assert list(jobs) == [job, drmaa2.Job("124", "hi")]
+    del jobs[1]
+    assert list(jobs) == [job]
+    assert list(jobs._appended) == [0]
+
+
+def test_intern_table():
+    table = drmaa2.wrapping.InternTable(max_size=2)
+    a = table.from_bytes(b"session")
+    b = table.from_bytes("session".encode())
+    assert a == "session"
+    assert a is b
+    raw = ctypes.create_string_buffer(b"queue")
+    assert table.from_address(ctypes.addressof(raw)) == "queue"
+    assert table.from_address(None) is None
+    table.from_bytes(b"owner")
+    assert len(table) == 2
+    assert drmaa2.wrapping.from_address(ctypes.addressof(raw)) == "queue"
+
+
+def test_job_pack():
+    jobs = [drmaa2.Job(str(i), "hi") for i in range(123, 127)]
+    jobs.append(drmaa2.Job("7", "höwdy"))
+    pin, addresses = drmaa2.session.JobStrategy.pack(jobs)
+    assert len(addresses) == len(jobs)
+    unpacked = [drmaa2.session.JobStrategy.from_void(a) for a in addresses]
+    assert unpacked == jobs
+    assert drmaa2.session.JobStrategy.pack([]) == ([], [])
+
+
+def test_structure_hash():
+    a = drmaa2.interface.DRMAA2_J()
+    a.id = b"123"
+    a.sessionName = b"hi"
+    b = drmaa2.interface.DRMAA2_J()
+    b.id = "123".encode()
+    b.sessionName = "hi".encode()
+    assert a == b
+    assert hash(a) == hash(b)
+    assert hash(a) == hash(drmaa2.Job("123", "hi"))
+    assert len({a, b}) == 1
+    b.sessionName = None
+    assert a != b
+    assert b != a
+
+
+def test_nested_compare():
+    a = drmaa2.interface.DRMAA2_MACHINEINFO()
+    b = drmaa2.interface.DRMAA2_MACHINEINFO()
+    assert a == b
+    a.name = b"node1"
+    assert a != b
+    b.name = b"node1"
+    a.load = 1.5
+    assert a != b
+    b.load = 1.5
+    assert a == b
+    assert hash(a) == hash(b)
+    version = drmaa2.interface.DRMAA2_VERSION()
+    version.major = b"3"
+    a.machineOSVersion = ctypes.pointer(version)
+    assert a != b
+    assert hash(a) != hash(b)
+    b.machineOSVersion = ctypes.pointer(version)
+    assert a == b
+    assert hash(a) == hash(b)
+    assert a.machineOSVersion.contents.major.value == b"3"
@@ -134,3 +134,33 @@ def test_wait_terminated():
             returned.append(job)
             LOGGER.debug("completed: {}".format(returned[-1]))
         assert returned[0] != returned[1]
+
+
+def test_map_window():
+    logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
+    with drmaa2.JobSession() as js:
+        jt = drmaa2.JobTemplate()
+        jt.remoteCommand = Path("/bin/sleep")
+
+        def templates():
+            for idx in range(5):
+                jt.args = [str(idx % 3)]
+                yield jt
+
+        returned = list(js.map(templates(), window=2, ordered=True))
+        assert [position for (position, job) in returned] == list(range(5))
+        assert len({job.id for (position, job) in returned}) == 5
+
+
+def test_stream_jobs():
+    logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
+    with drmaa2.JobSession() as js:
+        jt = drmaa2.JobTemplate()
+        jt.remoteCommand = Path("/bin/true")
+        submitted = {js.run(jt).id for idx in range(5)}
+        assert {job.id for job in js.jobs()} == submitted
+        chunks = list(js.jobs(chunk_size=2))
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        partial = js.jobs()
+        next(partial)
+        partial.close()
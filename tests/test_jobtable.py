@@ -0,0 +1,71 @@
+from drmaa2 import Job, JobSession, JobTemplate, JState
+from drmaa2.jobtable import JobTable
+from drmaa2.interface import using_library
+from drmaa2.simulator import Simulator, simulate
+
+
+def test_add_and_find():
+    table = JobTable()
+    rows = table.extend(Job(str(idx), "s{}".format(idx % 3))
+                        for idx in range(1, 5001))
+    assert rows == list(range(5000))
+    assert table.add(Job("17", "s2")) == 16
+    assert len(table) == 5000
+    assert table.row("4000") == 3999
+    assert table.job(3999) == Job("4000", "s1")
+    assert Job("5001", "s0") not in table
+    assert "abc" not in table
+    assert table.session_names == ["s1", "s2", "s0"]
+    table.add(Job("7.3", "s1"))
+    assert table.job(table.row("7.3")) == Job("7.3", "s1")
+    assert table.row("7") == 6
+    assert table.nbytes < 60 * len(table)
+
+
+def test_states():
+    table = JobTable()
+    table.extend((Job(str(idx), "s") for idx in range(100)), JState.queued)
+    assert table.state(5) == JState.queued
+    table.set_state(range(10, 20), JState.running)
+    table.set_state(3, JState.failed, exit_status=2)
+    assert table.count(JState.queued) == 89
+    assert table.count(JState.running, JState.failed) == 11
+    assert list(table.rows_in(JState.failed, JState.running)) == \
+        [3] + list(range(10, 20))
+    assert table.exit_status[3] == 2
+    assert table.exit_status[4] == -1
+
+
+def test_refresh_and_wait():
+    with simulate(queues={"all.q": 2}) as simulator:
+        with JobSession() as session:
+            job_template = JobTemplate()
+            job_template.remoteCommand = "/bin/sleep"
+            job_template.args = ["10"]
+            table = JobTable()
+            for idx in range(5):
+                table.add(session.run(job_template), JState.queued)
+            assert table.refresh(session) == 2
+            assert table.count(JState.running) == 2
+            waiting = table.joblist(table.rows_in(JState.running))
+            done = session.wait_any_terminated(waiting, "infinite")
+            assert table.row(done) in (0, 1)
+            table.refresh(session)
+            assert table.state(table.row(done)) == JState.done
+            del waiting, job_template
+
+
+def test_session_in_another_cell(sleeper):
+    library = Simulator(queues={"all.q": 1})
+    with JobSession(library=library) as session:
+        with using_library(library):
+            job_template = sleeper(10)
+            table = JobTable()
+            for idx in range(2):
+                table.add(session.run(job_template), JState.queued)
+            del job_template
+        assert table.refresh(session) == 1
+        waiting = table.joblist(table.rows_in(JState.running),
+                                library=session.library)
+        assert table.row(session.wait_any_terminated(waiting, "infinite")) == 0
+        del waiting
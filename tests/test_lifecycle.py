@@ -0,0 +1,57 @@
+import random
+from drmaa2 import Job, Lifecycle, QuantileSketch
+
+
+def test_sketch_accuracy_and_size():
+    generator = random.Random(3)
+    values = [generator.lognormvariate(3, 1.5) for idx in range(20000)]
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    values.sort()
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= 0.011 * exact
+    small = QuantileSketch(relative_accuracy=0.01, max_buckets=50)
+    for value in values:
+        small.add(value)
+    assert len(small._buckets) <= 50
+    # Collapsing loses the low end, not the high end.
+    assert abs(small.quantile(1) - values[-1]) <= 0.011 * values[-1]
+    other = QuantileSketch(relative_accuracy=0.01)
+    other.add(0)
+    sketch.merge(other)
+    assert sketch.count == 20001 and sketch.quantile(0) == 0
+
+
+class Session:
+    name = "s"
+
+    def run(self, template):
+        return Job("7", "s")
+
+
+class Template:
+    jobCategory = "render"
+
+
+class Info:
+    submissionTime = 100
+    dispatchTime = 160
+    finishTime = 260
+    cpuTime = 150
+    wallclockTime = 100
+    slots = 2
+    queueName = "all.q"
+
+
+def test_lifecycle_groups():
+    lifecycle = Lifecycle()
+    job = lifecycle.run(Session(), Template())
+    lifecycle.observe(job, Info())
+    summary = lifecycle.summary(quantiles=(0.5,))
+    category = summary[("category", "render")]
+    assert category["submit_latency"]["count"] == 1
+    assert abs(category["queue_wait"][0.5] - 60) < 1
+    assert abs(summary[("queue", "all.q")]["run_time"][0.5] - 100) < 1
+    assert abs(summary[("session", "s")]["cpu_efficiency"][0.5] - 0.75) < 0.01
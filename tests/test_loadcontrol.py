@@ -0,0 +1,93 @@
+from drmaa2 import JobSession, JState, MonitoringSession, job_info, job_state
+from drmaa2.interface import using_library
+from drmaa2.loadcontrol import LoadController
+from drmaa2.simulator import Simulator, simulate
+
+
+def test_suspends_and_resumes_with_hysteresis(sleeper):
+    # Two machines of four cores, where the simulator puts jobs with
+    # odd IDs on sim0.
+    loads = {"sim0": 1.5, "sim1": 0.2}
+    with simulate(queues={"all.q": 8}, machines=2) as simulator:
+        with JobSession("interactive") as interactive, \
+                JobSession("backfill") as backfill, \
+                MonitoringSession() as monitor:
+            job_template = sleeper(1000)
+            mine = interactive.run(job_template)
+            jobs = [backfill.run(job_template) for idx in range(4)]
+            del job_template
+            controller = LoadController(
+                monitor, [backfill], high=1.0, low=0.5, cooldown=0,
+                load_of=lambda machine: loads[machine.name])
+            assert controller.step() == (2, 0)
+            states = [job_state(job) for job in jobs]
+            assert states == [JState.running, JState.suspended] * 2
+            assert job_state(mine) == JState.running
+
+            loads["sim0"] = 0.8
+            assert controller.step() == (0, 0)
+            assert "sim0" in controller.overloaded
+            loads["sim0"] = 0.3
+            assert controller.step() == (0, 2)
+            assert all(job_state(job) == JState.running for job in jobs)
+            assert not controller.suspended
+
+
+def test_batches_and_cooldown(sleeper):
+    loads = {"sim0": 3.0}
+    now = [0]
+    with simulate(queues={"all.q": 4}) as simulator:
+        with JobSession() as backfill, MonitoringSession() as monitor:
+            job_template = sleeper(1000)
+            jobs = [backfill.run(job_template) for idx in range(4)]
+            del job_template
+            controller = LoadController(
+                monitor, [backfill], high=1.0, low=0.5, batch_size=2,
+                cooldown=10, load_of=lambda machine: loads[machine.name],
+                clock=lambda: now[0])
+            assert controller.step() == (2, 0)
+            assert controller.step() == (0, 0)
+            now[0] = 10
+            assert controller.step() == (2, 0)
+            assert controller.resume_all() == 4
+            assert all(job_state(job) == JState.running for job in jobs)
+
+
+def test_resumes_on_missing_machines(sleeper):
+    loads = {"sim0": 0.2, "sim1": 1.5}
+    with simulate(queues={"all.q": 8}, machines=2) as simulator:
+        with JobSession() as backfill, MonitoringSession() as monitor:
+            job_template = sleeper(1000)
+            jobs = [backfill.run(job_template) for idx in range(4)]
+            del job_template
+            controller = LoadController(
+                monitor, [backfill], high=1.0, low=0.5, cooldown=1000,
+                load_of=lambda machine: loads[machine.name])
+            assert controller.step() == (2, 0)
+            assert "sim1" in controller.suspended
+            # sim1 leaves the snapshot while still in its cooldown.
+            simulator.machine_cnt = 1
+            assert controller.step() == (0, 2)
+            assert all(job_state(job) == JState.running for job in jobs)
+            assert not controller.suspended
+            assert not controller.overloaded
+
+
+def test_acts_through_each_session_library(sleeper):
+    library = Simulator(queues={"all.q": 2})
+    loads = {"sim0": 3.0}
+    with JobSession(library=library) as backfill, \
+            MonitoringSession(library=library) as monitor:
+        with using_library(library):
+            job_template = sleeper(1000)
+            jobs = [backfill.run(job_template) for idx in range(2)]
+            del job_template
+        controller = LoadController(
+            monitor, [backfill], high=1.0, low=0.5, cooldown=0,
+            load_of=lambda machine: loads[machine.name])
+        assert controller.step() == (2, 0)
+        states = {job_info(job, library).jobState for job in jobs}
+        assert states == {JState.suspended.name}
+        assert controller.resume_all() == 2
+        states = {job_info(job, library).jobState for job in jobs}
+        assert states == {JState.running.name}
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import threading
+import time
+from pathlib import Path
+import drmaa2
+from drmaa2.output import resolve_path
+
+
+LOGGER = logging.getLogger("test_output")
+
+
+class Template:
+    """Has the attributes of a JobTemplate that JobHandle reads."""
+    def __init__(self, **kwargs):
+        self.outputPath = None
+        self.errorPath = None
+        self.workingDirectory = None
+        self.jobName = None
+        self.remoteCommand = "/bin/echo"
+        self.joinFiles = False
+        self.__dict__.update(kwargs)
+
+
+class FinishedHandle(drmaa2.JobHandle):
+    done = False
+
+    def finished(self):
+        return self.done
+
+
+def test_resolve_path():
+    path = resolve_path("$DRMAA2_HOME_DIR$/out.$DRMAA2_INDEX$",
+                        index=3, home="/home/me")
+    assert path == Path("/home/me/out.3")
+    path = resolve_path("node1:$DRMAA2_WORKING_DIR$/o", "/scratch/w")
+    assert path == Path("/scratch/w/o")
+    assert resolve_path("rel/o", "/scratch/w") == Path("/scratch/w/rel/o")
+
+
+def test_output_and_harvest(tmp_path):
+    template = Template(workingDirectory=str(tmp_path),
+                        outputPath="out.$DRMAA2_INDEX$", joinFiles=True)
+    handle = drmaa2.JobHandle(drmaa2.Job("12", "s"), template)
+    tasks = handle.tasks(range(1, 4))
+    for task in tasks[:2]:
+        task.output_path().write_bytes("task {}".format(task.index).encode())
+    tasks[0].output_path().write_bytes(b"")
+    results = list(drmaa2.harvest(tasks))
+    assert bytes(results[0][1]) == b""
+    assert bytes(results[1][1]) == b"task 2"
+    assert isinstance(results[2][1], FileNotFoundError)
+    assert tasks[1].error_path() == tasks[1].output_path()
+
+
+def test_harvest_reads_ahead_boundedly(tmp_path):
+    template = Template(outputPath=str(tmp_path / "out.$DRMAA2_INDEX$"))
+    handle = drmaa2.JobHandle(drmaa2.Job("12", "s"), template)
+    taken = list()
+
+    def tasks():
+        for task in handle.tasks(range(1, 101)):
+            taken.append(task)
+            yield task
+
+    results = drmaa2.harvest(tasks(), max_workers=4)
+    next(results)
+    assert len(taken) <= 5
+    assert len(list(results)) == 99
+
+
+def test_default_output_name():
+    handle = drmaa2.JobHandle(drmaa2.Job("12", "s"), Template())
+    assert handle.output_path().name == "echo.o12"
+    assert handle.error_path().name == "echo.e12"
+
+
+def test_tail(tmp_path):
+    template = Template(outputPath=str(tmp_path / "running"))
+    handle = FinishedHandle(drmaa2.Job("12", "s"), template)
+
+    def write():
+        with open(str(tmp_path / "running"), "wb") as out:
+            for idx in range(3):
+                out.write("line {}\n".format(idx).encode())
+                out.flush()
+                time.sleep(0.05)
+        handle.done = True
+
+    async def follow():
+        return [chunk async for chunk in handle.tail(poll_interval=0.05)]
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    chunks = asyncio.new_event_loop().run_until_complete(follow())
+    writer.join()
+    assert b"".join(chunks) == b"line 0\nline 1\nline 2\n"
+
+
+def test_default_task_name():
+    handle = drmaa2.JobHandle(drmaa2.Job("12", "s"), Template(jobName="fit"))
+    assert handle.tasks([4])[0].output_path().name == "fit.o12.4"
@@ -0,0 +1,100 @@
+import pytest
+from drmaa2 import (DRMAA2Exception, JobSession, JState,
+                    job_info, job_state, job_suspend)
+from drmaa2.packer import ReservationPacker, plan
+from drmaa2.reservation import ReservationSession, ReservationTemplate
+from drmaa2.simulator import simulate
+
+
+def test_plan_longest_first():
+    chosen, makespan = plan([1, 5, 2, 4, 3], 2)
+    assert chosen == [1, 3, 4, 2, 0]
+    assert makespan == 8
+    chosen, makespan = plan([10, 10, 10, 30], 2, max_duration=20)
+    assert chosen == [0, 1, 2]
+    assert makespan == 20
+
+
+def test_reservation_holds_slots(sleeper):
+    with simulate(queues={"all.q": 4}) as simulator:
+        with ReservationSession() as rs, JobSession() as js:
+            request = ReservationTemplate()
+            request.minSlots = 3
+            request.duration = 600
+            reservation = rs.request(request)
+            del request
+            info = reservation.info()
+            assert info.reservedSlots == 3
+            assert (info.reservedEndTime - info.reservedStartTime
+                    ).total_seconds() == 600
+            outside = js.run(sleeper(10))
+            second = js.run(sleeper(10))
+            assert job_state(second) == JState.queued
+            reservation.terminate()
+            assert job_state(second) == JState.running
+            del outside
+
+
+def test_packs_backlog_and_releases(sleeper):
+    work = [60, 120, 60, 60, 120, 60]
+    with simulate(queues={"all.q": 8},
+                  capabilities=["advance_reservation"]) as simulator:
+        with JobSession() as js, ReservationPacker(js, slots=2) as packer:
+            # Someone else's job fills the rest of the queue.
+            crowd = js.run(sleeper(10000))
+            start = simulator.now
+            for seconds in work:
+                job_template = sleeper(seconds)
+                packer.add(job_template, seconds)
+                del job_template
+            finished = list(packer.run())
+            assert len(finished) == len(work)
+            assert simulator.now - start == 240
+            assert packer.blocks == 1
+            assert packer.reservation is None
+            info = job_info(finished[0][1])
+            assert info.queueName == "all.q"
+            del info
+            assert simulator._free[0] == 7
+            del crowd
+
+
+class Suspending:
+    """A JobSession whose jobs are suspended as soon as they start."""
+    def __init__(self, session):
+        self.session = session
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def run(self, job_template):
+        job = self.session.run(job_template)
+        job_suspend(job)
+        return job
+
+
+def test_limits_and_failed_waits(sleeper):
+    with simulate(queues={"all.q": 4},
+                  capabilities=["advance_reservation"]) as simulator:
+        with JobSession() as js:
+            packer = ReservationPacker(js, slots=2, max_duration=100,
+                                       margin=2)
+            with pytest.raises(ValueError):
+                packer.add(sleeper(101), 101)
+            packer.add(sleeper(60), 60)
+            packer.submit_block()
+            assert (packer.reservation.info().reservedEndTime -
+                    packer.reservation.info().reservedStartTime
+                    ).total_seconds() == 100
+            packer.close()
+
+            # Timeouts are retried, other failures raise.
+            packer = ReservationPacker(js, slots=1)
+            packer.add(sleeper(10), 10)
+            assert len(list(packer.run(how_long=3))) == 1
+            packer.close()
+            packer = ReservationPacker(Suspending(js), slots=1)
+            packer.add(sleeper(10), 10)
+            with pytest.raises(DRMAA2Exception):
+                list(packer.run())
+            packer.close()
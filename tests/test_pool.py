@@ -0,0 +1,91 @@
+import threading
+import time
+import pytest
+import drmaa2
+from drmaa2.pool import SessionPool
+
+
+class FakeSession:
+    def __init__(self, name):
+        self.name = name
+        self._open = True
+        self.good = True
+
+    def close(self):
+        self._open = False
+
+    def __del__(self):
+        pass
+
+
+def make_pool(**kwargs):
+    opened = list()
+
+    def opener(name):
+        opened.append(FakeSession(name))
+        return opened[-1]
+
+    pool = SessionPool("test", opener=opener,
+                       check=lambda s: s._open and s.good, **kwargs)
+    return pool, opened
+
+
+def test_lease_reuses_warm_session():
+    pool, opened = make_pool(size=2)
+    with pool.lease() as js:
+        first = js
+        assert pool.leased == 1
+    with pool.lease() as js:
+        assert js is first
+    assert [s.name for s in opened] == ["test-0"]
+    pool.prewarm()
+    assert pool.open_count == 2
+    pool.close()
+    assert not any(s._open for s in opened)
+    with pytest.raises(RuntimeError):
+        with pool.lease():
+            pass
+
+
+def test_lease_blocks_and_times_out():
+    pool, opened = make_pool(size=1)
+    with pool.lease():
+        with pytest.raises(TimeoutError):
+            with pool.lease(timeout=0.01):
+                pass
+        done = list()
+
+        def borrow():
+            with pool.lease() as js:
+                done.append(js)
+
+        thread = threading.Thread(target=borrow)
+        thread.start()
+        time.sleep(0.01)
+        assert not done
+    thread.join()
+    assert done == opened
+
+
+def test_unhealthy_and_idle_sessions_replaced():
+    pool, opened = make_pool(size=1, check_after=0)
+    with pytest.raises(drmaa2.DRMAA2Exception):
+        with pool.lease() as js:
+            js.good = False
+            raise drmaa2.DRMAA2Exception("lost")
+    assert not opened[0]._open
+    with pytest.raises(RuntimeError):
+        with pool.lease() as js:
+            assert js is opened[1]
+            js.good = False
+            raise RuntimeError("No job returned")
+    assert not opened[1]._open
+    with pool.lease() as js:
+        js.good = False
+    time.sleep(0.001)
+    with pool.lease() as js:
+        assert js is opened[3]
+    pool.ttl = 0
+    time.sleep(0.001)
+    assert pool.reap() == 1
+    assert pool.open_count == 0
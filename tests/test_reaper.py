@@ -0,0 +1,92 @@
+import csv
+import time
+from drmaa2 import JobSession
+from drmaa2.interface import using_library
+from drmaa2.reaper import Reaper
+from drmaa2.simulator import Simulator, simulate
+
+
+def test_reaps_beyond_count_and_journals(tmp_path, sleeper):
+    journal = tmp_path / "reaped.csv"
+    with simulate(queues={"all.q": 1}) as simulator:
+        with JobSession() as session:
+            job_template = sleeper(10)
+            jobs = [session.run(job_template) for idx in range(5)]
+            del job_template
+            for job in jobs:
+                session.wait_any_terminated([job], "infinite")
+            reaper = Reaper(session, keep=2, journal=str(journal))
+            assert reaper.reap_once() == 0
+            reaper.consume(*jobs)
+            assert reaper.reap_once() == 3
+            assert [job.id for job in session.jobs()] == \
+                [job.id for job in jobs[3:]]
+            assert reaper.reap_once() == 0
+            assert reaper.info(jobs[0].id)["wallclockTime"] == 10
+            assert reaper.info(jobs[0].id)["jobState"] == "done"
+    with open(str(journal)) as lines:
+        rows = list(csv.DictReader(lines))
+    # Kept jobs are journaled once, when first collected.
+    assert [row["jobId"] for row in rows] == [job.id for job in jobs]
+
+
+def test_reaps_by_age(sleeper):
+    with simulate(queues={"all.q": 4}) as simulator:
+        with JobSession() as session:
+            jobs = [session.run(sleeper(seconds)) for seconds in (10, 100)]
+            reaper = Reaper(session, keep=None, max_age=50,
+                            clock=lambda: simulator.now)
+            reaper.consume(*jobs)
+            session.wait_any_terminated(jobs, "infinite")
+            assert reaper.reap_once() == 0
+            session.wait_any_terminated(jobs[1:], "infinite")
+            assert reaper.reap_once() == 1
+            assert [job.id for job in session.jobs()] == [jobs[1].id]
+
+
+def test_reaps_only_what_a_wait_returned(sleeper):
+    with simulate(queues={"all.q": 2}) as simulator:
+        with JobSession() as session:
+            first = session.run(sleeper(10))
+            second = session.run(sleeper(20))
+            reaper = session.start_reaper(keep=None, interval=3600)
+            assert session.wait_any_terminated([second], 15) is None
+            # The first job ended, but no wait has returned it.
+            assert reaper.reap_once() == 0
+            assert session.wait_any_terminated(
+                [first, second], "zero") == first
+            assert reaper.reap_once() == 1
+            assert session.wait_any_terminated(
+                [first, second], "infinite") == second
+
+
+def test_background_thread_stops_on_close(sleeper):
+    with simulate() as simulator:
+        with JobSession() as session:
+            job = session.run(sleeper(10))
+            session.wait_any_terminated([job], "infinite")
+            reaper = session.start_reaper(keep=None, interval=0.01)
+            reaper.consume(job)
+            deadline = time.monotonic() + 5
+            while not reaper.reaped and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert reaper.reaped == 1
+        assert session.reaper is None
+        assert reaper._thread is None
+        assert reaper.info(job.id)["exitStatus"] == 0
+
+
+def test_reaps_through_the_session_library(sleeper):
+    library = Simulator(queues={"all.q": 2})
+    with JobSession(library=library) as session:
+        with using_library(library):
+            job_template = sleeper(10)
+            jobs = [session.run(job_template) for idx in range(3)]
+            del job_template
+        for job in jobs:
+            session.wait_any_terminated([job], "infinite")
+        reaper = Reaper(session, keep=None)
+        reaper.consume(*jobs)
+        assert reaper.reap_once() == 3
+        assert reaper.info(jobs[0].id)["allocatedMachines"] == "sim0"
+        assert not list(session.jobs())
@@ -0,0 +1,40 @@
+import logging
+import pickle
+import sys
+import drmaa2
+
+
+LOGGER = logging.getLogger("test_registry")
+
+
+def test_registry_bytes(tmp_path):
+    path = tmp_path / "templates.reg"
+    with drmaa2.TemplateRegistry(path) as registry:
+        key = registry.put_bytes(b'{"remoteCommand":"/bin/true"}')
+        assert registry.put_bytes(b'{"remoteCommand":"/bin/true"}') == key
+        other = registry.put_bytes(b'{"remoteCommand":"/bin/false"}')
+        assert len(registry) == 2
+        with drmaa2.TemplateRegistry(path) as reader:
+            assert bytes(reader.get_bytes(key)) == \
+                b'{"remoteCommand":"/bin/true"}'
+            assert set(reader.keys()) == {key, other}
+        assert other in registry
+
+
+def test_template_round_trip(tmp_path):
+    logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
+    jt = drmaa2.JobTemplate()
+    jt.remoteCommand = "/bin/sleep"
+    jt.args = ["60"]
+    jt.jobEnvironment = {"LIB": "libm"}
+    jt.priority = 0
+    jt.startTime = "now"
+    jt.set_impl_spec("uge_jt_pe", "multi_slot")
+    copy = pickle.loads(pickle.dumps(jt))
+    assert copy.to_bytes() == jt.to_bytes()
+    assert copy.content_hash() == jt.content_hash()
+    assert copy.startTime == "now"
+    with drmaa2.TemplateRegistry(tmp_path / "templates.reg") as registry:
+        key = registry.put(jt)
+        assert key == jt.content_hash()
+        assert registry.get(key).args == ["60"]
@@ -0,0 +1,59 @@
+import threading
+import time
+from drmaa2 import JobSession, JobTemplate, MonitoringSession
+from drmaa2.sessiongc import stale_sessions, collect_sessions
+from drmaa2.simulator import simulate
+
+
+def test_stale_sessions(sleeper):
+    with simulate(queues={"all.q": 10}) as simulator:
+        with JobSession("busy") as busy, \
+                JobSession("finished") as finished, \
+                JobSession("mine") as mine, JobSession("empty"), \
+                MonitoringSession() as monitor:
+            short = busy.run(sleeper(10))
+            busy.run(sleeper(1000))
+            failing = JobTemplate()
+            failing.remoteCommand = "/bin/false"
+            ended = [finished.run(failing), mine.run(sleeper(10))]
+            del failing
+            assert busy.wait_any_terminated([short], "infinite") == short
+            assert finished.wait_any_terminated(ended[:1], "infinite")
+            assert mine.wait_any_terminated(ended[1:], "infinite")
+            names = ["me@busy", "me@finished", "me@mine", "me@empty"]
+            before = simulator.calls["drmaa2_j_get_state"]
+            assert stale_sessions(monitor, names, keep=["mine"]) == [
+                "me@finished"]
+            assert simulator.calls["drmaa2_j_get_state"] == before
+            assert stale_sessions(monitor, names, keep=["mine"],
+                                  include_empty=True) == [
+                "me@finished", "me@empty"]
+
+
+def test_collect_sessions_bounded():
+    lock = threading.Lock()
+    running = [0, 0]
+    destroyed = list()
+
+    def destroy(name):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        if name == "bad":
+            raise RuntimeError("no")
+        destroyed.append(name)
+
+    names = ["me@s{}".format(i) for i in range(20)] + ["bad"]
+    reports = list()
+    dry = collect_sessions(names, dry_run=True, destroy=destroy)
+    assert dry.destroyed == names and not destroyed
+    collected = collect_sessions(
+        names, max_workers=3, destroy=destroy,
+        progress=lambda *args: reports.append(args))
+    assert running[1] <= 3
+    assert sorted(destroyed) == sorted("s{}".format(i) for i in range(20))
+    assert [name for name, err in collected.failed] == ["bad"]
+    assert [r[0] for r in reports] == list(range(1, 22))
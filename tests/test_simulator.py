@@ -0,0 +1,134 @@
+import pytest
+from drmaa2 import interface
+from drmaa2 import (DRMAA2Exception, JobSession, JobTemplate, JState,
+                    MonitoringSession, job_hold, job_info, job_release,
+                    job_state)
+from drmaa2.simulator import simulate, trace_durations
+
+
+def test_run_and_wait(sleeper):
+    with simulate(start_time=1000000) as simulator:
+        with JobSession() as session:
+            job = session.run(sleeper(30))
+            assert job_state(job) == JState.running
+            assert session.wait_any_terminated([job], "infinite") == job
+            assert job_state(job) == JState.done
+            info = job_info(job)
+            assert info.allocatedMachines == ["sim0"]
+            assert info.wallclockTime == 30
+            assert (info.finishTime - info.dispatchTime).total_seconds() == 30
+            del info
+        assert simulator.now == 1000030
+
+
+def test_timeout_advances_clock(sleeper):
+    with simulate() as simulator:
+        with JobSession() as session:
+            job = session.run(sleeper(60))
+            before = simulator.now
+            assert session.wait_any_terminated([job], 5) is None
+            assert simulator.now == before + 5
+            assert job_state(job) == JState.running
+
+
+def test_slots_limit_throughput(sleeper):
+    with simulate(queues={"all.q": 10}, durations={"fit": 60}) as simulator:
+        with JobSession() as session:
+            templates = (sleeper(1, "fit") for idx in range(500))
+            finished = [job for position, job in session.map(templates)]
+        report = simulator.report()
+    assert len(finished) == 500
+    assert report["jobs"] == 500
+    assert report["virtual_seconds"] == 500 / 10 * 60
+    assert report["simulator_cpu"] <= report["process_cpu"]
+    assert report["calls"]["drmaa2_create_jsession"] == 1
+    # Creating a session opens it inside the simulator.
+    assert "drmaa2_open_jsession" not in report["calls"]
+
+
+def test_map_raises_failed_waits(sleeper):
+    with simulate() as simulator:
+        with JobSession() as session:
+            held = sleeper(10)
+            held.submitAsHold = True
+            with pytest.raises(DRMAA2Exception):
+                list(session.map([held]))
+
+
+def test_hold_release_and_failure(sleeper):
+    with simulate() as simulator:
+        with JobSession() as session:
+            held = sleeper(10)
+            held.submitAsHold = True
+            job = session.run(held)
+            assert job_state(job) == JState.queued_held
+            job_release(job)
+            assert job_state(job) == JState.running
+            session.wait_any_terminated([job], "infinite")
+            assert job_state(job) == JState.done
+
+            failing = JobTemplate()
+            failing.remoteCommand = "/bin/false"
+            job = session.run(failing)
+            session.wait_any_terminated([job], "infinite")
+            assert job_state(job) == JState.failed
+
+
+def test_queue_waits_for_slots(sleeper):
+    with simulate(queues={"all.q": 1}) as simulator:
+        with JobSession() as session:
+            first = session.run(sleeper(10))
+            second = session.run(sleeper(10))
+            assert job_state(second) == JState.queued
+            job_hold(second)
+            assert session.wait_any_terminated(
+                [first, second], "infinite") == first
+            assert job_state(second) == JState.queued_held
+            job_release(second)
+            assert job_state(second) == JState.running
+
+
+def test_monitoring(sleeper):
+    with simulate(queues={"all.q": 8}, machines=2) as simulator:
+        with JobSession() as session:
+            jobs = [session.run(sleeper(10)) for idx in range(3)]
+            monitor = MonitoringSession("monitor")
+            assert set(monitor.all_jobs()) == set(jobs)
+            machines = monitor.machines()
+            assert [m.name for m in machines] == ["sim0", "sim1"]
+            assert machines[0].load == 3 / 8
+            assert monitor.queues() == ["all.q"]
+            monitor.close()
+            del monitor
+
+
+def test_restores_library():
+    library = interface.DRMAA_LIB
+    with simulate() as simulator:
+        assert interface.DRMAA_LIB is simulator
+    assert interface.DRMAA_LIB is library
+
+
+def test_trace_replay(tmp_path, sleeper):
+    trace = tmp_path / "accounting.csv"
+    trace.write_text("jobId,dispatchTime,finishTime\n"
+                     "1,100,110\n2,100,,\n3,200,230\n")
+    durations = trace_durations(trace)
+    assert durations == [10, 30]
+    with simulate(queues={"all.q": 1}, durations={"replay": durations}) \
+            as simulator:
+        with JobSession() as session:
+            templates = [sleeper(1, "replay") for idx in range(3)]
+            list(session.map(templates, window=1))
+        assert simulator.report()["virtual_seconds"] == 10 + 30 + 10
+
+
+def test_recreate_destroyed_session(sleeper):
+    with simulate() as simulator:
+        with JobSession("same") as session:
+            session.run(sleeper(10))
+        with JobSession("same") as session, MonitoringSession() as monitor:
+            assert not list(session.jobs())
+            assert not monitor.all_jobs()
+            job = session.run(sleeper(10))
+            assert [found.id for found in monitor.all_jobs()] == [job.id]
@@ -0,0 +1,52 @@
+from drmaa2 import JobSession, JState, MonitoringSession
+from drmaa2.simulator import simulate
+from drmaa2.top import COLUMNS, ClusterTracker, render, changed_rows
+
+
+def test_tracker_lists_each_state_once(sleeper):
+    with simulate(queues={"all.q": 1, "big.q": 4}) as simulator:
+        with JobSession("s1") as s1, MonitoringSession() as monitor:
+            s0 = JobSession("s0")
+            job_template = sleeper(10)
+            first = s0.run(job_template)
+            s1.run(job_template)
+            s1.run(job_template)
+            del job_template
+            tracker = ClusterTracker(monitor, chunk_size=1)
+            calls = simulator.calls
+            before = calls["drmaa2_msession_get_all_jobs"]
+            snapshot = tracker.tick()
+            listed = calls["drmaa2_msession_get_all_jobs"] - before
+            assert listed == len(COLUMNS)
+            assert "drmaa2_j_get_state" not in calls
+            assert "drmaa2_msession_get_all_queues" not in calls
+            assert calls["drmaa2_j_get_info"] == 1
+            assert snapshot.sessions["s0"] == {JState.running: 1}
+            assert snapshot.sessions["s1"] == {JState.queued: 2}
+            assert snapshot.queues == {"all.q": 1}
+            # The queue of a job that is still running is known.
+            tracker.tick()
+            assert calls["drmaa2_j_get_info"] == 1
+            assert s0.wait_any_terminated([first], "infinite") == first
+            snapshot = tracker.tick()
+            assert calls["drmaa2_j_get_info"] == 2
+            assert snapshot.sessions["s0"] == {JState.done: 1}
+            assert snapshot.sessions["s1"][JState.running] == 1
+            assert snapshot.queues == {"all.q": 1}
+            s0.close()
+            s0.__del__()
+            s0.destroy()
+            assert "s0" not in tracker.tick().sessions
+
+
+def test_render_and_changes(sleeper):
+    with simulate(machines=3) as simulator:
+        with JobSession("s") as session, MonitoringSession() as monitor:
+            session.run(sleeper(10))
+            lines = render(ClusterTracker(monitor).tick(),
+                           width=60, height=12)
+    assert len(lines) <= 12
+    assert all(len(line) <= 60 for line in lines)
+    changed = lines[:3] + ["different"] + lines[4:-1]
+    assert changed_rows(lines, changed) == [
+        (3, "different"), (len(lines) - 1, "")]
@@ -0,0 +1,131 @@
+import importlib
+import logging
+from pathlib import Path
+import sys
+import pytest
+import drmaa2
+from drmaa2.simulator import simulate
+
+
+LOGGER = logging.getLogger("test_workflow")
+
+
+def test_frontiers():
+    flow = drmaa2.Workflow()
+    flow.add("plot", "plot template", depends_on=["fit", "load"])
+    flow.add("load", "load template")
+    flow.add("fit", "fit template", depends_on=["load"])
+    flow.add("other", "other template")
+    assert flow.frontiers() == [["load", "other"], ["fit"], ["plot"]]
+
+
+def test_frontiers_cycle():
+    flow = drmaa2.Workflow()
+    flow.add("a", None, depends_on=["b"])
+    flow.add("b", None, depends_on=["a"])
+    with pytest.raises(ValueError):
+        flow.frontiers()
+    flow.add("c", None, depends_on=["missing"])
+    with pytest.raises(ValueError):
+        flow.frontiers()
+
+
+def test_run_workflow():
+    logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
+    with drmaa2.JobSession() as js:
+        good = drmaa2.JobTemplate()
+        good.remoteCommand = Path("/bin/true")
+        bad = drmaa2.JobTemplate()
+        bad.remoteCommand = Path("/bin/false")
+        flow = drmaa2.Workflow()
+        flow.add("first", good)
+        flow.add("second", good, depends_on=["first"])
+        flow.add("broken", bad, depends_on=["first"])
+        flow.add("never", good, depends_on=["broken", "second"])
+        state = flow.run(js)
+        assert state["second"]["state"] == "done"
+        assert state["never"]["state"] == "skipped"
+
+
+class Session:
+    """Runs jobs in a JobSession, the way a test says."""
+    def __init__(self, session, run):
+        self.session = session
+        self.run = lambda template: run(session, template)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def native_holds(monkeypatch):
+    """Pretend the library takes a hold-job list, and record it."""
+    module = importlib.import_module("drmaa2.workflow")
+    holds = list()
+    monkeypatch.setattr(module, "implementation_specific",
+                        lambda checker: ["uge_jt_hold_jid"])
+    monkeypatch.setattr(module, "ext_set",
+                        lambda template, name, value, checker:
+                        holds.append(value))
+    return holds
+
+
+def test_native_hold_cleared_on_error(monkeypatch):
+    holds = native_holds(monkeypatch)
+    with simulate(), drmaa2.JobSession() as js:
+        parent = drmaa2.JobTemplate()
+        parent.remoteCommand = Path("/bin/true")
+        child = drmaa2.JobTemplate()
+        child.remoteCommand = Path("/bin/true")
+
+        def run(session, template):
+            if template is child:
+                raise RuntimeError("refused")
+            return session.run(template)
+
+        flow = drmaa2.Workflow()
+        flow.add("parent", parent)
+        flow.add("child", child, depends_on=["parent"])
+        with pytest.raises(RuntimeError):
+            flow.run(Session(js, run))
+        assert len(holds) == 2 and holds[-1] is None
+
+
+def test_native_skips_child_of_failed_parent(monkeypatch):
+    holds = native_holds(monkeypatch)
+    with simulate(), drmaa2.JobSession() as js:
+        bad = drmaa2.JobTemplate()
+        bad.remoteCommand = Path("/bin/false")
+        good = drmaa2.JobTemplate()
+        good.remoteCommand = Path("/bin/true")
+
+        def run(session, template):
+            # The parent ends before the child is submitted.
+            job = session.run(template)
+            session.wait_any_terminated([job], "infinite")
+            return job
+
+        flow = drmaa2.Workflow()
+        flow.add("broken", bad)
+        flow.add("never", good, depends_on=["broken"])
+        state = flow.run(Session(js, run))
+        assert state["broken"]["state"] == "failed"
+        assert state["never"] == dict(id=None, state="skipped")
+        assert not holds
+
+
+def test_failed_wait_raises(monkeypatch):
+    native_holds(monkeypatch)
+    with simulate(), drmaa2.JobSession() as js:
+        job_template = drmaa2.JobTemplate()
+        job_template.remoteCommand = Path("/bin/true")
+
+        def run(session, template):
+            # A suspended job can't finish, so the wait fails.
+            job = session.run(template)
+            drmaa2.job_suspend(job)
+            return job
+
+        flow = drmaa2.Workflow()
+        flow.add("stuck", job_template)
+        with pytest.raises(drmaa2.DRMAA2Exception):
+            flow.run(Session(js, run))